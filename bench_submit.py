@@ -0,0 +1,166 @@
+# bench_submit.py
+# Замер стоимости отправки теста (POST take_test) на 10, 100 и 500 вопросах:
+# "до" — прежняя построчная проверка и вставка, "после" — complete_attempt целиком
+# (ключ ответов, пакетный INSERT, захват оценки и обновление сводок) с коммитом.
+# "холодный" — то же с пустыми кешами ключей ответов и бланков, как первая
+# отправка после запуска процесса или изменения теста.
+import os
+import sys
+import json
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+
+from config import Config
+from website import create_app, db, grading, paper
+from website.models import MedicalWorker, Test, Question, Answer, TestResult, UserAnswer
+from website.grading import get_answer_key, collect_answers, complete_attempt
+
+SIZES = (10, 100, 500)
+ROUNDS = 20
+
+db_file = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+db_file.close()
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_file.name
+    BACKGROUND_WORKERS = False
+    VENDOR_CDN_FALLBACK = True
+
+
+app = create_app(BenchConfig)
+
+query_count = 0
+
+
+def count_query(*args):
+    global query_count
+    query_count += 1
+
+
+def make_test(worker, size):
+    test = Test(title=f'Бенчмарк {size}', created_by=worker.id, max_attempts=0)
+    db.session.add(test)
+    db.session.flush()
+
+    form = MultiDict()
+    for i in range(size):
+        question_type = ('single', 'multiple', 'text')[i % 3]
+        question = Question(test_id=test.id, text=f'Вопрос {i}', question_type=question_type, points=1)
+        db.session.add(question)
+        db.session.flush()
+
+        if question_type == 'text':
+            db.session.add(Answer(question_id=question.id, text='ответ', is_correct=True))
+            form.add(f'question_text_{question.id}', 'Ответ')
+            continue
+
+        for j in range(4):
+            answer = Answer(question_id=question.id, text=f'Вариант {j}',
+                            is_correct=(j == 0 or (question_type == 'multiple' and j == 1)))
+            db.session.add(answer)
+            db.session.flush()
+            if answer.is_correct:
+                form.add(f'question_{question.id}', str(answer.id))
+
+    db.session.commit()
+    return test, form
+
+
+def submit_before(result, test, form):
+    """Прежняя реализация: запрос к answers и отдельный INSERT на каждый вопрос."""
+    questions = Question.query.filter_by(test_id=test.id).all()
+    score = 0
+    total_points = 0
+
+    for question in questions:
+        total_points += question.points
+        if question.question_type == 'text':
+            text_answer = form.get(f'question_text_{question.id}', '').strip()
+            correct = Answer.query.filter_by(question_id=question.id, is_correct=True).first()
+            is_correct = bool(correct) and text_answer.lower() == correct.text.lower()
+            db.session.add(UserAnswer(result_id=result.id, question_id=question.id,
+                                      text_answer=text_answer, is_correct=is_correct))
+        else:
+            answer_ids = [int(v) for v in form.getlist(f'question_{question.id}')]
+            if question.question_type == 'single':
+                answer = db.session.get(Answer, answer_ids[0])
+                is_correct = answer.is_correct if answer else False
+            else:
+                correct = Answer.query.filter_by(question_id=question.id, is_correct=True).all()
+                is_correct = set(answer_ids) == {a.id for a in correct}
+            db.session.add(UserAnswer(result_id=result.id, question_id=question.id,
+                                      answer_ids=json.dumps(answer_ids), is_correct=is_correct))
+        if is_correct:
+            score += question.points
+
+    finish(result, test, score, total_points)
+
+
+def submit_after(result, test, form):
+    """Текущая реализация: то же, что делает take_test, — complete_attempt и коммит."""
+    answers = collect_answers(get_answer_key(test), form)
+    complete_attempt(result, test, answers)
+    db.session.commit()
+
+
+def submit_cold(result, test, form):
+    """Текущая реализация с пустыми кешами процесса."""
+    grading._answer_keys.clear()
+    paper._papers.clear()
+    submit_after(result, test, form)
+
+
+def finish(result, test, score, total_points):
+    result.score = score
+    result.percentage = (score / total_points * 100) if total_points > 0 else 0
+    result.passed = result.percentage >= test.passing_score
+    result.completed_at = datetime.utcnow()
+    db.session.commit()
+
+
+def measure(submit, worker, test, form):
+    global query_count
+    timings = []
+    queries = 0
+    for _ in range(ROUNDS):
+        result = TestResult(worker_id=worker.id, test_id=test.id, started_at=datetime.utcnow())
+        db.session.add(result)
+        db.session.commit()
+        db.session.expire_all()
+
+        query_count = 0
+        started = time.perf_counter()
+        submit(result, test, form)
+        timings.append(time.perf_counter() - started)
+        queries = query_count
+
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, timings[int(len(timings) * 0.95) - 1] * 1000, queries
+
+
+with app.app_context():
+    db.create_all()
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+
+    worker = MedicalWorker(email='bench@medtest.ru', username='bench', first_name='Бенч', last_name='Марк',
+                           specialization='nurse', license_number='BENCH001')
+    worker.set_password('bench')
+    db.session.add(worker)
+    db.session.commit()
+
+    print(f"{'вопросов':>9} | {'вариант':>8} | {'медиана, мс':>11} | {'p95, мс':>8} | {'запросов':>8}")
+    print('-' * 57)
+    for size in SIZES:
+        test, form = make_test(worker, size)
+        for label, submit in (('до', submit_before), ('после', submit_after), ('холодный', submit_cold)):
+            median, p95, queries = measure(submit, worker, test, form)
+            print(f"{size:>9} | {label:>8} | {median:>11.2f} | {p95:>8.2f} | {queries:>8}")
+
+os.unlink(db_file.name)
@@ -1,22 +1,90 @@
-import os
-from decouple import config
-
-
-class Config:
-    SECRET_KEY = config('SECRET_KEY', default='dev-secret-key-change-in-production')
-    SQLALCHEMY_DATABASE_URI = config('DATABASE_URL', default='sqlite:///medical_tests.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
-
-    # Настройки загрузки файлов
-    UPLOAD_FOLDER = 'website/static/uploads'
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg'}
-
-    # Настройки тестирования
-    TEST_TIME_LIMIT = 3600  # 1 час в секундах
-    PASSING_SCORE = 70  # Процент для успешной сдачи
-
-    @staticmethod
-    def init_app(app):
-        # Создаем папку для загрузок, если она не существует
+import os
+from decouple import config
+
+
+class Config:
+    SECRET_KEY = config('SECRET_KEY', default='dev-secret-key-change-in-production')
+    SQLALCHEMY_DATABASE_URI = config('DATABASE_URL', default='sqlite:///medical_tests.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Настройки загрузки файлов
+    UPLOAD_FOLDER = 'website/static/uploads'
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'webp'}
+
+    # Варианты изображений вопросов: ширины (px), качество JPEG/WebP, процессов обработки
+    # (0 — обрабатывать в процессе приложения) и срок кеширования в браузере (сек)
+    IMAGE_WIDTHS = (480, 960, 1600)
+    IMAGE_QUALITY = 80
+    IMAGE_WORKERS = config('IMAGE_WORKERS', default=2, cast=int)
+    IMAGE_MAX_AGE = 365 * 24 * 3600
+
+    # Локальные копии внешней статики (website/assets.py): путь в static -> (CDN, хеш SRI).
+    # Скачиваются `flask build-assets`; без них страницы не открываются, если не разрешено
+    # брать файлы с CDN (VENDOR_CDN_FALLBACK — только для машин с доступом в интернет)
+    VENDOR_ASSETS = {
+        'vendor/bootstrap/css/bootstrap.min.css': (
+            'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css',
+            'sha384-1BmE4kWBq78iYhFldvKuhfTAU6auU8tT94WrHftjDbrCEXSU1oBoqyl2QvZ6jIW3'),
+        'vendor/bootstrap/js/bootstrap.bundle.min.js': (
+            'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/js/bootstrap.bundle.min.js',
+            'sha384-ka7Sk0Gln4gmtz2MlQnikT1wXgYsOg+OMhuP+IlRH9sENBO0LRn5q+8nbTov4+1p'),
+    }
+    VENDOR_CDN_FALLBACK = config('VENDOR_CDN_FALLBACK', default=False, cast=bool)
+
+    # Настройки тестирования
+    TEST_TIME_LIMIT = 3600  # 1 час в секундах
+    PASSING_SCORE = 70  # Процент для успешной сдачи
+
+    # Автосохранение черновиков ответов: сброс в БД по таймеру (сек) или по числу правок
+    DRAFT_FLUSH_INTERVAL = 5
+    DRAFT_FLUSH_THRESHOLD = 500
+
+    # Асинхронная проверка: отправка теста только сохраняет ответы, оценку считает пул потоков
+    ASYNC_GRADING = config('ASYNC_GRADING', default=False, cast=bool)
+    GRADING_WORKERS = config('GRADING_WORKERS', default=2, cast=int)
+
+    # Тестов на странице каталога
+    CATALOGUE_PAGE_SIZE = 24
+
+    # Анализ вопросов (flask item-stats): размер пачки ответов и через сколько часов
+    # незавершенная попытка считается брошенной и не задерживает отметку
+    ANALYTICS_CHUNK_SIZE = 50000
+    ANALYTICS_SETTLE_HOURS = 24
+
+    # Удаление тестов: до PURGE_INLINE_LIMIT результатов — сразу, больше — фоновой
+    # очисткой пачками по PURGE_CHUNK_SIZE с паузой PURGE_PAUSE секунд между ними
+    PURGE_INLINE_LIMIT = 5000
+    PURGE_CHUNK_SIZE = 2000
+    PURGE_PAUSE = 0.2
+    PURGE_INTERVAL = 300
+
+    # Фоновые потоки (очистка удаленных тестов, прогрев перед экзаменами) стартуют с первым
+    # запросом, то есть только в процессе, обслуживающем сайт; False — не запускать вовсе (тесты)
+    BACKGROUND_WORKERS = config('BACKGROUND_WORKERS', default=True, cast=bool)
+
+    # Импорт вопросов: вопросов в одной транзакции (executemany)
+    IMPORT_BATCH_SIZE = 1000
+
+    # Результатов на странице у модератора и размер пачки при выгрузке
+    # (результатов и вопросов банка)
+    RESULTS_PAGE_SIZE = 50
+
+    # Тестов на странице «Все тесты» в панели модератора
+    PANEL_PAGE_SIZE = 50
+    EXPORT_CHUNK_SIZE = 2000
+
+    # Допуск к началу попытки: одновременных стартов на тест, ожидание места (сек),
+    # базовая пауза до повтора для тех, кто не попал (сек)
+    ADMISSION_MAX_CONCURRENT = config('ADMISSION_MAX_CONCURRENT', default=8, cast=int)
+    ADMISSION_WAIT = 0.5
+    ADMISSION_RETRY_AFTER = 3
+
+    # Предварительная сборка бланка и ключа ответов за PREWARM_LEAD сек до Test.start_at
+    PREWARM_LEAD = 600
+    PREWARM_INTERVAL = 60
+
+    @staticmethod
+    def init_app(app):
+        # Создаем папку для загрузок, если она не существует
         os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
\ No newline at end of file
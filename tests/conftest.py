@@ -0,0 +1,105 @@
+import os
+import tempfile
+
+import pytest
+
+from config import Config
+from website import create_app, db
+
+
+@pytest.fixture
+def app():
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        IMAGE_WORKERS = 0
+        VENDOR_CDN_FALLBACK = True
+        BACKGROUND_WORKERS = False
+
+    app = create_app(TestConfig)
+    # Кеши и буфер черновиков общие для процесса, а id в новой базе повторяются
+    from website import grading, paper
+    from website.drafts import drafts
+    grading._answer_keys.clear()
+    paper._papers.clear()
+    drafts._take()
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    os.remove(path)
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username, **fields):
+        from website.models import MedicalWorker
+
+        user = MedicalWorker(email=f'{username}@example.com', username=username, first_name='Имя',
+                             last_name=username, specialization='nurse', license_number=f'L-{username}', **fields)
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make_user
+
+
+@pytest.fixture
+def login(app):
+    def login(user):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+        return client
+    return login
+
+
+@pytest.fixture
+def make_exam(app):
+    def make_exam(author, questions=3, page_size=0, **fields):
+        """Тест из вопросов с одним верным ответом (первым) и, по желанию, текстовыми вопросами."""
+        from website.models import Answer, Question, Test
+
+        test = Test(title=fields.pop('title', 'Экзамен'), created_by=author.id, is_active=True,
+                    page_size=page_size, passing_score=50, shuffle_questions=False, **fields)
+        db.session.add(test)
+        db.session.flush()
+        for number in range(questions):
+            question = Question(test_id=test.id, text=f'Вопрос {number}', question_type='single',
+                                topic='Тема', question_level='basic')
+            db.session.add(question)
+            db.session.flush()
+            db.session.add_all([Answer(question_id=question.id, text='верно', is_correct=True),
+                                Answer(question_id=question.id, text='неверно', is_correct=False)])
+        db.session.commit()
+        return test
+    return make_exam
+
+
+@pytest.fixture
+def start_attempt(app):
+    def start_attempt(worker, test):
+        from datetime import datetime
+
+        from website.models import TestResult
+
+        result = TestResult(worker_id=worker.id, test_id=test.id, started_at=datetime.utcnow())
+        db.session.add(result)
+        db.session.commit()
+        return result
+    return start_attempt
+
+
+@pytest.fixture
+def correct_answers(app):
+    def correct_answers(test):
+        """question_id -> id верного варианта."""
+        return {question.id: next(answer.id for answer in question.answers if answer.is_correct)
+                for question in sorted(test.questions, key=lambda question: question.id)}
+    return correct_answers
@@ -0,0 +1,32 @@
+import pytest
+
+from website.assets import assets
+
+
+def test_missing_vendor_file_fails_loudly(app):
+    filename = next(iter(app.config['VENDOR_ASSETS']))
+    assets.cdn_fallback = False
+    with app.test_request_context():
+        with pytest.raises(RuntimeError, match='build-assets'):
+            assets.url(filename)
+
+        assets.cdn_fallback = True
+        assert assets.url(filename).startswith('https://')
+
+
+def test_local_asset_is_fingerprinted_and_immutable(app, tmp_path):
+    app.static_folder = str(tmp_path)
+    (tmp_path / 'style.css').write_text('body { margin: 0 }')
+    client = app.test_client()
+    with app.test_request_context():
+        url = assets.url('style.css')
+    assert url.startswith('/assets/')
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    # Файл изменился — старый адрес перенаправляет на новый
+    (tmp_path / 'style.css').write_text('body { margin: 1px }')
+    assert client.get(url).status_code == 302
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from website import db, test_status
+from website.models import Test, TestResult, TestSubscription
+
+
+def add_tests(author, worker, first, count):
+    """Тесты обоих типов доступа; по каждому у пользователя есть попытка, по подписке — назначение."""
+    for number in range(first, first + count):
+        subscribed = number % 2 == 1
+        test = Test(title=f'Тест {number}', description='', created_by=author.id, is_active=True,
+                    access_type='subscribed' if subscribed else 'simple')
+        db.session.add(test)
+        db.session.flush()
+        if subscribed:
+            db.session.add(TestSubscription(worker_id=worker.id, test_id=test.id))
+            test_status.set_subscribed(worker.id, test.id, True)
+
+        result = TestResult(worker_id=worker.id, test_id=test.id, started_at=datetime.utcnow(),
+                            completed_at=datetime.utcnow(), score=1, percentage=100.0, passed=True)
+        db.session.add(result)
+        db.session.flush()
+        test_status.record_start(result)
+        test_status.record_completion(result)
+    db.session.commit()
+
+
+def count_queries(client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # Первый запрос прогревает кеши, считаем второй
+    assert client.get(url).status_code == 200
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements), response.get_data(as_text=True)
+
+
+def test_tests_page_query_count_does_not_grow(app, make_user, login):
+    author = make_user('author', is_moderator=True)
+    worker = make_user('worker')
+    client = login(worker)
+
+    add_tests(author, worker, 0, 2)
+    few, page = count_queries(client, '/tests')
+    assert 'Тест 1' in page
+
+    add_tests(author, worker, 2, 20)
+    many, page = count_queries(client, '/tests')
+    assert 'Тест 21' in page
+
+    assert many == few
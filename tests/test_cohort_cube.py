@@ -0,0 +1,45 @@
+from website import cohort_cube, db
+from website.models import CohortCube, CohortTopicMastery, MedicalWorker, TestResult
+from website.purge import delete_worker
+
+
+def grade(client, result, answers):
+    form = {f'question_{question_id}': answer_id for question_id, answer_id in answers.items()}
+    assert client.post(f'/test/take/{result.id}', data=form).status_code == 302
+
+
+def test_attempt_is_discounted_from_the_cohort_it_was_recorded_in(app, make_user, make_exam, start_attempt,
+                                                                   login, correct_answers):
+    worker = make_user('worker', institution='ГКБ 1', position='Медсестра', years_experience=4)
+    author = make_user('author', is_moderator=True)
+    test = make_exam(author)
+    result = start_attempt(worker, test)
+    grade(login(worker), result, correct_answers(test))
+
+    result = db.session.get(TestResult, result.id)
+    assert (result.institution, result.specialization, result.experience_band) == ('ГКБ 1', 'nurse', '3-5')
+    assert [(row.institution, row.attempts) for row in CohortCube.query.all()] == [('ГКБ 1', 1)]
+
+    # Профиль изменился после проверки
+    worker = db.session.get(MedicalWorker, worker.id)
+    worker.institution, worker.specialization, worker.years_experience = 'ГКБ 2', 'surgeon', 12
+    db.session.commit()
+
+    delete_worker(worker.id)
+    db.session.commit()
+    assert [(row.institution, row.attempts, row.score_sum) for row in CohortCube.query.all()] == [('ГКБ 1', 0, 0)]
+    assert {(row.specialization, row.attempts) for row in CohortTopicMastery.query.all()} == {('nurse', 0)}
+
+
+def test_rebuild_freezes_the_key_of_old_attempts(app, make_user, make_exam, start_attempt, login,
+                                                 correct_answers):
+    worker = make_user('worker', institution='ГКБ 1')
+    test = make_exam(make_user('author', is_moderator=True))
+    result = start_attempt(worker, test)
+    grade(login(worker), result, correct_answers(test))
+
+    TestResult.query.update({TestResult.experience_band: None, TestResult.institution: None})
+    cohort_cube.rebuild()
+    db.session.commit()
+    assert db.session.get(TestResult, result.id).experience_band == '0-2'
+    assert [(row.institution, row.attempts) for row in CohortCube.query.all()] == [('ГКБ 1', 1)]
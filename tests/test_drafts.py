@@ -0,0 +1,57 @@
+from website import db
+from website.drafts import drafts
+from website.grading import load_saved_answers
+from website.models import TestResult
+
+
+def submit(client, result, answers):
+    form = {f'question_{question_id}': answer_id for question_id, answer_id in answers.items()}
+    return client.post(f'/test/take/{result.id}', data=form)
+
+
+def test_flush_result_commits_drafts(app, make_user, make_exam, start_attempt, correct_answers):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True))
+    result = start_attempt(worker, test)
+    first, second, _ = correct_answers(test).items()
+
+    drafts.put(result.id, {first[0]: [first[1]], second[0]: [second[1]]})
+    drafts.put(result.id, {second[0]: None})
+    result_id = result.id
+    assert drafts.flush_result(result_id) == 2
+    assert drafts.pending_count() == 0
+
+    db.session.remove()
+    assert load_saved_answers(result_id) == {first[0]: [first[1]]}
+
+
+def test_single_page_form_overrides_drafts(app, make_user, make_exam, start_attempt, login,
+                                           correct_answers):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True), questions=2)
+    result = start_attempt(worker, test)
+    (first, first_answer), (second, second_answer) = correct_answers(test).items()
+
+    # Ответ на второй вопрос снят в форме, но автосохранение об этом не успело
+    drafts.put(result.id, {first: [first_answer], second: [second_answer]})
+    assert submit(login(worker), result, {first: first_answer}).status_code == 302
+
+    result = db.session.get(TestResult, result.id)
+    assert result.score == 1
+    assert set(load_saved_answers(result.id)) == {first}
+
+
+def test_paged_form_is_merged_with_saved_pages(app, make_user, make_exam, start_attempt, login,
+                                               correct_answers):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True), questions=4, page_size=2)
+    result = start_attempt(worker, test)
+    answers = list(correct_answers(test).items())
+
+    # Первая страница сохранена черновиками, в форме — только последняя
+    drafts.put(result.id, dict((question_id, [answer_id]) for question_id, answer_id in answers[:2]))
+    assert submit(login(worker), result, dict(answers[2:])).status_code == 302
+
+    result = db.session.get(TestResult, result.id)
+    assert result.score == 4
+    assert result.passed
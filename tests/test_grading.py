@@ -0,0 +1,74 @@
+from sqlalchemy.orm.attributes import set_committed_value
+
+from website import db, grading, worker_stats
+from website.models import TestResult, TopicAttempt, UserAnswer
+
+
+def test_attempt_is_graded_and_counted_once(app, make_user, make_exam, start_attempt, correct_answers):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True))
+    result = start_attempt(worker, test)
+    answers = {question_id: [answer_id] for question_id, answer_id in correct_answers(test).items()}
+
+    assert grading.complete_attempt(result, test, answers) is True
+    db.session.commit()
+
+    # Вторая отправка со старым состоянием попытки (другой поток еще не видел оценку)
+    set_committed_value(result, 'passed', None)
+    assert grading.complete_attempt(result, test, {question_id: [] for question_id in answers}) is False
+    assert grading.grade_recorded_attempt(result) is False
+    db.session.commit()
+
+    result = db.session.get(TestResult, result.id)
+    assert (result.percentage, result.passed) == (100, True)
+    assert UserAnswer.query.filter_by(result_id=result.id).count() == len(answers)
+    assert TopicAttempt.query.count() == 1
+    stats = worker_stats.get_stats(worker.id)
+    assert (stats.completed, stats.passed) == (1, 1)
+
+
+def test_recorded_attempt_is_graded_once(app, make_user, make_exam, start_attempt, correct_answers):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True))
+    result = start_attempt(worker, test)
+    grading.record_attempt(result, {question_id: [answer_id]
+                                    for question_id, answer_id in correct_answers(test).items()})
+    db.session.commit()
+
+    assert grading.grade_recorded_attempt(result) is True
+    db.session.commit()
+    set_committed_value(result, 'passed', None)
+    assert grading.grade_recorded_attempt(result) is False
+    db.session.commit()
+
+    assert worker_stats.get_stats(worker.id).completed == 1
+    assert UserAnswer.query.filter_by(result_id=result.id, is_correct=True).count() == 3
+
+
+def test_long_text_answers_are_compared_in_full(app, make_user, make_exam):
+    from werkzeug.datastructures import MultiDict
+
+    from website.models import Answer, Question
+    from website.text_matching import MAX_TEXT_ANSWER_LENGTH, normalize_answer
+
+    test = make_exam(make_user('author', is_moderator=True), questions=0)
+    protocol = ' '.join(['аспирин'] * 80)
+    assert len(protocol) > MAX_TEXT_ANSWER_LENGTH
+    question = Question(test_id=test.id, text='Протокол', question_type='text', text_tolerance=2)
+    db.session.add(question)
+    db.session.flush()
+    db.session.add(Answer(question_id=question.id, text=protocol, normalized_text=normalize_answer(protocol),
+                          is_correct=True))
+    db.session.commit()
+    answer_key = grading.get_answer_key(test)
+
+    def correct(text):
+        answers = grading.collect_answers(answer_key, MultiDict({f'question_text_{question.id}': text}))
+        assert answers[question.id] == text
+        return grading.grade_answers(answer_key, answers)[0] == 1
+
+    assert correct(protocol)
+    # Начало совпадает, но дальше ответ другой
+    assert not correct(protocol + ' и парацетамол')
+    # Опечатки в длинном ответе не прощаются
+    assert not correct(protocol[:-1] + 'х')
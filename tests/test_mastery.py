@@ -0,0 +1,46 @@
+from website import db, mastery
+from website.models import Question, TopicAttempt, TopicMastery
+from website.purge import purger
+
+
+def grade(client, result, answers):
+    form = {f'question_{question_id}': answer_id for question_id, answer_id in answers.items()}
+    assert client.post(f'/test/take/{result.id}', data=form).status_code == 302
+
+
+def totals(model=TopicMastery):
+    return [(row.attempts, row.asked, row.correct) for row in model.query.all()]
+
+
+def test_deleting_a_test_subtracts_what_was_recorded(app, make_user, make_exam, start_attempt, login,
+                                                      correct_answers):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True), questions=3)
+    result = start_attempt(worker, test)
+    grade(login(worker), result, dict(list(correct_answers(test).items())[:2]))
+    assert totals() == [(1, 3, 2)]
+
+    # Вопросы добавлены после попытки: ее вклад от этого не меняется
+    db.session.add(Question(test_id=test.id, text='Новый', question_type='single', topic='Тема',
+                            question_level='basic'))
+    db.session.commit()
+
+    purger.delete_tests([test.id])
+    db.session.commit()
+    assert totals() == [(0, 0, 0)]
+    assert TopicAttempt.query.count() == 0
+
+
+def test_rebuild_restores_missing_contributions(app, make_user, make_exam, start_attempt, login,
+                                                correct_answers):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True), questions=3)
+    result = start_attempt(worker, test)
+    grade(login(worker), result, correct_answers(test))
+
+    # Попытка, проверенная до появления topic_attempts
+    TopicAttempt.query.delete()
+    mastery.rebuild()
+    db.session.commit()
+    assert totals() == [(1, 3, 3)]
+    assert [(row.asked, row.correct) for row in TopicAttempt.query.all()] == [(3, 3)]
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from website import db, result_browser
+from website.catalogue import list_tests, moderator_tests
+from website.models import Test, TestResult
+from website.pagination import decode_cursor, encode_cursor
+
+MOMENT = datetime(2024, 3, 1, 12, 0)
+
+
+def pages(fetch, limit):
+    """Все страницы подряд: списки id."""
+    collected, after = [], None
+    while True:
+        rows, after = fetch(after, limit)
+        collected.append([row.id for row in rows])
+        if after is None:
+            return collected
+
+
+@pytest.fixture
+def tests(app, make_user):
+    """Пять тестов; у трех одинаковое время создания — порядок между ними задает id."""
+    author = make_user('author', is_moderator=True)
+    moments = [MOMENT, MOMENT, MOMENT, MOMENT - timedelta(days=1), MOMENT + timedelta(days=1)]
+    items = [Test(title=f'Тест {number}', created_by=author.id, is_active=True, created_at=moment)
+             for number, moment in enumerate(moments)]
+    db.session.add_all(items)
+    db.session.commit()
+    ordered = sorted(items, key=lambda test: (test.created_at, test.id), reverse=True)
+    return author, [test.id for test in ordered]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(MOMENT, 7)) == (MOMENT, 7)
+    assert decode_cursor('мусор') is None
+    assert decode_cursor('2024-03-01_x') is None
+
+
+@pytest.mark.parametrize('limit', [1, 2, 4, 5, 6])
+def test_catalogue_pages_cover_every_test_once(tests, limit):
+    author, expected = tests
+    collected = pages(lambda after, size: list_tests(author.id, after=after, limit=size), limit)
+
+    assert [test_id for page in collected for test_id in page] == expected
+    assert all(len(page) == limit for page in collected[:-1])
+    # Последняя полная страница не оставляет пустой следующей
+    assert collected[-1]
+
+
+def test_moderator_pages_match_the_full_list(tests):
+    _, expected = tests
+    everything, cursor = moderator_tests()
+    assert cursor is None
+    assert [row.id for row in everything] == expected
+    collected = pages(lambda after, size: moderator_tests(after=after, limit=size), 2)
+    assert [test_id for page in collected for test_id in page] == expected
+
+
+def test_invalid_cursor_starts_from_the_beginning(tests):
+    author, expected = tests
+    rows, _ = list_tests(author.id, after='не курсор', limit=2)
+    assert [row.id for row in rows] == expected[:2]
+
+
+@pytest.fixture
+def results(app, make_user, make_exam):
+    """Завершенные попытки, часть — в одну и ту же секунду, и одна незавершенная."""
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True), questions=1)
+    moments = [MOMENT] * 4 + [MOMENT - timedelta(hours=1), MOMENT + timedelta(hours=1)]
+    items = [TestResult(worker_id=worker.id, test_id=test.id, started_at=moment - timedelta(minutes=5),
+                        completed_at=moment, score=1, percentage=100.0, passed=True) for moment in moments]
+    items.append(TestResult(worker_id=worker.id, test_id=test.id, started_at=MOMENT))
+    db.session.add_all(items)
+    db.session.commit()
+    finished = [result for result in items if result.completed_at is not None]
+    return [result.id for result in sorted(finished, key=lambda result: (result.completed_at, result.id),
+                                           reverse=True)]
+
+
+@pytest.mark.parametrize('limit', [1, 3, 4, 6, 10])
+def test_result_pages_cover_every_result_once(results, limit):
+    collected = pages(lambda after, size: result_browser.results_page({}, after, size), limit)
+    assert [result_id for page in collected for result_id in page] == results
+
+
+def test_export_reads_in_chunks(results):
+    assert [row.id for row in result_browser.iter_results({}, chunk_size=4)] == results
+    assert [row.id for row in result_browser.iter_results({'outcome': 'failed'}, chunk_size=4)] == []
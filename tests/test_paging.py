@@ -0,0 +1,28 @@
+from werkzeug.datastructures import MultiDict
+
+from website import db
+from website.forms import TestForm
+from website.models import TestResult
+
+
+def test_negative_page_size_is_rejected_by_the_form(app):
+    with app.test_request_context(method='POST'):
+        form = TestForm(formdata=MultiDict({'title': 'Тест', 'difficulty': 'easy', 'page_size': '-5'}))
+        form.validate()
+        assert 'page_size' in form.errors
+
+
+def test_negative_page_size_shows_the_whole_paper(app, make_user, make_exam, start_attempt, login,
+                                                   correct_answers):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True), questions=6, page_size=-5)
+    result = start_attempt(worker, test)
+    client = login(worker)
+
+    page = client.get(f'/test/take/{result.id}').get_data(as_text=True)
+    answers = correct_answers(test)
+    assert all(f'name="question_{question_id}"' in page for question_id in answers)
+
+    client.post(f'/test/take/{result.id}/page/1',
+                data={f'question_{question_id}': answer_id for question_id, answer_id in answers.items()})
+    assert db.session.get(TestResult, result.id).score == 6
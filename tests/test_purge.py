@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from flask import template_rendered
+
+from website import db
+from website.models import Test
+
+
+def soft_delete(test):
+    test.deleted_at = datetime.utcnow()
+    test.is_active = False
+    db.session.commit()
+
+
+def test_soft_deleted_test_cannot_be_reactivated(app, make_user, make_exam, login):
+    moderator = make_user('moderator', is_moderator=True, is_admin=True)
+    test = make_exam(moderator)
+    test_id = test.id
+    soft_delete(test)
+    client = login(moderator)
+
+    assert client.get(f'/moderator/test/{test_id}/toggle').status_code == 404
+    assert db.session.get(Test, test_id).is_active is False
+
+
+def test_admin_panel_does_not_count_soft_deleted_tests(app, make_user, make_exam, login):
+    admin = make_user('admin', is_moderator=True, is_admin=True)
+    make_exam(admin, title='Активный')
+    deleted = make_exam(admin, title='Удаленный')
+    soft_delete(deleted)
+    # Даже если флаг активности остался от прежних версий
+    deleted.is_active = True
+    db.session.commit()
+
+    captured = []
+
+    def record(sender, template, context, **extra):
+        captured.append(context)
+
+    with template_rendered.connected_to(record, app):
+        assert login(admin).get('/admin').status_code == 200
+    assert captured[0]['active_tests'] == 1
+    assert captured[0]['total_tests'] == 1
+
+
+def graded_attempts(worker, test, count, answers):
+    from website import grading
+    from website.models import TestResult
+
+    for _ in range(count):
+        result = TestResult(worker_id=worker.id, test_id=test.id, started_at=datetime.utcnow())
+        db.session.add(result)
+        db.session.flush()
+        grading.complete_attempt(result, test, answers)
+    db.session.commit()
+
+
+def test_large_test_is_purged_in_chunks_and_discounted(app, make_user, make_exam, correct_answers, monkeypatch):
+    from website import worker_stats
+    from website.models import CohortCube, TestResult, TopicAttempt, TopicMastery, UserAnswer, UserTestStatus
+    from website.purge import purger
+
+    monkeypatch.setattr(purger, 'inline_limit', 2)
+    monkeypatch.setattr(purger, 'chunk_size', 2)
+    monkeypatch.setattr(purger, 'pause', 0)
+    worker = make_user('worker')
+    author = make_user('author', is_moderator=True)
+    large = make_exam(author, questions=2, title='Большой')
+    kept = make_exam(author, questions=2, title='Остается')
+    graded_attempts(worker, large, 5, {question_id: [answer_id] for question_id, answer_id
+                                       in correct_answers(large).items()})
+    graded_attempts(worker, kept, 1, {question.id: [answer.id for answer in question.answers if not answer.is_correct]
+                                      for question in kept.questions})
+    large_id, kept_id = large.id, kept.id
+
+    assert purger.delete_tests([large_id]) is False
+    db.session.commit()
+    assert db.session.get(Test, large_id).deleted_at is not None
+    assert UserTestStatus.query.filter_by(test_id=large_id).count() == 0
+    assert purger.pending() == [large_id]
+
+    # Одна пачка — не больше chunk_size попыток, и сводки уменьшаются на них же
+    assert purger.purge_chunk(large_id) == 2
+    db.session.commit()
+    assert TestResult.query.filter_by(test_id=large_id).count() == 3
+    assert worker_stats.get_stats(worker.id).completed == 4
+
+    assert purger.purge(large_id) == 3
+    assert db.session.get(Test, large_id) is None
+    assert purger.pending() == []
+    assert UserAnswer.query.count() == 2
+    assert TopicAttempt.query.count() == 1
+
+    stats = worker_stats.get_stats(worker.id)
+    assert (stats.completed, stats.passed, stats.score_sum) == (1, 0, 0)
+    assert [(row.attempts, row.asked, row.correct) for row in TopicMastery.query.all()] == [(1, 2, 0)]
+    assert sorted((row.test_id, row.attempts) for row in CohortCube.query.all()) == [(kept_id, 1)]
+    # Повторная очистка уже удаленного теста ничего не делает
+    assert purger.purge_chunk(large_id) == 0
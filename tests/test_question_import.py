@@ -0,0 +1,53 @@
+import io
+import json
+
+import pytest
+
+from website.models import Answer, Question
+from website.question_import import import_questions, validate
+
+
+def record(**fields):
+    return dict({'text': 'Вопрос', 'type': 'single',
+                 'answers': [{'text': 'да', 'correct': True}, {'text': 'нет', 'correct': False}]}, **fields)
+
+
+@pytest.mark.parametrize('fields, message', [
+    ({'text': '  '}, 'Пустой текст'),
+    ({'type': 'essay'}, 'Неизвестный тип'),
+    ({'points': 'два'}, 'Баллы: ожидается целое'),
+    ({'points': 0}, 'не меньше 1'),
+    ({'level': 'expert'}, 'Неизвестный уровень'),
+    ({'tolerance': 9}, 'Допуск опечаток'),
+    ({'answers': [{'text': 'да', 'correct': True}]}, 'не меньше двух'),
+    ({'answers': [{'text': 'да', 'correct': True}, {'text': 'тоже да', 'correct': True}]}, 'ровно один'),
+    ({'type': 'multiple', 'answers': [{'text': 'а', 'correct': False}, {'text': 'б', 'correct': False}]},
+     'Не отмечен'),
+    ({'type': 'text', 'answers': [{'text': ' ', 'correct': True}]}, 'Нет допустимых'),
+])
+def test_invalid_records_are_rejected(app, fields, message):
+    with pytest.raises(ValueError, match=message):
+        validate(record(**fields), None)
+
+
+def test_defaults_and_text_variants(app):
+    item = validate(record(type='text', answers=[{'text': 'Аспирин; ацетилсалициловая кислота', 'correct': False}]),
+                    None)
+    assert (item['points'], item['question_level'], item['text_tolerance']) == (1, 'medium', 1)
+    assert item['answers'] == [('Аспирин', True), ('ацетилсалициловая кислота', True)]
+
+
+def test_invalid_lines_are_reported_and_the_rest_imported(app, make_user, make_exam):
+    author = make_user('author', is_moderator=True)
+    test = make_exam(author, questions=0)
+    lines = [record(text='Первый'), record(type='essay'), record(text='Второй', points=3), {'answers': []}]
+    stream = io.StringIO(''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines) + '{не json\n')
+
+    summary = import_questions(test, stream, 'json', author.id, batch_size=1)
+
+    assert summary['imported'] == 2
+    assert summary['error_count'] == 3
+    assert [line for line, _ in summary['errors']] == [2, 4, 5]
+    questions = Question.query.filter_by(test_id=test.id).order_by(Question.id).all()
+    assert [(question.text, question.points) for question in questions] == [('Первый', 1), ('Второй', 3)]
+    assert Answer.query.filter(Answer.question_id.in_([question.id for question in questions])).count() == 4
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from website import db
+from website.models import TestResult, WorkerStats
+from website.schema import upgrade
+
+
+def test_upgrade_brings_an_old_database_to_the_models(app, make_user, make_exam):
+    worker = make_user('worker')
+    test = make_exam(make_user('author', is_moderator=True))
+    db.session.add(TestResult(worker_id=worker.id, test_id=test.id, score=3, percentage=100.0, passed=True,
+                              completed_at=datetime.utcnow()))
+    db.session.commit()
+    worker_id, test_id = worker.id, test.id
+
+    # База в состоянии до новых колонок, индексов, сводок и каскадов
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        connection.exec_driver_sql('ALTER TABLE tests DROP COLUMN deleted_at')
+        connection.exec_driver_sql('DROP INDEX ix_user_answers_result_question')
+        connection.exec_driver_sql('DROP TABLE worker_stats')
+        connection.exec_driver_sql('DROP TABLE test_subscriptions')
+        connection.exec_driver_sql(
+            'CREATE TABLE test_subscriptions (id INTEGER PRIMARY KEY, worker_id INTEGER NOT NULL '
+            'REFERENCES medical_workers (id), test_id INTEGER NOT NULL REFERENCES tests (id), '
+            'subscribed_at DATETIME)')
+        connection.exec_driver_sql(f'INSERT INTO test_subscriptions (worker_id, test_id) '
+                                   f'VALUES ({worker_id}, {test_id}), ({worker_id}, {test_id})')
+    db.engine.dispose()
+
+    steps = upgrade()
+    assert steps
+
+    inspector = inspect(db.engine)
+    assert 'deleted_at' in {column['name'] for column in inspector.get_columns('tests')}
+    assert 'ix_user_answers_result_question' in {index['name'] for index in inspector.get_indexes('user_answers')}
+    assert {fk['options'].get('ondelete') for fk in inspector.get_foreign_keys('test_subscriptions')} == {'CASCADE'}
+    assert db.session.scalar(text('SELECT COUNT(*) FROM test_subscriptions')) == 1
+    assert db.session.get(WorkerStats, worker_id).completed == 1
+    assert db.session.scalar(text('PRAGMA foreign_keys')) == 1
+
+    # Повторный запуск ничего не меняет
+    assert upgrade() == []
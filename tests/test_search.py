@@ -0,0 +1,49 @@
+import pytest
+
+from website import db
+from website.models import Question, Test
+from website.search import build_match, rebuild_index, search_questions, search_tests
+
+
+@pytest.fixture
+def lung_test(app, make_user):
+    author = make_user('author', is_moderator=True)
+    test = Test(title='Объём лёгких', description='Спирометрия', created_by=author.id, is_active=True)
+    db.session.add(test)
+    db.session.flush()
+    db.session.add(Question(test_id=test.id, text='Жизненная ёмкость лёгких взрослого', topic='Дыхание'))
+    db.session.commit()
+    return test
+
+
+def test_query_folds_yo():
+    assert build_match('Объём') == build_match('объем') == '"объем"*'
+
+
+@pytest.mark.parametrize('query', ['объём', 'объем', 'лёгких', 'легких', 'ОБЪЁМ'])
+def test_tests_found_with_either_spelling(lung_test, query):
+    assert [row['id'] for row in search_tests(query)] == [lung_test.id]
+
+
+@pytest.mark.parametrize('query', ['ёмкость', 'емкость', 'лёгкие', 'легкие'])
+def test_questions_found_with_either_spelling(lung_test, query):
+    rows = search_questions(query)
+    assert [row['test_id'] for row in rows] == [lung_test.id]
+    # Подсветка — по исходному тексту, с ё
+    assert 'ёмкость' in rows[0]['text'] or 'лёгких' in rows[0]['text']
+
+
+def test_index_follows_updates_and_rebuild(lung_test):
+    question = Question.query.filter_by(test_id=lung_test.id).one()
+    question.text = 'Дыхательный объём'
+    db.session.commit()
+    assert search_questions('емкость') == []
+    assert [row['id'] for row in search_questions('объем')] == [question.id]
+
+    rebuild_index()
+    db.session.commit()
+    assert [row['id'] for row in search_questions('объём')] == [question.id]
+
+    db.session.delete(question)
+    db.session.commit()
+    assert search_questions('объем') == []
@@ -0,0 +1,74 @@
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from website import db, test_bank
+from website.images import image_pipeline
+from website.models import Question, Test
+from website.question_import import import_questions
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_pipeline, 'upload_folder', str(tmp_path))
+    return tmp_path
+
+
+def test_soft_deleted_test_is_not_cloned_or_exported(app, make_user, make_exam, login):
+    moderator = make_user('moderator', is_moderator=True)
+    test = make_exam(moderator)
+    test_id = test.id
+    test.deleted_at = datetime.utcnow()
+    db.session.commit()
+    client = login(moderator)
+
+    assert client.post(f'/moderator/test/{test_id}/clone').status_code == 404
+    assert client.get(f'/moderator/test/{test_id}/export.jsonl').status_code == 404
+    assert Test.query.count() == 1
+    with pytest.raises(ValueError):
+        test_bank.clone_test(db.session.get(Test, test_id), moderator.id)
+    # И в выгрузке всего банка его вопросов нет
+    assert list(test_bank.iter_questions()) == []
+
+
+def test_clone_is_inactive_and_not_deleted(app, make_user, make_exam):
+    moderator = make_user('moderator', is_moderator=True)
+    test = make_exam(moderator)
+    clone = db.session.get(Test, test_bank.clone_test(test, moderator.id))
+    db.session.commit()
+
+    assert clone.deleted_at is None
+    assert clone.is_active is False
+    assert [len(question.answers) for question in clone.questions] == [2, 2, 2]
+
+
+def test_exported_image_is_found_on_reimport(app, make_user, make_exam, uploads):
+    moderator = make_user('moderator', is_moderator=True)
+    source = make_exam(moderator, questions=1)
+    (uploads / 'scan.svg').write_text('<svg xmlns="http://www.w3.org/2000/svg"/>')
+    source.questions[0].image_filename = 'scan.svg'
+    db.session.commit()
+    target = make_exam(moderator, questions=0, title='Копия')
+
+    exported = ''.join(test_bank.iter_jsonl(source.id))
+    assert json.loads(exported)['image'] == 'scan.svg'
+    summary = import_questions(target, io.StringIO(exported), 'json', moderator.id)
+
+    assert summary['error_count'] == 0
+    assert Question.query.filter_by(test_id=target.id).one().image_filename == 'scan.svg'
+
+
+@pytest.mark.parametrize('image', ['missing.svg', '../scan.svg', 'scan.exe'])
+def test_unknown_image_without_archive_is_rejected(app, make_user, make_exam, uploads, image):
+    moderator = make_user('moderator', is_moderator=True)
+    (uploads / 'scan.exe').write_text('')
+    target = make_exam(moderator, questions=0)
+    record = {'text': 'Вопрос', 'type': 'single', 'image': image,
+              'answers': [{'text': 'да', 'correct': True}, {'text': 'нет', 'correct': False}]}
+
+    summary = import_questions(target, io.StringIO(json.dumps(record) + '\n'), 'json', moderator.id)
+
+    assert summary['imported'] == 0
+    assert 'не загружено' in summary['errors'][0][1]
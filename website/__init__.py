@@ -1,36 +1,98 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager
-from flask_migrate import Migrate
-from config import Config
-import os
-
-db = SQLAlchemy()
-login_manager = LoginManager()
-migrate = Migrate()
-
-
-def create_app(config_class=Config):
-    app = Flask(__name__)
-    app.config.from_object(config_class)
-
-    # Инициализация папки загрузок
-    config_class.init_app(app)
-
-    # Инициализация расширений
-    db.init_app(app)
-    login_manager.init_app(app)
-    login_manager.login_view = 'auth.login'
-    login_manager.login_message = 'Пожалуйста, войдите для доступа к этой странице.'
-    migrate.init_app(app, db)
-
-    # Регистрация blueprint'ов
-    from website.auth import auth_bp
-    from website.views import main_bp
-    from website.moderator import moderator_bp
-
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(main_bp)
-    app.register_blueprint(moderator_bp, url_prefix='/moderator')
-
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from flask_login import LoginManager
+from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import Config
+import os
+import sqlite3
+
+db = SQLAlchemy()
+login_manager = LoginManager()
+migrate = Migrate()
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite проверяет внешние ключи (и выполняет ON DELETE) только с этим pragma."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def create_app(config_class=Config):
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+
+    # Инициализация папки загрузок
+    config_class.init_app(app)
+
+    # Инициализация расширений
+    db.init_app(app)
+    login_manager.init_app(app)
+    login_manager.login_view = 'auth.login'
+    login_manager.login_message = 'Пожалуйста, войдите для доступа к этой странице.'
+    migrate.init_app(app, db)
+
+    # Регистрация blueprint'ов
+    from website.auth import auth_bp
+    from website.views import main_bp
+    from website.moderator import moderator_bp
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(moderator_bp, url_prefix='/moderator')
+
+    # Отложенная запись черновиков ответов
+    from website.drafts import drafts
+    drafts.init_app(app)
+
+    # Очередь асинхронной проверки попыток
+    from website.grading_queue import grading_queue
+    grading_queue.init_app(app)
+
+    # Допуск к началу попыток и прогрев кешей перед стартом экзаменов
+    from website.admission import admission
+    admission.init_app(app)
+
+    # Статика с отпечатками в адресе и долгим кешированием
+    from website.assets import assets
+    assets.init_app(app)
+
+    # Варианты изображений вопросов (пул процессов)
+    from website.images import image_pipeline
+    image_pipeline.init_app(app)
+
+    # Фоновая очистка удаленных тестов с большим числом результатов
+    from website.purge import purger
+    purger.init_app(app)
+
+    # Команды обслуживания
+    from website.test_status import rebuild_command
+    app.cli.add_command(rebuild_command)
+    from website.worker_stats import rebuild_command as rebuild_stats_command
+    app.cli.add_command(rebuild_stats_command)
+    from website.item_analysis import item_stats_command
+    app.cli.add_command(item_stats_command)
+    from website.mastery import rebuild_command as rebuild_mastery_command
+    app.cli.add_command(rebuild_mastery_command)
+    from website.cohort_cube import rebuild_command as rebuild_cube_command
+    app.cli.add_command(rebuild_cube_command)
+    from website.search import search_index_command
+    app.cli.add_command(search_index_command)
+    from website.question_import import import_command
+    app.cli.add_command(import_command)
+    from website.test_bank import export_command
+    app.cli.add_command(export_command)
+    from website.purge import purge_command
+    app.cli.add_command(purge_command)
+    from website.images import process_images_command
+    app.cli.add_command(process_images_command)
+    from website.assets import build_assets_command
+    app.cli.add_command(build_assets_command)
+    from website.schema import upgrade_schema_command
+    app.cli.add_command(upgrade_schema_command)
+
     return app
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""
+Допуск к началу попытки при массовом старте экзамена.
+
+Создание попытки (проверка подписки, подсчет попыток, INSERT и коммит)
+ограничено числом одновременных запросов на тест (ADMISSION_MAX_CONCURRENT).
+Запрос, не получивший место за ADMISSION_WAIT секунд, получает страницу
+ожидания с Retry-After вместо ошибки 500 или таймаута блокировки SQLite.
+
+Бланк и ключ ответов тестов с приближающимся Test.start_at заранее
+собираются фоновым потоком, чтобы первые запросы не строили их одновременно.
+"""
+from datetime import datetime, timedelta
+import logging
+import random
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from website import db
+from website.background import PeriodicWorker
+from website.models import Test
+
+logger = logging.getLogger(__name__)
+
+
+def is_lock_timeout(exc):
+    """Ошибка SQLite "database is locked" — повторимая, а не фатальная."""
+    return isinstance(exc, OperationalError) and 'locked' in str(exc.orig).lower()
+
+
+class AdmissionGate:
+
+    def __init__(self):
+        self.app = None
+        self.max_concurrent = 8
+        self.wait = 0.5
+        self.retry_after = 3
+        self.prewarm_lead = 600
+        self._lock = threading.Lock()
+        self._slots = {}  # test_id -> Semaphore
+        self._rejected = 0
+        self._worker = None
+
+    def init_app(self, app):
+        self.app = app
+        self.max_concurrent = app.config.get('ADMISSION_MAX_CONCURRENT', 8)
+        self.wait = app.config.get('ADMISSION_WAIT', 0.5)
+        self.retry_after = app.config.get('ADMISSION_RETRY_AFTER', 3)
+        self.prewarm_lead = app.config.get('PREWARM_LEAD', 600)
+        self._worker = None
+        if self.prewarm_lead and app.config.get('BACKGROUND_WORKERS', True):
+            self._worker = PeriodicWorker('exam-prewarm', self.prewarm,
+                                          app.config.get('PREWARM_INTERVAL', 60))
+            # Запуск с первым запросом, как у фоновой очистки (website/purge.py)
+            app.before_request(self._worker.ensure_started)
+
+    def _semaphore(self, test_id):
+        with self._lock:
+            slot = self._slots.get(test_id)
+            if slot is None:
+                slot = self._slots[test_id] = threading.Semaphore(self.max_concurrent)
+            return slot
+
+    def try_acquire(self, test_id):
+        """Занимает место для создания попытки; False — лимит исчерпан."""
+        if not self.max_concurrent:
+            return True
+        if self._semaphore(test_id).acquire(timeout=self.wait):
+            return True
+        with self._lock:
+            self._rejected += 1
+        return False
+
+    def release(self, test_id):
+        if self.max_concurrent:
+            self._semaphore(test_id).release()
+
+    def retry_delay(self):
+        """Пауза до повтора со случайным разбросом, чтобы повторы не шли залпом."""
+        return self.retry_after + random.randint(0, self.retry_after)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'rejected': self._rejected,
+            }
+
+    def prewarm(self):
+        """Собирает бланк и ключ ответов тестов, которые скоро начнутся."""
+        from website.grading import get_answer_key
+        from website.paper import get_paper
+
+        now = datetime.utcnow()
+        lead = timedelta(seconds=self.prewarm_lead)
+        # url_for во фрагментах бланка требует контекста запроса
+        with self.app.test_request_context():
+            try:
+                tests = Test.query.filter(
+                    Test.is_active.is_(True),
+                    Test.start_at.between(now - lead, now + lead)
+                ).all()
+                for test in tests:
+                    get_paper(test)
+                    get_answer_key(test)
+            finally:
+                db.session.remove()
+        return len(tests)
+
+
+admission = AdmissionGate()
@@ -0,0 +1,206 @@
+"""
+Статические файлы с долгим кешированием.
+
+asset_url() в шаблонах выдает адрес /assets/<отпечаток>/<путь>, где
+отпечаток — начало sha256 содержимого файла. Содержимое по такому адресу не
+меняется, поэтому ответ кешируется на год с Cache-Control: immutable, и
+повторная загрузка страницы не делает за ним запросов. Изменился файл —
+изменился адрес; запрос по старому адресу перенаправляется на новый.
+
+Если рядом с файлом лежат сжатые заранее file.br или file.gz (не старше
+оригинала), они отдаются клиентам, которые их принимают (Accept-Encoding).
+ETag и условные запросы (304) поддерживаются для всех вариантов.
+
+Bootstrap хранится локально в static/vendor (больничная сеть не всегда
+видит CDN): `flask build-assets` скачивает файлы из VENDOR_ASSETS с
+проверкой целостности и сжимает статику. Отпечатки этих файлов считаются
+при запуске. Если файла нет, страницы не открываются с ошибкой, называющей
+файл, — молча уйти на CDN, недоступный из закрытой сети, хуже. Для машин с
+доступом в интернет адрес CDN можно разрешить: VENDOR_CDN_FALLBACK.
+"""
+import base64
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import urllib.request
+
+import click
+from flask import abort, current_app, redirect, send_file, request, url_for
+from flask.cli import with_appcontext
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # без пакета Brotli файлы сжимаются только gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_EXTENSIONS = {'css', 'js', 'svg', 'json', 'map', 'txt', 'html'}
+
+# Сжатые варианты в порядке предпочтения: кодировка и расширение файла
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def is_compressible(filename):
+    return filename.rsplit('.', 1)[-1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def _fresh(path, compressed):
+    return os.path.isfile(compressed) and os.path.getmtime(compressed) >= os.path.getmtime(path)
+
+
+def immutable(response):
+    """Ответ с содержимым, адресуемым по хешу: кешировать на год без перепроверки."""
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+class Assets:
+
+    def __init__(self):
+        self.app = None
+        self.vendor = {}
+        self.cdn_fallback = False
+        self.missing = []
+        self._fingerprints = {}  # путь -> (mtime_ns, размер, отпечаток)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.vendor = app.config.get('VENDOR_ASSETS', {})
+        self.cdn_fallback = app.config.get('VENDOR_CDN_FALLBACK', False)
+        app.add_url_rule('/assets/<fingerprint>/<path:filename>', 'asset', self.serve)
+        app.add_template_global(self.url, 'asset_url')
+
+        # Отпечатки внешней статики считаются сразу, отсутствие файлов видно в журнале при запуске
+        self.missing = [filename for filename in self.vendor if self.fingerprint(filename) is None]
+        if self.missing:
+            logger.log(logging.WARNING if self.cdn_fallback else logging.ERROR,
+                       'Нет локальных файлов %s — выполните `flask build-assets`', ', '.join(self.missing))
+
+    def _path(self, filename):
+        path = safe_join(self.app.static_folder, filename)
+        return path if path and os.path.isfile(path) else None
+
+    def fingerprint(self, filename):
+        """Отпечаток содержимого; пересчитывается, только если файл изменился."""
+        path = self._path(filename)
+        if path is None:
+            return None
+        stat = os.stat(path)
+        cached = self._fingerprints.get(filename)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            while chunk := file.read(64 * 1024):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()[:16]
+        with self._lock:
+            self._fingerprints[filename] = (stat.st_mtime_ns, stat.st_size, fingerprint)
+        return fingerprint
+
+    def url(self, filename):
+        fingerprint = self.fingerprint(filename)
+        if fingerprint is None:
+            if filename in self.vendor:
+                if not self.cdn_fallback:
+                    raise RuntimeError(f'Нет файла static/{filename}: выполните `flask build-assets` '
+                                       f'или разрешите VENDOR_CDN_FALLBACK')
+                return self.vendor[filename][0]
+            return url_for('static', filename=filename)
+        return url_for('asset', fingerprint=fingerprint, filename=filename)
+
+    def serve(self, fingerprint, filename):
+        current = self.fingerprint(filename)
+        if current is None:
+            abort(404)
+        if fingerprint != current:
+            # Ссылка из старой страницы: файл с тех пор изменился
+            return redirect(url_for('asset', fingerprint=current, filename=filename))
+
+        path, encoding = self._path(filename), None
+        if is_compressible(filename):
+            for name, extension in _ENCODINGS:
+                if request.accept_encodings[name] and _fresh(path, path + extension):
+                    path, encoding = path + extension, name
+                    break
+
+        response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                             etag=f'{current}-{encoding or "identity"}', conditional=True,
+                             max_age=IMMUTABLE_MAX_AGE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if is_compressible(filename):
+            response.vary.add('Accept-Encoding')
+        return immutable(response)
+
+
+assets = Assets()
+
+
+def compress(path):
+    """Пишет path.gz (и path.br, если установлен Brotli), если их нет или они устарели."""
+    written = 0
+    with open(path, 'rb') as file:
+        data = file.read()
+    for _, extension in _ENCODINGS:
+        if _fresh(path, path + extension):
+            continue
+        if extension == '.br':
+            if brotli is None:
+                continue
+            compressed = brotli.compress(data, quality=11)
+        else:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(path + extension + '.part', 'wb') as target:
+            target.write(compressed)
+        os.replace(path + extension + '.part', path + extension)
+        written += 1
+    return written
+
+
+def download(url, integrity, path):
+    """Скачивает файл и сверяет его с хешем SRI (sha384-...)."""
+    with urllib.request.urlopen(url, timeout=30) as response:
+        data = response.read()
+    algorithm, expected = integrity.split('-', 1)
+    actual = base64.b64encode(hashlib.new(algorithm, data).digest()).decode()
+    if actual != expected:
+        raise click.ClickException(f'{url}: хеш не совпадает с {integrity}')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as target:
+        target.write(data)
+
+
+@click.command('build-assets')
+@click.option('--offline', is_flag=True, help='не скачивать отсутствующие файлы из VENDOR_ASSETS')
+@with_appcontext
+def build_assets_command(offline):
+    """Скачать Bootstrap в static/vendor и сжать статику в .gz/.br."""
+    static = current_app.static_folder
+    upload_folder = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    for filename, (url, integrity) in assets.vendor.items():
+        path = os.path.join(static, filename)
+        if not os.path.isfile(path) and not offline:
+            download(url, integrity, path)
+            click.echo(f'Скачан {filename}')
+
+    written = 0
+    for directory, _, files in os.walk(static):
+        if os.path.abspath(directory).startswith(upload_folder):
+            continue
+        for name in files:
+            if is_compressible(name):
+                written += compress(os.path.join(directory, name))
+    if brotli is None:
+        click.echo('Пакет Brotli не установлен — .br не создаются')
+    click.echo(f'Сжатых файлов записано: {written}')
@@ -1,63 +1,63 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
-from flask_login import login_user, logout_user, login_required, current_user
-from website import db
-from website.models import MedicalWorker
-from website.forms import LoginForm, RegistrationForm
-
-auth_bp = Blueprint('auth', __name__)
-
-
-@auth_bp.route('/login', methods=['GET', 'POST'])
-def login():
-    if current_user.is_authenticated:
-        return redirect(url_for('main.index'))
-
-    form = LoginForm()
-    if form.validate_on_submit():
-        user = MedicalWorker.query.filter_by(email=form.email.data).first()
-        if user and user.check_password(form.password.data):
-            login_user(user, remember=form.remember.data)
-            next_page = request.args.get('next')
-            flash('Вы успешно вошли в систему!', 'success')
-            return redirect(next_page or url_for('main.index'))
-        else:
-            flash('Неверный email или пароль', 'danger')
-
-    return render_template('login.html', form=form, title='Вход')
-
-
-@auth_bp.route('/register', methods=['GET', 'POST'])
-def register():
-    if current_user.is_authenticated:
-        return redirect(url_for('main.index'))
-
-    form = RegistrationForm()
-    if form.validate_on_submit():
-        user = MedicalWorker(
-            email=form.email.data,
-            username=form.username.data,
-            first_name=form.first_name.data,
-            last_name=form.last_name.data,
-            specialization=form.specialization.data,
-            license_number=form.license_number.data,
-            institution=form.institution.data,
-            position=form.position.data,
-            years_experience=form.years_experience.data
-        )
-        user.set_password(form.password.data)
-
-        db.session.add(user)
-        db.session.commit()
-
-        flash('Регистрация успешна! Теперь вы можете войти.', 'success')
-        return redirect(url_for('auth.login'))
-
-    return render_template('register.html', form=form, title='Регистрация')
-
-
-@auth_bp.route('/logout')
-@login_required
-def logout():
-    logout_user()
-    flash('Вы вышли из системы.', 'info')
+from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask_login import login_user, logout_user, login_required, current_user
+from website import db
+from website.models import MedicalWorker
+from website.forms import LoginForm, RegistrationForm
+
+auth_bp = Blueprint('auth', __name__)
+
+
+@auth_bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.index'))
+
+    form = LoginForm()
+    if form.validate_on_submit():
+        user = MedicalWorker.query.filter_by(email=form.email.data).first()
+        if user and user.check_password(form.password.data):
+            login_user(user, remember=form.remember.data)
+            next_page = request.args.get('next')
+            flash('Вы успешно вошли в систему!', 'success')
+            return redirect(next_page or url_for('main.index'))
+        else:
+            flash('Неверный email или пароль', 'danger')
+
+    return render_template('login.html', form=form, title='Вход')
+
+
+@auth_bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.index'))
+
+    form = RegistrationForm()
+    if form.validate_on_submit():
+        user = MedicalWorker(
+            email=form.email.data,
+            username=form.username.data,
+            first_name=form.first_name.data,
+            last_name=form.last_name.data,
+            specialization=form.specialization.data,
+            license_number=form.license_number.data,
+            institution=form.institution.data,
+            position=form.position.data,
+            years_experience=form.years_experience.data
+        )
+        user.set_password(form.password.data)
+
+        db.session.add(user)
+        db.session.commit()
+
+        flash('Регистрация успешна! Теперь вы можете войти.', 'success')
+        return redirect(url_for('auth.login'))
+
+    return render_template('register.html', form=form, title='Регистрация')
+
+
+@auth_bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash('Вы вышли из системы.', 'info')
     return redirect(url_for('main.index'))
\ No newline at end of file
@@ -0,0 +1,48 @@
+from collections import OrderedDict
+import threading
+
+
+class LRUCache:
+    """Небольшой потокобезопасный LRU-кеш в памяти процесса."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_build(self, key, builder):
+        """Возвращает значение из кеша, при промахе строит его через builder()."""
+        value = self.get(key)
+        if value is None:
+            # Строим вне блокировки: повторная сборка при гонке безопасна,
+            # а ждать медленный запрос к БД под локом — нет.
+            value = builder()
+            self.set(key, value)
+        return value
+
+    def discard_where(self, predicate):
+        """Удаляет все записи, ключ которых удовлетворяет predicate(key)."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,125 @@
+"""
+Каталог тестов для пользователя и список тестов в панели модератора.
+
+Список доступных тестов собирается одним запросом: к тестам по первичному
+ключу присоединяется сводное состояние пользователя (user_test_status).
+Результат — легкие строки (namedtuple), а не ORM-объекты со связями.
+Фильтры по категории, сложности и типу доступа применяются в запросе,
+страницы выбираются по курсору (created_at, id), а не через OFFSET.
+
+В панели модератора число вопросов и подписчиков считается не загрузкой
+связей, а сгруппированными подзапросами, ограниченными тестами страницы.
+"""
+from collections import namedtuple
+
+from sqlalchemy import case, func, or_, select
+
+from website import db
+from website.models import MedicalWorker, Question, Test, TestSubscription, UserTestStatus
+from website.pagination import keyset_page, seek
+
+
+class TestRow(namedtuple('TestRow', 'id title description difficulty time_limit access_type is_active '
+                                     'created_at subscribed result_id percentage passed')):
+    """Тест в каталоге со сводным состоянием для пользователя."""
+    __slots__ = ()
+
+    @property
+    def status(self):
+        if self.passed:
+            return 'passed'
+        return 'not_started' if self.percentage is None else 'failed'
+
+
+def list_tests(worker_id, category_id=None, difficulty=None, access_type=None, after=None, limit=24):
+    """
+    Страница активных тестов, доступных пользователю: обычные и назначенные
+    ему по подписке, новые первыми. after — курсор последнего теста
+    предыдущей страницы. Возвращает строки и курсор следующей страницы (или None).
+    """
+    query = db.session.query(
+        Test.id, Test.title, Test.description, Test.difficulty, Test.time_limit,
+        Test.access_type, Test.is_active, Test.created_at,
+        func.coalesce(UserTestStatus.subscribed, False),
+        UserTestStatus.last_result_id, UserTestStatus.best_percentage, UserTestStatus.passed
+    ).outerjoin(
+        UserTestStatus, (UserTestStatus.test_id == Test.id) & (UserTestStatus.worker_id == worker_id)
+    ).filter(
+        Test.is_active.is_(True),
+        or_(Test.access_type == 'simple', UserTestStatus.subscribed.is_(True))
+    )
+
+    if category_id:
+        query = query.filter(Test.category_id == category_id)
+    if difficulty:
+        query = query.filter(Test.difficulty == difficulty)
+    if access_type:
+        query = query.filter(Test.access_type == access_type)
+
+    # Keyset-пагинация: продолжаем с позиции курсора по индексу (created_at, id),
+    # стоимость страницы не зависит от ее номера
+    rows, next_cursor = keyset_page(query, Test.created_at, Test.id, after, limit)
+    return [TestRow(*row) for row in rows], next_cursor
+
+
+class ModeratorTestRow(namedtuple('ModeratorTestRow', 'id title description difficulty is_active access_type '
+                                                     'created_at created_by author_first_name author_last_name '
+                                                     'question_count subscriber_count')):
+    """Тест в панели модератора с числом вопросов и подписчиков."""
+    __slots__ = ()
+
+    @property
+    def author_name(self):
+        if self.author_last_name is None:
+            return None
+        return f'{self.author_first_name} {self.author_last_name}'
+
+
+def _counts(test_ids):
+    """Число вопросов и подписчиков по тестам: test_id -> (вопросы, подписчики)."""
+    if not test_ids:
+        return {}
+    questions = select(Question.test_id, func.count().label('total')).where(
+        Question.test_id.in_(test_ids)).group_by(Question.test_id).subquery()
+    subscribers = select(TestSubscription.test_id, func.count().label('total')).where(
+        TestSubscription.test_id.in_(test_ids)).group_by(TestSubscription.test_id).subquery()
+    rows = db.session.query(
+        Test.id, func.coalesce(questions.c.total, 0), func.coalesce(subscribers.c.total, 0)
+    ).outerjoin(
+        questions, questions.c.test_id == Test.id
+    ).outerjoin(
+        subscribers, subscribers.c.test_id == Test.id
+    ).filter(Test.id.in_(test_ids))
+    return {test_id: (question_count, subscriber_count) for test_id, question_count, subscriber_count in rows}
+
+
+def moderator_tests(created_by=None, after=None, limit=None):
+    """
+    Тесты для панели модератора, новые первыми: все или созданные created_by.
+    С limit — страница по курсору after и курсор следующей страницы,
+    без limit — все тесты и None.
+    """
+    query = db.session.query(
+        Test.id, Test.title, Test.description, Test.difficulty, Test.is_active, Test.access_type,
+        Test.created_at, Test.created_by, MedicalWorker.first_name, MedicalWorker.last_name
+    ).outerjoin(
+        MedicalWorker, MedicalWorker.id == Test.created_by
+    ).filter(Test.deleted_at.is_(None))
+    if created_by is not None:
+        query = query.filter(Test.created_by == created_by)
+
+    if limit is None:
+        rows, next_cursor = seek(query, Test.created_at, Test.id, after).all(), None
+    else:
+        rows, next_cursor = keyset_page(query, Test.created_at, Test.id, after, limit)
+
+    counts = _counts([row.id for row in rows])
+    return [ModeratorTestRow(*row, *counts.get(row.id, (0, 0))) for row in rows], next_cursor
+
+
+def test_totals():
+    """Всего тестов и из них активных — одним запросом."""
+    total, active = db.session.query(
+        func.count(Test.id), func.coalesce(func.sum(case((Test.is_active.is_(True), 1), else_=0)), 0)
+    ).filter(Test.deleted_at.is_(None)).one()
+    return total, active
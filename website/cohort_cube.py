@@ -0,0 +1,228 @@
+"""
+Куб отчетности по когортам.
+
+Каждая проверенная попытка добавляется к строке cohort_cube с ключом
+(тест, месяц, учреждение, специализация, должность, группа стажа).
+Отчет по любому подмножеству измерений — GROUP BY по строкам куба,
+которых на порядки меньше, чем попыток, поэтому его стоимость не растет
+с историей результатов. Пересчет с нуля — `flask rebuild-cohort-cube`.
+
+Атрибуты пользователя фиксируются в попытке при проверке (freeze_cohort):
+удаляемая попытка вычитается из той же строки куба, в которую была
+добавлена, даже если профиль пользователя с тех пор изменился.
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from website import db
+from website.models import CohortCube, MedicalWorker, Test, TestResult
+from website.rollup import upsert
+from website.worker_stats import month_of
+
+_cube = CohortCube.__table__
+
+# Измерение: (колонка куба, подпись)
+DIMENSIONS = {
+    'test': ('test_id', 'Тест'),
+    'month': ('month', 'Месяц'),
+    'institution': ('institution', 'Учреждение'),
+    'specialization': ('specialization', 'Специализация'),
+    'position': ('position', 'Должность'),
+    'experience': ('experience_band', 'Стаж, лет'),
+}
+
+# Группы стажа: (верхняя граница включительно, подпись)
+EXPERIENCE_BANDS = ((2, '0-2'), (5, '3-5'), (10, '6-10'), (20, '11-20'))
+EXPERIENCE_TOP = '20+'
+
+
+def experience_band(years):
+    years = years or 0
+    for upper, label in EXPERIENCE_BANDS:
+        if years <= upper:
+            return label
+    return EXPERIENCE_TOP
+
+
+def _experience_band_sql(column):
+    return case(*((func.coalesce(column, 0) <= upper, label) for upper, label in EXPERIENCE_BANDS),
+                else_=EXPERIENCE_TOP)
+
+
+def _add(key, attempts, passed, score_sum):
+    upsert(_cube, key, {
+        'attempts': _cube.c.attempts + attempts,
+        'passed': _cube.c.passed + passed,
+        'score_sum': _cube.c.score_sum + score_sum,
+    }, {'attempts': attempts, 'passed': passed, 'score_sum': score_sum})
+
+
+def freeze_cohort(result):
+    """Записывает в попытку текущие атрибуты пользователя — ключ когорты (без коммита)."""
+    worker = db.session.query(
+        MedicalWorker.institution, MedicalWorker.specialization,
+        MedicalWorker.position, MedicalWorker.years_experience
+    ).filter_by(id=result.worker_id).first()
+    if worker is None:
+        return
+    values = {
+        'institution': worker.institution or '',
+        'specialization': worker.specialization or '',
+        'position': worker.position or '',
+        'experience_band': experience_band(worker.years_experience),
+    }
+    db.session.execute(update(TestResult).where(TestResult.id == result.id).values(**values),
+                       execution_options={'synchronize_session': False})
+    for name, value in values.items():
+        set_committed_value(result, name, value)
+
+
+def freeze_missing():
+    """
+    Ключ когорты для проверенных попыток без него (проверенных до его
+    появления) — по нынешним атрибутам пользователя. Возвращает число попыток.
+    """
+    def attribute(expression):
+        return select(expression).where(MedicalWorker.id == TestResult.worker_id).scalar_subquery()
+
+    return db.session.execute(update(TestResult).where(
+        TestResult.experience_band.is_(None),
+        TestResult.worker_id.isnot(None),
+        TestResult.percentage.isnot(None)
+    ).values(
+        institution=attribute(func.coalesce(MedicalWorker.institution, '')),
+        specialization=attribute(func.coalesce(MedicalWorker.specialization, '')),
+        position=attribute(func.coalesce(MedicalWorker.position, '')),
+        experience_band=attribute(_experience_band_sql(MedicalWorker.years_experience)),
+    ), execution_options={'synchronize_session': False}).rowcount
+
+
+def record_completion(result):
+    """Добавляет проверенную попытку к кубу по ее ключу когорты (без коммита)."""
+    if result.test_id is None or result.completed_at is None or result.percentage is None \
+            or result.experience_band is None:
+        return
+    _add({
+        'test_id': result.test_id,
+        'month': month_of(result.completed_at),
+        'institution': result.institution,
+        'specialization': result.specialization,
+        'position': result.position,
+        'experience_band': result.experience_band,
+    }, 1, 1 if result.passed else 0, result.percentage)
+
+
+def _aggregates(*criteria):
+    """Строки куба, посчитанные по test_results (для пересчета и вычитания)."""
+    key = (
+        TestResult.test_id,
+        func.strftime('%Y-%m', TestResult.completed_at),
+        TestResult.institution,
+        TestResult.specialization,
+        TestResult.position,
+        TestResult.experience_band,
+    )
+    return db.session.query(
+        *key,
+        func.count(TestResult.id),
+        func.sum(case((TestResult.passed.is_(True), 1), else_=0)),
+        func.sum(TestResult.percentage)
+    ).filter(
+        TestResult.test_id.isnot(None),
+        TestResult.completed_at.isnot(None),
+        TestResult.percentage.isnot(None),
+        TestResult.experience_band.isnot(None),
+        *criteria
+    ).group_by(*key)
+
+
+_KEY = ('test_id', 'month', 'institution', 'specialization', 'position', 'experience_band')
+
+
+def forget_test(test_id):
+    CohortCube.query.filter_by(test_id=test_id).delete(synchronize_session=False)
+
+
+def discount_results(*criteria):
+    """Вычитает попытки, выбранные условиями по TestResult, перед их удалением."""
+    for row in _aggregates(*criteria):
+        _add(dict(zip(_KEY, row[:6])), -row[6], -row[7], -row[8])
+
+
+def discount_worker(worker_id):
+    """Вычитает попытки пользователя перед их удалением (по ключам когорты самих попыток)."""
+    discount_results(TestResult.worker_id == worker_id)
+
+
+def query_cube(group_by, filters=None, month_from=None, month_to=None):
+    """
+    Срез куба: group_by — список измерений из DIMENSIONS, filters — значения
+    измерений (измерение -> значение). Возвращает список словарей с
+    измерениями, числом попыток, долей сдавших и средним процентом.
+    """
+    columns = [_cube.c[DIMENSIONS[name][0]].label(name) for name in group_by]
+    query = db.session.query(
+        *columns,
+        func.sum(_cube.c.attempts).label('attempts'),
+        func.sum(_cube.c.passed).label('passed'),
+        func.sum(_cube.c.score_sum).label('score_sum')
+    ).select_from(_cube)
+
+    for name, value in (filters or {}).items():
+        query = query.filter(_cube.c[DIMENSIONS[name][0]] == value)
+    if month_from:
+        query = query.filter(_cube.c.month >= month_from)
+    if month_to:
+        query = query.filter(_cube.c.month <= month_to)
+
+    rows = []
+    for row in query.group_by(*columns).order_by(*columns):
+        attempts = row.attempts or 0
+        if not attempts:
+            continue
+        item = {name: getattr(row, name) for name in group_by}
+        item.update(attempts=attempts, passed=row.passed,
+                    pass_rate=round(row.passed / attempts * 100, 1),
+                    avg_score=round(row.score_sum / attempts, 1))
+        rows.append(item)
+
+    if 'test' in group_by and rows:
+        titles = dict(db.session.query(Test.id, Test.title).filter(
+            Test.id.in_({row['test'] for row in rows})))
+        for row in rows:
+            row['test_title'] = titles.get(row['test'], 'Тест удален')
+    return rows
+
+
+def dimension_values():
+    """Значения измерений, встречающиеся в кубе, — для фильтров отчета."""
+    values = {}
+    for name, (column, _label) in DIMENSIONS.items():
+        if name == 'test':
+            values[name] = db.session.query(Test.id, Test.title).filter(
+                Test.id.in_(db.session.query(_cube.c.test_id).distinct())
+            ).order_by(Test.title).all()
+        else:
+            values[name] = [row[0] for row in db.session.query(_cube.c[column]).distinct().order_by(_cube.c[column])]
+    return values
+
+
+def rebuild():
+    freeze_missing()
+    db.session.execute(_cube.delete())
+    rows = [dict(zip(_KEY, row[:6]), attempts=row[6], passed=row[7], score_sum=row[8])
+            for row in _aggregates()]
+    if rows:
+        db.session.execute(insert(_cube), rows)
+    return len(rows)
+
+
+@click.command('rebuild-cohort-cube')
+@with_appcontext
+def rebuild_command():
+    """Пересчитать куб отчетности по когортам из результатов."""
+    count = rebuild()
+    db.session.commit()
+    click.echo(f'cohort_cube: {count} строк')
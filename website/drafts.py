@@ -0,0 +1,144 @@
+"""
+Черновики ответов (автосохранение) с отложенной записью.
+
+Изменения от браузера копятся в памяти процесса: повторные правки одного
+вопроса схлопываются в последнее значение. Буфер сбрасывается в user_answers
+пачкой (один DELETE и один INSERT на весь пакет) по таймеру или при
+достижении порога, а также перед тем, как ответы попытки читают из БД.
+Сброс и коммит идут под одной блокировкой: черновики, взятые из буфера,
+не видны другим потокам только до коммита, который они ждут.
+"""
+import atexit
+import logging
+import threading
+
+from sqlalchemy import tuple_
+
+from website import db
+from website.background import PeriodicWorker
+from website.grading import insert_user_answers, answer_row
+from website.models import TestResult, UserAnswer
+
+logger = logging.getLogger(__name__)
+
+
+class DraftBuffer:
+
+    def __init__(self):
+        self.app = None
+        self.threshold = 500
+        self._pending = {}  # result_id -> {question_id: ответ или None}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._worker = None
+
+    def init_app(self, app):
+        self.app = app
+        self.threshold = app.config.get('DRAFT_FLUSH_THRESHOLD', 500)
+        self._worker = PeriodicWorker('draft-flush', self.flush,
+                                      app.config.get('DRAFT_FLUSH_INTERVAL', 5))
+        atexit.register(self.flush)
+
+    def put(self, result_id, changes):
+        """Добавляет изменения попытки; None означает "ответ очищен"."""
+        with self._lock:
+            drafts = self._pending.setdefault(result_id, {})
+            before = len(drafts)
+            drafts.update(changes)
+            self._size += len(drafts) - before
+            full = self._size >= self.threshold
+
+        if full:
+            self._worker.wake()
+        else:
+            self._worker.ensure_started()
+
+    def pending_count(self):
+        return self._size
+
+    def _take(self, result_id=None):
+        with self._lock:
+            if result_id is None:
+                batch, self._pending, self._size = self._pending, {}, 0
+            else:
+                batch = {}
+                if result_id in self._pending:
+                    batch[result_id] = self._pending.pop(result_id)
+                    self._size -= len(batch[result_id])
+        return batch
+
+    def _restore(self, batch):
+        """Возвращает несохраненный пакет в буфер, не затирая более свежие правки."""
+        with self._lock:
+            for result_id, drafts in batch.items():
+                current = self._pending.setdefault(result_id, {})
+                for question_id, value in drafts.items():
+                    if question_id not in current:
+                        current[question_id] = value
+                        self._size += 1
+
+    def _write(self, batch):
+        # Попытки, завершенные после постановки правок в буфер, не трогаем
+        open_ids = {
+            row[0] for row in db.session.query(TestResult.id).filter(
+                TestResult.id.in_(batch.keys()),
+                TestResult.completed_at.is_(None)
+            )
+        }
+        keys = [(result_id, question_id)
+                for result_id in open_ids for question_id in batch[result_id]]
+        if not keys:
+            return 0
+
+        UserAnswer.query.filter(
+            tuple_(UserAnswer.result_id, UserAnswer.question_id).in_(keys)
+        ).delete(synchronize_session=False)
+
+        rows = []
+        for result_id in open_ids:
+            for question_id, value in batch[result_id].items():
+                if value is not None:
+                    rows.append(dict(answer_row(question_id, value), result_id=result_id))
+        insert_user_answers(rows)
+        return len(keys)
+
+    def _commit(self, batch):
+        """Записывает и коммитит пакет; при ошибке возвращает его в буфер."""
+        try:
+            written = self._write(batch)
+            db.session.commit()
+            return written
+        except Exception:
+            db.session.rollback()
+            self._restore(batch)
+            raise
+
+    def flush(self):
+        """Сбрасывает весь буфер в БД (фоновый поток, завершение процесса)."""
+        if self.app is None:
+            return 0
+        with self.app.app_context(), self._flush_lock:
+            batch = self._take()
+            if not batch:
+                return 0
+            try:
+                return self._commit(batch)
+            except Exception:
+                logger.exception('Не удалось сохранить черновики ответов')
+                return 0
+            finally:
+                db.session.remove()
+
+    def flush_result(self, result_id):
+        """
+        Сбрасывает черновики одной попытки и коммитит их (в сессии запроса не
+        должно быть других незакоммиченных изменений). Вызывается перед
+        чтением ответов попытки из БД.
+        """
+        with self._flush_lock:
+            batch = self._take(result_id)
+            return self._commit(batch) if batch else 0
+
+
+drafts = DraftBuffer()
@@ -0,0 +1,293 @@
+"""
+Проверка ответов на тест.
+
+Для каждого теста один раз собирается "ключ ответов" — компактная структура
+в памяти (баллы, тип вопроса, id правильных ответов, сопоставитель
+текстовых ответов). Ключ кешируется по (test_id, content_version), поэтому
+проверка отправленного теста не обращается к таблице answers.
+"""
+from collections import namedtuple
+from datetime import datetime
+import json
+
+from sqlalchemy import insert, update, bindparam
+from sqlalchemy.orm.attributes import set_committed_value
+
+from website import db
+from website.cache import LRUCache
+from website.models import Question, Answer, TestResult, UserAnswer
+from website.text_matching import TextMatcher, normalize_answer
+from website import cohort_cube, mastery, test_status, worker_stats
+
+QuestionKey = namedtuple('QuestionKey', 'id points question_type correct_ids matcher topic level')
+
+
+class AnswerKey:
+    """Скомпилированный ключ ответов одного теста."""
+
+    def __init__(self, test_id, version, questions):
+        self.test_id = test_id
+        self.version = version
+        self.questions = tuple(questions)
+        self.by_id = {q.id: q for q in self.questions}
+        self.total_points = sum(q.points for q in self.questions)
+
+
+_answer_keys = LRUCache(maxsize=256)
+
+
+def build_answer_key(test_id, version):
+    """Собирает ключ ответов теста одним запросом к БД."""
+    rows = db.session.query(
+        Question.id, Question.points, Question.question_type, Question.text_tolerance,
+        Question.topic, Question.question_level,
+        Answer.id, Answer.text, Answer.normalized_text, Answer.is_correct
+    ).outerjoin(
+        Answer, Answer.question_id == Question.id
+    ).filter(
+        Question.test_id == test_id
+    ).order_by(Question.id, Answer.id).all()
+
+    questions = {}
+    for (question_id, points, question_type, tolerance, topic, level,
+         answer_id, answer_text, normalized_text, is_correct) in rows:
+        entry = questions.setdefault(question_id, {
+            'points': points or 0,
+            'question_type': question_type,
+            'topic': topic,
+            'level': level,
+            'tolerance': 1 if tolerance is None else tolerance,
+            'correct_ids': set(),
+            'variants': [],
+        })
+        if answer_id is not None and is_correct:
+            entry['correct_ids'].add(answer_id)
+            # Старые ответы могли быть сохранены без нормализованной формы
+            entry['variants'].append(normalized_text or normalize_answer(answer_text))
+
+    return AnswerKey(test_id, version, (
+        QuestionKey(
+            id=question_id,
+            points=entry['points'],
+            question_type=entry['question_type'],
+            correct_ids=frozenset(entry['correct_ids']),
+            matcher=(TextMatcher(entry['variants'], entry['tolerance'])
+                     if entry['question_type'] == 'text' else None),
+            topic=entry['topic'],
+            level=entry['level'],
+        )
+        for question_id, entry in questions.items()
+    ))
+
+
+def get_answer_key(test):
+    """Ключ ответов теста из кеша (или собранный заново при смене версии)."""
+    version = test.content_version or 0
+    return _answer_keys.get_or_build(
+        (test.id, version),
+        lambda: build_answer_key(test.id, version)
+    )
+
+
+def invalidate_test(test_id):
+    """Сбрасывает закешированные ключи ответов теста (например, при удалении)."""
+    _answer_keys.discard_where(lambda key: key[0] == test_id)
+
+
+def collect_answers(answer_key, form, question_ids=None):
+    """
+    Извлекает ответы пользователя из формы.
+    Возвращает словарь question_id -> список id ответов или текст.
+    question_ids ограничивает разбор вопросами одной страницы.
+    """
+    answers = {}
+    for question in answer_key.questions:
+        if question_ids is not None and question.id not in question_ids:
+            continue
+        if question.question_type == 'text':
+            text_answer = form.get(f'question_text_{question.id}', '').strip()
+            if text_answer:
+                answers[question.id] = text_answer
+        else:
+            try:
+                answer_ids = [int(value) for value in form.getlist(f'question_{question.id}')]
+            except ValueError:
+                continue
+            if question.question_type == 'single':
+                answer_ids = answer_ids[:1]
+            if answer_ids:
+                answers[question.id] = answer_ids
+    return answers
+
+
+def grade_answers(answer_key, answers):
+    """
+    Проверяет ответы целиком в памяти.
+    Возвращает набранные баллы и строки для таблицы user_answers.
+    """
+    score = 0
+    rows = []
+
+    for question_id, value in answers.items():
+        question = answer_key.by_id.get(question_id)
+        if question is None:
+            continue
+
+        if question.question_type == 'text':
+            is_correct = question.matcher.matches(value)
+        else:
+            # Все правильные ответы выбраны и нет ни одного неправильного
+            is_correct = set(value) == question.correct_ids
+
+        row = answer_row(question_id, value, is_correct)
+        if is_correct:
+            score += question.points
+        rows.append(row)
+
+    return score, rows
+
+
+def answer_row(question_id, value, is_correct=None):
+    """Строка user_answers для ответа: список id вариантов или текст."""
+    if isinstance(value, str):
+        return {'question_id': question_id, 'answer_ids': None,
+                'text_answer': value, 'is_correct': is_correct}
+    return {'question_id': question_id, 'answer_ids': json.dumps(value),
+            'text_answer': None, 'is_correct': is_correct}
+
+
+def load_saved_answers(result_id, question_ids=None):
+    """Уже сохраненные (в т.ч. непроверенные) ответы попытки: question_id -> ответ."""
+    query = db.session.query(
+        UserAnswer.question_id, UserAnswer.answer_ids, UserAnswer.text_answer
+    ).filter(UserAnswer.result_id == result_id)
+    if question_ids is not None:
+        query = query.filter(UserAnswer.question_id.in_(question_ids))
+
+    return {
+        question_id: json.loads(answer_ids) if answer_ids else text_answer
+        for question_id, answer_ids, text_answer in query
+    }
+
+
+def store_answers(result_id, answers, question_ids):
+    """
+    Сохраняет непроверенные ответы для набора вопросов (например, страницы):
+    прежние строки этих вопросов заменяются, проверка — при завершении теста.
+    """
+    UserAnswer.query.filter(
+        UserAnswer.result_id == result_id,
+        UserAnswer.question_id.in_(question_ids)
+    ).delete(synchronize_session=False)
+    save_user_answers(result_id, [
+        answer_row(question_id, value)
+        for question_id, value in answers.items() if question_id in question_ids
+    ])
+
+
+def save_user_answers(result_id, rows):
+    """
+    Записывает все ответы попытки одним пакетным INSERT (executemany).
+    Коммит остается за вызывающим кодом — вместе с обновлением TestResult.
+    """
+    insert_user_answers([dict(row, result_id=result_id) for row in rows])
+
+
+def insert_user_answers(rows):
+    """Пакетная вставка строк user_answers (с уже заполненным result_id)."""
+    if rows:
+        # Core-вставка: ORM-режим дробит пакет на группы по набору
+        # непустых колонок, а здесь нужен ровно один executemany
+        db.session.execute(insert(UserAnswer.__table__), rows)
+
+
+def complete_attempt(result, test, answers, replace=False):
+    """
+    Проверяет ответы и завершает попытку (без коммита).
+    replace=True — у попытки уже есть сохраненные строки, они заменяются проверенными.
+    Возвращает False, если попытку уже оценили — тогда ответы не перезаписываются.
+    """
+    answer_key = get_answer_key(test)
+    score, graded = grade_answers(answer_key, answers)
+
+    finish_attempt(result)
+    if not _set_score(result, test, answer_key, score, graded):
+        return False
+
+    if replace:
+        UserAnswer.query.filter_by(result_id=result.id).delete(synchronize_session=False)
+    # Все ответы попытки — одним пакетным INSERT в той же транзакции
+    save_user_answers(result.id, graded)
+    return True
+
+
+def record_attempt(result, answers, replace=False):
+    """
+    Асинхронный режим: сохраняет ответы без проверки и фиксирует время
+    завершения (без коммита). Проверку выполняет grade_recorded_attempt.
+    """
+    if replace:
+        UserAnswer.query.filter_by(result_id=result.id).delete(synchronize_session=False)
+    save_user_answers(result.id, [answer_row(question_id, value) for question_id, value in answers.items()])
+    finish_attempt(result)
+
+
+def grade_recorded_attempt(result):
+    """
+    Проверяет сохраненные ответы завершенной попытки и заполняет is_correct (без коммита).
+    Возвращает False, если попытку уже оценил другой обработчик.
+    """
+    test = result.test
+    answer_key = get_answer_key(test)
+    score, graded = grade_answers(answer_key, load_saved_answers(result.id))
+    if not _set_score(result, test, answer_key, score, graded):
+        return False
+
+    if graded:
+        table = UserAnswer.__table__
+        db.session.execute(
+            update(table).where(
+                table.c.result_id == bindparam('rid'),
+                table.c.question_id == bindparam('qid')
+            ).values(is_correct=bindparam('correct')),
+            [{'rid': result.id, 'qid': row['question_id'], 'correct': row['is_correct']}
+             for row in graded]
+        )
+    return True
+
+
+def finish_attempt(result):
+    if result.completed_at is None:
+        result.completed_at = datetime.utcnow()
+        result.time_taken = (result.completed_at - result.started_at).seconds
+
+
+def _set_score(result, test, answer_key, score, graded):
+    """
+    Записывает оценку одним UPDATE ... WHERE passed IS NULL и только тогда
+    обновляет сводки. False — попытку уже оценил другой поток или процесс
+    (повторная отправка, повторная постановка в очередь): сводки не трогаем,
+    иначе попытка была бы учтена в них дважды.
+    """
+    total_points = answer_key.total_points
+    percentage = (score / total_points * 100) if total_points > 0 else 0
+    passed = percentage >= test.passing_score
+    claimed = db.session.execute(
+        update(TestResult).where(
+            TestResult.id == result.id, TestResult.passed.is_(None)
+        ).values(score=score, percentage=percentage, passed=passed),
+        execution_options={'synchronize_session': False}
+    ).rowcount == 1
+    if not claimed:
+        db.session.refresh(result)
+        return False
+
+    set_committed_value(result, 'score', score)
+    set_committed_value(result, 'percentage', percentage)
+    set_committed_value(result, 'passed', passed)
+    cohort_cube.freeze_cohort(result)
+    test_status.record_completion(result)
+    worker_stats.record_completion(result)
+    mastery.record_attempt(result, answer_key, graded)
+    cohort_cube.record_completion(result)
+    return True
@@ -0,0 +1,106 @@
+"""
+Очередь асинхронной проверки попыток (включается ASYNC_GRADING).
+
+Отправка теста только сохраняет ответы и время завершения, а проверку
+выполняет локальный пул потоков — внешний брокер не нужен. Глубина
+очереди и задержка проверки доступны для мониторинга через stats().
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+from website import db
+from website.models import TestResult
+
+logger = logging.getLogger(__name__)
+
+
+class GradingQueue:
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._running = 0
+        self._graded = 0
+        self._failed = 0
+        self._latencies = deque(maxlen=1000)  # секунды от постановки до записи результата
+
+    def init_app(self, app):
+        self.app = app
+        self._workers = app.config.get('GRADING_WORKERS', 2)
+
+    @property
+    def enabled(self):
+        return bool(self.app and self.app.config.get('ASYNC_GRADING'))
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                                        thread_name_prefix='grading')
+        return self._executor
+
+    def enqueue(self, result_id):
+        """Ставит попытку в очередь; повторная постановка той же попытки игнорируется."""
+        with self._lock:
+            if result_id in self._queued:
+                return False
+            self._queued.add(result_id)
+        self._get_executor().submit(self._run, result_id, time.monotonic())
+        return True
+
+    def is_queued(self, result_id):
+        return result_id in self._queued
+
+    def _run(self, result_id, enqueued_at):
+        from website.grading import grade_recorded_attempt
+
+        with self._lock:
+            self._running += 1
+        try:
+            with self.app.app_context():
+                try:
+                    result = db.session.get(TestResult, result_id)
+                    if result is not None and result.passed is None:
+                        grade_recorded_attempt(result)
+                        db.session.commit()
+                    with self._lock:
+                        self._graded += 1
+                        self._latencies.append(time.monotonic() - enqueued_at)
+                except Exception:
+                    db.session.rollback()
+                    with self._lock:
+                        self._failed += 1
+                    logger.exception('Не удалось проверить попытку %s', result_id)
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._queued.discard(result_id)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'enabled': self.enabled,
+                'queue_depth': len(self._queued) - self._running,
+                'in_progress': self._running,
+                'graded': self._graded,
+                'failed': self._failed,
+            }
+        if latencies:
+            stats['latency_ms'] = {
+                'avg': round(sum(latencies) / len(latencies) * 1000, 1),
+                'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                'max': round(latencies[-1] * 1000, 1),
+            }
+        return stats
+
+
+grading_queue = GradingQueue()
@@ -0,0 +1,243 @@
+"""
+Изображения вопросов.
+
+Загруженный файл сохраняется под именем из хеша содержимого (sha256), поэтому
+одинаковые изображения хранятся один раз, а содержимое файла под данным
+именем никогда не меняется — ответы можно кешировать надолго.
+
+Для показа пул процессов (вне потока запроса) строит варианты шириной
+IMAGE_WIDTHS в JPEG и WebP: с поворотом по EXIF, без метаданных и не больше
+оригинала. Шаблоны выводят их через srcset, и браузер сам выбирает размер.
+Пока вариант не построен, маршрут main.question_image отдает оригинал и
+ставит изображение в очередь — так же обрабатываются файлы, загруженные до
+появления вариантов (или все сразу: `flask process-images`). SVG и GIF
+(векторные и анимированные) показываются как есть.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+
+import click
+from flask import url_for
+from flask.cli import with_appcontext
+from PIL import Image, ImageOps
+
+from website import db
+from website.models import Question
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp'}
+VARIANTS_FOLDER = 'variants'
+
+# Формат Pillow и параметры сохранения для каждого расширения варианта
+_VARIANT_FORMATS = {
+    'jpg': ('JPEG', {'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'method': 4}),
+}
+
+
+def extension_of(filename):
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+
+
+def is_processed(filename):
+    """Строятся ли для файла варианты (растровые форматы без анимации)."""
+    return extension_of(filename) in PROCESSED_EXTENSIONS
+
+
+def variant_name(filename, width, extension):
+    return f'{filename.rsplit(".", 1)[0]}_{width}.{extension}'
+
+
+def store(source, extension, folder):
+    """
+    Сохраняет поток source в folder под именем <sha256>.<extension>; если такое
+    содержимое уже есть, второй файл не создается. Возвращает имя файла.
+    """
+    extension = 'jpg' if extension == 'jpeg' else extension
+    digest = hashlib.sha256()
+    handle, temporary = tempfile.mkstemp(suffix='.part', dir=folder)
+    try:
+        with os.fdopen(handle, 'wb') as target:
+            while chunk := source.read(64 * 1024):
+                digest.update(chunk)
+                target.write(chunk)
+        filename = f'{digest.hexdigest()[:32]}.{extension}'
+        if not os.path.exists(os.path.join(folder, filename)):
+            os.replace(temporary, os.path.join(folder, filename))
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    return filename
+
+
+def render_variants(path, folder, filename, widths, quality):
+    """
+    Строит варианты изображения path в folder (выполняется в процессе пула).
+    Каждый файл пишется под временным именем и переименовывается, поэтому
+    маршрут никогда не отдаст недописанный вариант.
+    """
+    with Image.open(path) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе — в разы быстрее
+        largest = max(widths)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+
+    if image.mode not in ('RGB', 'L'):
+        # Прозрачность заливается белым, как фон страницы
+        rgba = image.convert('RGBA')
+        image = Image.new('RGB', rgba.size, 'white')
+        image.paste(rgba, mask=rgba.getchannel('A'))
+
+    for width in sorted(widths, reverse=True):
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))),
+                                 Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for extension, (image_format, options) in _VARIANT_FORMATS.items():
+            # Метаданные (EXIF, GPS, ICC) не передаются — в вариантах их нет
+            name = variant_name(filename, width, extension)
+            image.save(os.path.join(folder, name + '.part'), image_format, quality=quality, **options)
+            os.replace(os.path.join(folder, name + '.part'), os.path.join(folder, name))
+    return filename
+
+
+def _pool_context():
+    # Не fork: копия процесса с потоками (фоновые задачи, пул соединений SQLite)
+    # может унаследовать чужую захваченную блокировку и зависнуть. forkserver
+    # один раз импортирует main.py в однопоточном процессе-сервере (фоновые
+    # потоки стартуют только с первым запросом) и порождает обработчики от него;
+    # на Windows — spawn. Блок if __name__ == '__main__' не выполняется
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class ImagePipeline:
+
+    def __init__(self):
+        self.app = None
+        self.upload_folder = None
+        self.widths = (480, 960, 1600)
+        self.quality = 80
+        self.workers = 2
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def init_app(self, app):
+        self.app = app
+        self.upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        self.widths = tuple(sorted(app.config.get('IMAGE_WIDTHS', self.widths)))
+        self.quality = app.config.get('IMAGE_QUALITY', 80)
+        self.workers = app.config.get('IMAGE_WORKERS', 2)
+        os.makedirs(self.variants_folder, exist_ok=True)
+        app.add_template_global(self.sources, 'image_sources')
+
+    @property
+    def variants_folder(self):
+        return os.path.join(self.upload_folder, VARIANTS_FOLDER)
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+        return self._executor
+
+    def save(self, source, original_name):
+        """Сохраняет загруженное изображение и ставит его в очередь обработки. Возвращает имя файла."""
+        filename = store(source, extension_of(original_name), self.upload_folder)
+        self.submit(filename)
+        return filename
+
+    def variant(self, filename, width, extension):
+        """Имя готового варианта или None, если он еще не построен."""
+        name = variant_name(filename, width, extension)
+        return name if os.path.isfile(os.path.join(self.variants_folder, name)) else None
+
+    def ready(self, filename):
+        return all(self.variant(filename, width, extension)
+                   for width in self.widths for extension in _VARIANT_FORMATS)
+
+    def needs_processing(self, filename):
+        """Есть ли оригинал, для которого варианты еще не построены."""
+        return (is_processed(filename) and os.path.isfile(os.path.join(self.upload_folder, filename))
+                and not self.ready(filename))
+
+    def arguments(self, filename):
+        return (os.path.join(self.upload_folder, filename), self.variants_folder, filename,
+                self.widths, self.quality)
+
+    def submit(self, filename):
+        """Ставит изображение в очередь, если варианты еще не построены и не строятся."""
+        if not self.needs_processing(filename):
+            return False
+        with self._lock:
+            if filename in self._pending:
+                return False
+            self._pending.add(filename)
+
+        if not self.workers:
+            # IMAGE_WORKERS = 0 — обработка в текущем процессе (отладка, тесты)
+            try:
+                render_variants(*self.arguments(filename))
+            except Exception:
+                logger.exception('Не удалось обработать изображение %s', filename)
+            finally:
+                self._finish(filename)
+            return True
+
+        future = self._get_executor().submit(render_variants, *self.arguments(filename))
+        future.add_done_callback(lambda done: self._finish(filename, done))
+        return True
+
+    def _finish(self, filename, future=None):
+        with self._lock:
+            self._pending.discard(filename)
+        if future is not None and future.exception() is not None:
+            logger.error('Не удалось обработать изображение %s: %s', filename, future.exception())
+
+    def sources(self, filename):
+        """URL вариантов для шаблона; None — файл показывается как есть."""
+        if not filename or not is_processed(filename):
+            return None
+
+        def url(width, extension):
+            return url_for('main.question_image', filename=filename, width=width, extension=extension)
+
+        middle = self.widths[len(self.widths) // 2]
+        return {
+            'webp': ', '.join(f'{url(width, "webp")} {width}w' for width in self.widths),
+            'jpg': ', '.join(f'{url(width, "jpg")} {width}w' for width in self.widths),
+            'src': url(middle, 'jpg'),
+            # Chrome берет из кеша вариант крупнее нужного, поэтому средний подходит и для 1x, и для 2x
+            'prefetch': url(middle, 'webp'),
+        }
+
+
+image_pipeline = ImagePipeline()
+
+
+@click.command('process-images')
+@with_appcontext
+def process_images_command():
+    """Построить недостающие варианты всех изображений вопросов."""
+    pipeline = image_pipeline
+    filenames = [
+        filename for (filename,) in db.session.query(Question.image_filename).filter(
+            Question.image_filename.isnot(None)).distinct()
+        if pipeline.needs_processing(filename)
+    ]
+    failed = 0
+    with ProcessPoolExecutor(max_workers=pipeline.workers or 1, mp_context=_pool_context()) as executor:
+        futures = [(filename, executor.submit(render_variants, *pipeline.arguments(filename)))
+                   for filename in filenames]
+        for filename, future in futures:
+            if future.exception() is not None:
+                failed += 1
+                click.echo(f'{filename}: {future.exception()}', err=True)
+    click.echo(f'Обработано изображений: {len(filenames) - failed}, ошибок: {failed}')
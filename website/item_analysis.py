@@ -0,0 +1,233 @@
+"""
+Анализ качества вопросов (item analysis).
+
+Для каждого вопроса считаются:
+  * p_value — доля правильных ответов (индекс трудности);
+  * discrimination — точечно-бисериальная корреляция правильности ответа
+    с процентом за попытку;
+  * для каждого варианта ответа — сколько раз его выбирали (дистракторы).
+
+Ответы читаются из user_answers пачками (yield_per) и сворачиваются в
+массивы NumPy; суммы по всем вопросам пачки считаются векторно через
+np.unique/np.bincount. В item_stats хранятся не сами индексы, а достаточные
+статистики (n, Σx, Σy, Σy², Σxy), поэтому новые попытки просто добавляются
+к ним: задача обрабатывает только попытки с id выше сохраненной отметки
+(analytics_watermarks), а индексы пересчитываются по суммам.
+
+Запуск: `flask item-stats` (инкрементально) или `flask item-stats --full`.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+import json
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, func, insert, or_, select, update
+
+from website import db
+from website.models import AnalyticsWatermark, AnswerStats, ItemStats, Question, TestResult, UserAnswer
+from website.rollup import upsert
+
+WATERMARK = 'item_stats'
+
+_items = ItemStats.__table__
+_answers = AnswerStats.__table__
+_SUMS = ('responses', 'correct', 'score_sum', 'score_sq_sum', 'correct_score_sum')
+
+
+class _Accumulator:
+    """Суммы по вопросам и счетчики выбора вариантов, накопленные по пачкам."""
+
+    def __init__(self):
+        self.sums = {}  # question_id -> массив из 5 сумм (порядок _SUMS)
+        self.test_ids = {}
+        self.selected = Counter()  # answer_id -> число выборов
+        self.answer_question = {}
+
+    def add_chunk(self, rows):
+        question_ids = np.fromiter((row.question_id for row in rows), dtype=np.int64, count=len(rows))
+        x = np.fromiter((1.0 if row.is_correct else 0.0 for row in rows), dtype=np.float64, count=len(rows))
+        y = np.fromiter((row.percentage for row in rows), dtype=np.float64, count=len(rows))
+
+        unique, inverse = np.unique(question_ids, return_inverse=True)
+        size = len(unique)
+        chunk = np.vstack([
+            np.bincount(inverse, minlength=size).astype(np.float64),
+            np.bincount(inverse, weights=x, minlength=size),
+            np.bincount(inverse, weights=y, minlength=size),
+            np.bincount(inverse, weights=y * y, minlength=size),
+            np.bincount(inverse, weights=x * y, minlength=size),
+        ]).T
+
+        for question_id, sums in zip(unique.tolist(), chunk):
+            if question_id in self.sums:
+                self.sums[question_id] += sums
+            else:
+                self.sums[question_id] = sums
+
+        for row in rows:
+            self.test_ids[row.question_id] = row.test_id
+            if row.answer_ids:
+                for answer_id in json.loads(row.answer_ids):
+                    self.selected[answer_id] += 1
+                    self.answer_question[answer_id] = row.question_id
+
+
+def _settled_bound(after, settle_hours):
+    """
+    Наибольший id попытки, до которого все попытки окончательны: проверены
+    либо брошены (не завершены дольше settle_hours). Отметка не должна
+    перепрыгнуть попытку, которая еще может получить оценку.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=settle_hours)
+    pending = db.session.query(func.min(TestResult.id)).filter(
+        TestResult.id > after,
+        or_(
+            and_(TestResult.completed_at.isnot(None), TestResult.percentage.is_(None)),
+            and_(TestResult.completed_at.is_(None), TestResult.started_at > cutoff)
+        )
+    ).scalar()
+    if pending is not None:
+        return pending - 1
+    return db.session.query(func.max(TestResult.id)).scalar() or after
+
+
+def _scan(after, upto, chunk_size):
+    """Проверенные ответы попыток с id в (after, upto], пачками по chunk_size."""
+    statement = select(
+        UserAnswer.question_id, Question.test_id, UserAnswer.is_correct,
+        UserAnswer.answer_ids, TestResult.percentage
+    ).join(
+        TestResult, TestResult.id == UserAnswer.result_id
+    ).join(
+        Question, Question.id == UserAnswer.question_id
+    ).where(
+        UserAnswer.result_id > after,
+        UserAnswer.result_id <= upto,
+        UserAnswer.is_correct.isnot(None),
+        TestResult.percentage.isnot(None)
+    ).execution_options(yield_per=chunk_size)
+
+    accumulator = _Accumulator()
+    for rows in db.session.execute(statement).partitions():
+        accumulator.add_chunk(rows)
+    return accumulator
+
+
+def _merge(accumulator):
+    """Добавляет накопленные суммы к item_stats и answer_stats (executemany)."""
+    existing = set(db.session.scalars(select(ItemStats.question_id)))
+    updates, inserts = [], []
+    for question_id, sums in accumulator.sums.items():
+        values = dict(zip(_SUMS, sums.tolist()))
+        values['responses'] = int(values['responses'])
+        values['correct'] = int(values['correct'])
+        if question_id in existing:
+            updates.append(dict({f'd_{name}': value for name, value in values.items()}, qid=question_id))
+        else:
+            inserts.append(dict(values, question_id=question_id, test_id=accumulator.test_ids[question_id]))
+
+    if updates:
+        db.session.execute(
+            update(_items).where(_items.c.question_id == bindparam('qid')).values(
+                **{name: _items.c[name] + bindparam(f'd_{name}') for name in _SUMS}),
+            updates
+        )
+    if inserts:
+        db.session.execute(insert(_items), inserts)
+
+    existing = set(db.session.scalars(select(AnswerStats.answer_id)))
+    updates = [{'aid': answer_id, 'delta': count}
+               for answer_id, count in accumulator.selected.items() if answer_id in existing]
+    inserts = [{'answer_id': answer_id, 'question_id': accumulator.answer_question[answer_id], 'selected': count}
+               for answer_id, count in accumulator.selected.items() if answer_id not in existing]
+    if updates:
+        db.session.execute(
+            update(_answers).where(_answers.c.answer_id == bindparam('aid')).values(
+                selected=_answers.c.selected + bindparam('delta')),
+            updates
+        )
+    if inserts:
+        db.session.execute(insert(_answers), inserts)
+
+
+def compute_indices(n, correct, score_sum, score_sq_sum, correct_score_sum):
+    """
+    Индексы по достаточным статистикам (массивы одинаковой длины).
+    Точечно-бисериальная корреляция для x из {0, 1} (Σx² = Σx):
+    r = (nΣxy − ΣxΣy) / sqrt((nΣx − (Σx)²)(nΣy² − (Σy)²)).
+    Где корреляция не определена (все ответы одинаковы), возвращается nan.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_value = np.where(n > 0, correct / n, np.nan)
+        numerator = n * correct_score_sum - correct * score_sum
+        denominator = np.sqrt((n * correct - correct ** 2) * (n * score_sq_sum - score_sum ** 2))
+        discrimination = np.where(denominator > 0, numerator / denominator, np.nan)
+    return p_value, discrimination
+
+
+def _refresh_indices():
+    rows = db.session.execute(select(_items.c.question_id, *(_items.c[name] for name in _SUMS))).all()
+    if not rows:
+        return
+    data = np.array([row[1:] for row in rows], dtype=np.float64)
+    p_value, discrimination = compute_indices(*data.T)
+    now = datetime.utcnow()
+    db.session.execute(
+        update(_items).where(_items.c.question_id == bindparam('qid')).values(
+            p_value=bindparam('p'), discrimination=bindparam('r'), updated_at=now),
+        [{'qid': row[0],
+          'p': None if np.isnan(p) else round(float(p), 4),
+          'r': None if np.isnan(r) else round(float(r), 4)}
+         for row, p, r in zip(rows, p_value, discrimination)]
+    )
+
+
+def refresh(full=False):
+    """
+    Обрабатывает новые попытки и пересчитывает индексы (без коммита).
+    full=True — пересчет с нуля. Возвращает (число ответов, новая отметка).
+    """
+    if full:
+        db.session.execute(_items.delete())
+        db.session.execute(_answers.delete())
+        after = 0
+    else:
+        mark = db.session.get(AnalyticsWatermark, WATERMARK)
+        after = mark.value if mark else 0
+
+    upto = _settled_bound(after, current_app.config.get('ANALYTICS_SETTLE_HOURS', 24))
+    if upto <= after and not full:
+        return 0, after
+
+    accumulator = _scan(after, upto, current_app.config.get('ANALYTICS_CHUNK_SIZE', 50000))
+    _merge(accumulator)
+    _refresh_indices()
+
+    now = datetime.utcnow()
+    upsert(AnalyticsWatermark.__table__, {'name': WATERMARK},
+           {'value': upto, 'updated_at': now}, {'value': upto, 'updated_at': now})
+    return int(sum(sums[0] for sums in accumulator.sums.values())), upto
+
+
+def stats_for_test(test_id):
+    """Индексы вопросов теста и число выборов вариантов: (question_id -> ItemStats, answer_id -> selected)."""
+    items = {row.question_id: row for row in ItemStats.query.filter_by(test_id=test_id)}
+    selected = dict(db.session.query(AnswerStats.answer_id, AnswerStats.selected).filter(
+        AnswerStats.question_id.in_(items.keys())
+    )) if items else {}
+    return items, selected
+
+
+@click.command('item-stats')
+@click.option('--full', is_flag=True, help='Пересчитать с нуля, игнорируя отметку.')
+@with_appcontext
+def item_stats_command(full):
+    """Обновить психометрику вопросов (трудность, дискриминативность, дистракторы)."""
+    started = datetime.utcnow()
+    responses, mark = refresh(full=full)
+    db.session.commit()
+    seconds = (datetime.utcnow() - started).total_seconds()
+    click.echo(f'item_stats: обработано ответов {responses}, отметка {mark}, {seconds:.1f} с')
@@ -0,0 +1,214 @@
+"""
+Освоение тем: доля правильных ответов по теме и уровню вопроса.
+
+При проверке попытки вопросы ключа ответов группируются по (тема, уровень),
+и счетчики "задано / верно / попыток" добавляются к строке пользователя
+(topic_mastery) и его специализации (cohort_topic_mastery) за месяц
+завершения. Страницы читают готовые суммы: разбивка одного пользователя —
+выборка по префиксу первичного ключа (worker_id, ...), без соединения
+user_answers с questions. Пересчет с нуля — `flask rebuild-mastery`.
+
+Вклад каждой попытки хранится в topic_attempts: удаляемые попытки вычитаются
+ровно на то, что было добавлено, даже если вопросы теста с тех пор
+добавили, удалили или перенесли в другую тему.
+"""
+from collections import namedtuple
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, case, func, insert, select
+
+from website import cohort_cube, db
+from website.models import (CohortTopicMastery, Question, TestResult, TopicAttempt,
+                            TopicMastery, UserAnswer)
+from website.rollup import upsert
+from website.worker_stats import month_of
+
+NO_TOPIC = ''
+DEFAULT_LEVEL = 'medium'
+LEVEL_ORDER = {'basic': 0, 'medium': 1, 'hard': 2}
+
+_worker = TopicMastery.__table__
+_cohort = CohortTopicMastery.__table__
+_attempts = TopicAttempt.__table__
+
+TopicSummary = namedtuple('TopicSummary', 'topic level attempts asked correct rate trend')
+
+
+def _add(table, key, attempts, asked, correct):
+    upsert(table, key, {
+        'attempts': table.c.attempts + attempts,
+        'asked': table.c.asked + asked,
+        'correct': table.c.correct + correct,
+    }, {'attempts': attempts, 'asked': asked, 'correct': correct})
+
+
+def record_attempt(result, answer_key, graded):
+    """Добавляет проверенную попытку к счетчикам тем (без коммита)."""
+    if result.worker_id is None or result.completed_at is None:
+        return
+
+    correct_ids = {row['question_id'] for row in graded if row['is_correct']}
+    counts = {}
+    for question in answer_key.questions:
+        key = (question.topic or NO_TOPIC, question.level or DEFAULT_LEVEL)
+        asked, correct = counts.get(key, (0, 0))
+        counts[key] = (asked + 1, correct + (question.id in correct_ids))
+
+    if counts:
+        db.session.execute(insert(_attempts), [
+            {'result_id': result.id, 'topic': topic, 'level': level, 'asked': asked, 'correct': correct}
+            for (topic, level), (asked, correct) in counts.items()
+        ])
+
+    # Когорта — специализация, зафиксированная в попытке при проверке (cohort_cube.freeze_cohort)
+    month = month_of(result.completed_at)
+    for (topic, level), (asked, correct) in counts.items():
+        _add(_worker, {'worker_id': result.worker_id, 'topic': topic, 'level': level, 'month': month},
+             1, asked, correct)
+        if result.specialization:
+            _add(_cohort, {'specialization': result.specialization, 'topic': topic, 'level': level,
+                           'month': month}, 1, asked, correct)
+
+
+def _graded(*criteria):
+    return (TestResult.worker_id.isnot(None), TestResult.completed_at.isnot(None),
+            TestResult.percentage.isnot(None), *criteria)
+
+
+def _aggregates(*criteria, by_cohort=False):
+    """
+    Суммы вкладов попыток, выбранных условиями по TestResult, по владельцу,
+    теме, уровню и месяцу (для пересчета и для вычитания удаляемых попыток).
+    """
+    owner = TestResult.specialization if by_cohort else TestResult.worker_id
+    month = func.strftime('%Y-%m', TestResult.completed_at)
+
+    query = db.session.query(
+        owner, TopicAttempt.topic, TopicAttempt.level, month,
+        func.count(TopicAttempt.result_id),
+        func.sum(TopicAttempt.asked),
+        func.sum(TopicAttempt.correct)
+    ).select_from(TopicAttempt).join(TestResult, TestResult.id == TopicAttempt.result_id)
+    if by_cohort:
+        query = query.filter(TestResult.specialization.isnot(None), TestResult.specialization != '')
+
+    return query.filter(*_graded(*criteria)).group_by(owner, TopicAttempt.topic, TopicAttempt.level, month)
+
+
+def _backfill():
+    """
+    Вклады проверенных попыток, у которых их нет (проверены до появления
+    topic_attempts), — по нынешним вопросам теста и сохраненным ответам.
+    """
+    topic = func.coalesce(Question.topic, NO_TOPIC)
+    level = func.coalesce(Question.question_level, DEFAULT_LEVEL)
+    recorded = select(TopicAttempt.result_id).where(TopicAttempt.result_id == TestResult.id).exists()
+    counts = select(
+        TestResult.id, topic, level,
+        func.count(Question.id),
+        func.sum(case((UserAnswer.is_correct.is_(True), 1), else_=0))
+    ).select_from(TestResult).join(
+        Question, Question.test_id == TestResult.test_id
+    ).outerjoin(
+        UserAnswer, and_(UserAnswer.result_id == TestResult.id, UserAnswer.question_id == Question.id)
+    ).where(*_graded(~recorded)).group_by(TestResult.id, topic, level)
+    return db.session.execute(_attempts.insert().from_select(
+        ['result_id', 'topic', 'level', 'asked', 'correct'], counts)).rowcount
+
+
+def discount_results(*criteria):
+    """Вычитает попытки, выбранные условиями по TestResult, перед их удалением."""
+    for table, column, by_cohort in ((_worker, 'worker_id', False), (_cohort, 'specialization', True)):
+        for owner, topic, level, month, attempts, asked, correct in _aggregates(*criteria, by_cohort=by_cohort):
+            _add(table, {column: owner, 'topic': topic, 'level': level, 'month': month},
+                 -attempts, -asked, -correct)
+
+
+def forget_worker(worker_id):
+    """Удаляет строки пользователя и вычитает его попытки из когорты."""
+    for owner, topic, level, month, attempts, asked, correct in _aggregates(
+            TestResult.worker_id == worker_id, by_cohort=True):
+        _add(_cohort, {'specialization': owner, 'topic': topic, 'level': level, 'month': month},
+             -attempts, -asked, -correct)
+    TopicMastery.query.filter_by(worker_id=worker_id).delete(synchronize_session=False)
+
+
+def _summarize(rows, trend_months):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault((row.topic, row.level), []).append(row)
+
+    summaries = []
+    for (topic, level), months in grouped.items():
+        months.sort(key=lambda row: row.month)
+        asked = sum(row.asked for row in months)
+        if not asked:
+            continue
+        correct = sum(row.correct for row in months)
+        summaries.append(TopicSummary(
+            topic=topic,
+            level=level,
+            attempts=sum(row.attempts for row in months),
+            asked=asked,
+            correct=correct,
+            rate=round(correct / asked * 100, 1),
+            trend=[(row.month, round(row.correct / row.asked * 100, 1))
+                   for row in months[-trend_months:] if row.asked],
+        ))
+    # Вопросы без темы — в конце
+    summaries.sort(key=lambda s: (not s.topic, s.topic, LEVEL_ORDER.get(s.level, len(LEVEL_ORDER))))
+    return summaries
+
+
+def worker_breakdown(worker_id, trend_months=6):
+    """Разбивка пользователя по темам и уровням с динамикой по месяцам."""
+    rows = TopicMastery.query.filter_by(worker_id=worker_id).all()
+    return _summarize(rows, trend_months)
+
+
+def cohort_breakdown(specialization=None, trend_months=6):
+    """Разбивка специализации (или всех пользователей, если не задана)."""
+    query = db.session.query(
+        CohortTopicMastery.topic, CohortTopicMastery.level, CohortTopicMastery.month,
+        func.sum(CohortTopicMastery.attempts).label('attempts'),
+        func.sum(CohortTopicMastery.asked).label('asked'),
+        func.sum(CohortTopicMastery.correct).label('correct')
+    )
+    if specialization:
+        query = query.filter(CohortTopicMastery.specialization == specialization)
+    rows = query.group_by(CohortTopicMastery.topic, CohortTopicMastery.level, CohortTopicMastery.month).all()
+    return _summarize(rows, trend_months)
+
+
+def cohorts():
+    return [row[0] for row in db.session.query(CohortTopicMastery.specialization).distinct().order_by(
+        CohortTopicMastery.specialization)]
+
+
+def rebuild():
+    """Полный пересчет обеих таблиц из вкладов попыток (недостающие вклады восстанавливаются)."""
+    _backfill()
+    cohort_cube.freeze_missing()
+    db.session.execute(_worker.delete())
+    db.session.execute(_cohort.delete())
+    count = 0
+    for table, column, by_cohort in ((_worker, 'worker_id', False), (_cohort, 'specialization', True)):
+        rows = [
+            {column: owner, 'topic': topic, 'level': level, 'month': month,
+             'attempts': attempts, 'asked': asked, 'correct': correct}
+            for owner, topic, level, month, attempts, asked, correct in _aggregates(by_cohort=by_cohort)
+        ]
+        if rows:
+            db.session.execute(insert(table), rows)
+        count += len(rows)
+    return count
+
+
+@click.command('rebuild-mastery')
+@with_appcontext
+def rebuild_command():
+    """Пересчитать освоение тем из результатов."""
+    count = rebuild()
+    db.session.commit()
+    click.echo(f'topic mastery: {count} строк')
@@ -1,161 +1,368 @@
-from website import db, login_manager
-from flask_login import UserMixin
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-
-
-class MedicalWorker(UserMixin, db.Model):
-    __tablename__ = 'medical_workers'
-
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    first_name = db.Column(db.String(80), nullable=False)
-    last_name = db.Column(db.String(80), nullable=False)
-    password_hash = db.Column(db.String(256), nullable=False)
-    specialization = db.Column(db.String(50), nullable=False)
-    license_number = db.Column(db.String(50), unique=True, nullable=False)
-    institution = db.Column(db.String(200))
-    position = db.Column(db.String(100))
-    years_experience = db.Column(db.Integer, default=0)
-    is_moderator = db.Column(db.Boolean, default=False)
-    is_admin = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    # Связи
-    tests_taken = db.relationship('TestResult', backref='worker', lazy=True)
-
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
-
-    def get_full_name(self):
-        return f"{self.first_name} {self.last_name}"
-
-    def __repr__(self):
-        return f'<MedicalWorker {self.username}>'
-
-
-class TestCategory(db.Model):
-    __tablename__ = 'test_categories'
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
-    description = db.Column(db.Text)
-
-    tests = db.relationship('Test', backref='category', lazy=True)
-
-
-class Test(db.Model):
-    __tablename__ = 'tests'
-
-    id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text)
-    category_id = db.Column(db.Integer, db.ForeignKey('test_categories.id'))
-    difficulty = db.Column(db.String(20), default='medium')
-    time_limit = db.Column(db.Integer, default=3600)  # в секундах
-    passing_score = db.Column(db.Integer, default=70)  # процент
-
-    # Тип теста и режим доступа
-    # simple  - обычный тест (можно сразу проходить)
-    # subscribed - тест, на который пользователь сначала подписывается
-    access_type = db.Column(db.String(20), default='simple', nullable=False)
-
-    # Ограничения по попыткам и активности
-    max_attempts = db.Column(db.Integer, default=1)  # 0 или NULL = без ограничений
-    start_at = db.Column(db.DateTime)
-    end_at = db.Column(db.DateTime)
-
-    # Режим прохождения
-    is_strict_mode = db.Column(db.Boolean, default=True)  # строгий экзаменационный режим
-    shuffle_questions = db.Column(db.Boolean, default=False)
-    shuffle_answers = db.Column(db.Boolean, default=False)
-
-    is_active = db.Column(db.Boolean, default=True)
-    created_by = db.Column(db.Integer, db.ForeignKey('medical_workers.id'))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    questions = db.relationship('Question', backref='test', lazy=True)
-    results = db.relationship('TestResult', backref='test', lazy=True)
-
-
-class TestSubscription(db.Model):
-    """
-    Подписка пользователя на тест.
-    Нужна только для тестов с access_type='subscribed'.
-    """
-    __tablename__ = 'test_subscriptions'
-
-    id = db.Column(db.Integer, primary_key=True)
-    worker_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id'), nullable=False)
-    test_id = db.Column(db.Integer, db.ForeignKey('tests.id'), nullable=False)
-    subscribed_at = db.Column(db.DateTime, default=datetime.utcnow)
-
-    worker = db.relationship('MedicalWorker', backref='test_subscriptions', lazy=True)
-    test = db.relationship('Test', backref='subscriptions', lazy=True)
-
-
-class Question(db.Model):
-    __tablename__ = 'questions'
-
-    id = db.Column(db.Integer, primary_key=True)
-    test_id = db.Column(db.Integer, db.ForeignKey('tests.id'))
-    text = db.Column(db.Text, nullable=False)
-    question_type = db.Column(db.String(20), default='single')  # single, multiple, text
-    points = db.Column(db.Integer, default=1)
-    image_filename = db.Column(db.String(255))  # ← НОВОЕ: имя файла изображения
-
-    # Расширенное тегирование
-    topic = db.Column(db.String(200))  # тема / раздел
-    question_level = db.Column(db.String(20), default='medium')  # basic / medium / hard
-
-    # Простейшая "история" — кто и когда редактировал
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    last_modified_by_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id'))
-    last_modified_by = db.relationship('MedicalWorker', foreign_keys=[last_modified_by_id])
-
-    answers = db.relationship('Answer', backref='question', lazy=True)
-
-
-class Answer(db.Model):
-    __tablename__ = 'answers'
-
-    id = db.Column(db.Integer, primary_key=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'))
-    text = db.Column(db.Text, nullable=False)
-    is_correct = db.Column(db.Boolean, default=False)
-
-
-class TestResult(db.Model):
-    __tablename__ = 'test_results'
-
-    id = db.Column(db.Integer, primary_key=True)
-    worker_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id'))
-    test_id = db.Column(db.Integer, db.ForeignKey('tests.id'))
-    score = db.Column(db.Integer)
-    percentage = db.Column(db.Float)
-    passed = db.Column(db.Boolean)
-    started_at = db.Column(db.DateTime, default=datetime.utcnow)
-    completed_at = db.Column(db.DateTime)
-    time_taken = db.Column(db.Integer)  # в секундах
-
-    answers = db.relationship('UserAnswer', backref='result', lazy=True)
-
-
-class UserAnswer(db.Model):
-    __tablename__ = 'user_answers'
-
-    id = db.Column(db.Integer, primary_key=True)
-    result_id = db.Column(db.Integer, db.ForeignKey('test_results.id'))
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'))
-    answer_ids = db.Column(db.String(500))  # JSON строка с ID выбранных ответов
-    text_answer = db.Column(db.Text)  # ← НОВОЕ: текстовый ответ пользователя
-    is_correct = db.Column(db.Boolean)
-
-@login_manager.user_loader
-def load_user(id):
+from website import db, login_manager
+from flask_login import UserMixin
+from datetime import datetime
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class MedicalWorker(UserMixin, db.Model):
+    __tablename__ = 'medical_workers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    first_name = db.Column(db.String(80), nullable=False)
+    last_name = db.Column(db.String(80), nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
+    specialization = db.Column(db.String(50), nullable=False)
+    license_number = db.Column(db.String(50), unique=True, nullable=False)
+    institution = db.Column(db.String(200))
+    position = db.Column(db.String(100))
+    years_experience = db.Column(db.Integer, default=0)
+    is_moderator = db.Column(db.Boolean, default=False)
+    is_admin = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Связи
+    tests_taken = db.relationship('TestResult', backref='worker', lazy=True, passive_deletes=True)
+
+    def set_password(self, password):
+        self.password_hash = generate_password_hash(password)
+
+    def check_password(self, password):
+        return check_password_hash(self.password_hash, password)
+
+    def get_full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+    def __repr__(self):
+        return f'<MedicalWorker {self.username}>'
+
+
+class TestCategory(db.Model):
+    __tablename__ = 'test_categories'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+
+    tests = db.relationship('Test', backref='category', lazy=True, passive_deletes=True)
+
+
+class Test(db.Model):
+    __tablename__ = 'tests'
+
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text)
+    category_id = db.Column(db.Integer, db.ForeignKey('test_categories.id', ondelete='SET NULL'))
+    difficulty = db.Column(db.String(20), default='medium')
+    time_limit = db.Column(db.Integer, default=3600)  # в секундах
+    passing_score = db.Column(db.Integer, default=70)  # процент
+
+    # Тип теста и режим доступа
+    # simple  - обычный тест (можно сразу проходить)
+    # subscribed - тест, на который пользователь сначала подписывается
+    access_type = db.Column(db.String(20), default='simple', nullable=False)
+
+    # Ограничения по попыткам и активности
+    max_attempts = db.Column(db.Integer, default=1)  # 0 или NULL = без ограничений
+    start_at = db.Column(db.DateTime)
+    end_at = db.Column(db.DateTime)
+
+    # Режим прохождения
+    is_strict_mode = db.Column(db.Boolean, default=True)  # строгий экзаменационный режим
+    shuffle_questions = db.Column(db.Boolean, default=False)
+    shuffle_answers = db.Column(db.Boolean, default=False)
+    page_size = db.Column(db.Integer, default=0)  # вопросов на странице, 0 = все на одной странице
+
+    is_active = db.Column(db.Boolean, default=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('medical_workers.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Версия содержимого (вопросы и ответы) — увеличивается при каждом изменении,
+    # по ней инвалидируются кеши ключа ответов
+    content_version = db.Column(db.Integer, default=1, nullable=False)
+
+    # Тест с большим числом результатов удаляется фоновой очисткой (website.purge):
+    # до ее окончания он помечен и скрыт
+    deleted_at = db.Column(db.DateTime)
+
+    questions = db.relationship('Question', backref='test', lazy=True, passive_deletes=True)
+    results = db.relationship('TestResult', backref='test', lazy=True, passive_deletes=True)
+
+    # Индексы каталога: keyset-пагинация по (created_at, id) среди активных тестов,
+    # в том числе внутри категории; в панели модератора — среди всех тестов и тестов автора
+    __table_args__ = (
+        db.Index('ix_tests_catalogue', 'is_active', 'created_at', 'id'),
+        db.Index('ix_tests_category_catalogue', 'category_id', 'is_active', 'created_at', 'id'),
+        db.Index('ix_tests_created', 'created_at', 'id'),
+        db.Index('ix_tests_author', 'created_by', 'created_at', 'id'),
+    )
+
+
+class TestSubscription(db.Model):
+    """
+    Подписка пользователя на тест.
+    Нужна только для тестов с access_type='subscribed'.
+    """
+    __tablename__ = 'test_subscriptions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    worker_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id', ondelete='CASCADE'), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey('tests.id', ondelete='CASCADE'), nullable=False, index=True)
+    subscribed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    worker = db.relationship('MedicalWorker', backref=db.backref('test_subscriptions', passive_deletes=True), lazy=True)
+    test = db.relationship('Test', backref=db.backref('subscriptions', passive_deletes=True), lazy=True)
+
+    # Одно назначение на пару (пользователь, тест) — на этом держится массовое назначение
+    __table_args__ = (
+        db.Index('uq_test_subscriptions_worker_test', 'worker_id', 'test_id', unique=True),
+    )
+
+
+class UserTestStatus(db.Model):
+    """
+    Сводное состояние теста для пользователя: одна строка на (пользователь, тест).
+    Обновляется при старте и завершении попыток и при назначении теста,
+    пересчитывается из test_results командой `flask rebuild-test-status`.
+    """
+    __tablename__ = 'user_test_status'
+
+    worker_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id', ondelete='CASCADE'), primary_key=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('tests.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    best_percentage = db.Column(db.Float)
+    passed = db.Column(db.Boolean, default=False, nullable=False)  # хотя бы одна попытка сдана
+    last_result_id = db.Column(db.Integer)
+    last_attempt_at = db.Column(db.DateTime)
+    subscribed = db.Column(db.Boolean, default=False, nullable=False)
+
+
+class WorkerStats(db.Model):
+    """
+    Итоги тестирования пользователя по завершенным и проверенным попыткам.
+    Обновляется при проверке попытки, пересчитывается командой `flask rebuild-worker-stats`.
+    """
+    __tablename__ = 'worker_stats'
+
+    worker_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id', ondelete='CASCADE'), primary_key=True)
+    completed = db.Column(db.Integer, default=0, nullable=False)
+    passed = db.Column(db.Integer, default=0, nullable=False)
+    score_sum = db.Column(db.Float, default=0, nullable=False)  # сумма процентов, для среднего
+    last_completed_at = db.Column(db.DateTime)
+
+    @property
+    def avg_score(self):
+        return round(self.score_sum / self.completed, 1) if self.completed else 0
+
+
+class WorkerMonthlyStats(db.Model):
+    """Те же итоги по месяцам завершения попыток — для динамики результатов."""
+    __tablename__ = 'worker_monthly_stats'
+
+    worker_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id', ondelete='CASCADE'), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # ГГГГ-ММ
+    completed = db.Column(db.Integer, default=0, nullable=False)
+    passed = db.Column(db.Integer, default=0, nullable=False)
+    score_sum = db.Column(db.Float, default=0, nullable=False)
+
+    @property
+    def avg_score(self):
+        return round(self.score_sum / self.completed, 1) if self.completed else 0
+
+
+class TopicMastery(db.Model):
+    """
+    Освоение тем пользователем: вопросы темы и уровня в проверенных попытках
+    по месяцам. Обновляется при проверке попытки (website/mastery.py).
+    """
+    __tablename__ = 'topic_mastery'
+
+    worker_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id', ondelete='CASCADE'), primary_key=True)
+    topic = db.Column(db.String(200), primary_key=True)  # '' — вопросы без темы
+    level = db.Column(db.String(20), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # ГГГГ-ММ
+    attempts = db.Column(db.Integer, default=0, nullable=False)  # попыток с вопросами темы
+    asked = db.Column(db.Integer, default=0, nullable=False)
+    correct = db.Column(db.Integer, default=0, nullable=False)
+
+
+class TopicAttempt(db.Model):
+    """
+    Вклад одной проверенной попытки в счетчики тем — ровно то, что было
+    добавлено при проверке. Удаляемые попытки вычитаются по этим строкам,
+    а не по текущему составу теста, который мог измениться.
+    """
+    __tablename__ = 'topic_attempts'
+
+    result_id = db.Column(db.Integer, db.ForeignKey('test_results.id', ondelete='CASCADE'), primary_key=True)
+    topic = db.Column(db.String(200), primary_key=True)
+    level = db.Column(db.String(20), primary_key=True)
+    asked = db.Column(db.Integer, default=0, nullable=False)
+    correct = db.Column(db.Integer, default=0, nullable=False)
+
+
+class CohortTopicMastery(db.Model):
+    """То же в разрезе специализации (когорты) пользователей."""
+    __tablename__ = 'cohort_topic_mastery'
+
+    specialization = db.Column(db.String(50), primary_key=True)
+    topic = db.Column(db.String(200), primary_key=True)
+    level = db.Column(db.String(20), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    asked = db.Column(db.Integer, default=0, nullable=False)
+    correct = db.Column(db.Integer, default=0, nullable=False)
+
+
+class CohortCube(db.Model):
+    """
+    Куб отчетности по когортам: итоги проверенных попыток на самом детальном
+    уровне (тест, месяц, учреждение, специализация, должность, стаж).
+    Любой срез — GROUP BY по этим строкам (website/cohort_cube.py).
+    Атрибуты пользователя фиксируются на момент завершения попытки.
+    """
+    __tablename__ = 'cohort_cube'
+
+    test_id = db.Column(db.Integer, db.ForeignKey('tests.id', ondelete='CASCADE'), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True, index=True)
+    institution = db.Column(db.String(200), primary_key=True)  # '' — не указано
+    specialization = db.Column(db.String(50), primary_key=True)
+    position = db.Column(db.String(100), primary_key=True)
+    experience_band = db.Column(db.String(10), primary_key=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    passed = db.Column(db.Integer, default=0, nullable=False)
+    score_sum = db.Column(db.Float, default=0, nullable=False)
+
+
+class ItemStats(db.Model):
+    """
+    Психометрика вопроса (website/item_analysis.py). Хранятся достаточные
+    статистики — суммы, которые можно наращивать новыми попытками, — и
+    вычисленные по ним индексы трудности и дискриминативности.
+    """
+    __tablename__ = 'item_stats'
+
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('tests.id', ondelete='CASCADE'), index=True)
+    responses = db.Column(db.Integer, default=0, nullable=False)  # n ответов
+    correct = db.Column(db.Integer, default=0, nullable=False)  # сумма x (0/1)
+    score_sum = db.Column(db.Float, default=0, nullable=False)  # сумма y — процента за попытку
+    score_sq_sum = db.Column(db.Float, default=0, nullable=False)  # сумма y^2
+    correct_score_sum = db.Column(db.Float, default=0, nullable=False)  # сумма x*y
+
+    p_value = db.Column(db.Float)  # доля правильных ответов
+    discrimination = db.Column(db.Float)  # точечно-бисериальная корреляция с результатом
+    updated_at = db.Column(db.DateTime)
+
+
+class AnswerStats(db.Model):
+    """Сколько раз выбирали вариант ответа (для анализа дистракторов)."""
+    __tablename__ = 'answer_stats'
+
+    answer_id = db.Column(db.Integer, db.ForeignKey('answers.id', ondelete='CASCADE'), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), index=True)
+    selected = db.Column(db.Integer, default=0, nullable=False)
+
+
+class AnalyticsWatermark(db.Model):
+    """Высшая отметка обработанных данных для инкрементальных аналитических задач."""
+    __tablename__ = 'analytics_watermarks'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime)
+
+
+class Question(db.Model):
+    __tablename__ = 'questions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('tests.id', ondelete='CASCADE'), index=True)
+    text = db.Column(db.Text, nullable=False)
+    question_type = db.Column(db.String(20), default='single')  # single, multiple, text
+    points = db.Column(db.Integer, default=1)
+    image_filename = db.Column(db.String(255))  # ← НОВОЕ: имя файла изображения
+
+    # Расширенное тегирование
+    topic = db.Column(db.String(200))  # тема / раздел
+    question_level = db.Column(db.String(20), default='medium')  # basic / medium / hard
+
+    # Допуск опечаток для текстовых вопросов (максимальное число правок, 0 — точное совпадение)
+    text_tolerance = db.Column(db.Integer, default=1)
+
+    # Простейшая "история" — кто и когда редактировал
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    last_modified_by_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id', ondelete='SET NULL'))
+    last_modified_by = db.relationship('MedicalWorker', foreign_keys=[last_modified_by_id])
+
+    answers = db.relationship('Answer', backref='question', lazy=True, passive_deletes=True)
+
+
+class Answer(db.Model):
+    __tablename__ = 'answers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), index=True)
+    text = db.Column(db.Text, nullable=False)
+    is_correct = db.Column(db.Boolean, default=False)
+    normalized_text = db.Column(db.Text)  # нормализованный вариант текстового ответа (для проверки)
+
+
+class TestResult(db.Model):
+    __tablename__ = 'test_results'
+
+    id = db.Column(db.Integer, primary_key=True)
+    worker_id = db.Column(db.Integer, db.ForeignKey('medical_workers.id', ondelete='CASCADE'))
+    test_id = db.Column(db.Integer, db.ForeignKey('tests.id', ondelete='CASCADE'))
+    score = db.Column(db.Integer)
+    percentage = db.Column(db.Float)
+    passed = db.Column(db.Boolean)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    time_taken = db.Column(db.Integer)  # в секундах
+
+    # Зерно перемешивания вопросов/ответов: порядок для попытки
+    # вычисляется из него, сами списки не хранятся
+    shuffle_seed = db.Column(db.Integer)
+
+    # Ключ когорты — атрибуты пользователя на момент проверки (website/cohort_cube.py).
+    # Сводки по когортам вычитают попытку по нему, даже если профиль с тех пор изменился
+    institution = db.Column(db.String(200))
+    specialization = db.Column(db.String(50))
+    position = db.Column(db.String(100))
+    experience_band = db.Column(db.String(10))
+
+    answers = db.relationship('UserAnswer', backref='result', lazy=True, passive_deletes=True)
+
+    # Просмотр результатов модератором: сортировка по (completed_at, id),
+    # в том числе в пределах теста или пользователя
+    __table_args__ = (
+        db.Index('ix_test_results_completed', 'completed_at', 'id'),
+        db.Index('ix_test_results_test_completed', 'test_id', 'completed_at', 'id'),
+        db.Index('ix_test_results_worker_completed', 'worker_id', 'completed_at', 'id'),
+    )
+
+
+class UserAnswer(db.Model):
+    __tablename__ = 'user_answers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    result_id = db.Column(db.Integer, db.ForeignKey('test_results.id', ondelete='CASCADE'))
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'))
+    answer_ids = db.Column(db.String(500))  # JSON строка с ID выбранных ответов
+    text_answer = db.Column(db.Text)  # ← НОВОЕ: текстовый ответ пользователя
+    is_correct = db.Column(db.Boolean)
+
+    # Ответы попытки читаются и перезаписываются по (result_id, question_id) при каждом
+    # показе и сохранении страницы; по question_id — удаление вопросов и их статистика
+    __table_args__ = (
+        db.Index('ix_user_answers_result_question', 'result_id', 'question_id'),
+        db.Index('ix_user_answers_question', 'question_id'),
+    )
+
+@login_manager.user_loader
+def load_user(id):
     return MedicalWorker.query.get(int(id))
\ No newline at end of file
@@ -1,421 +1,720 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
-from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
-import os
-from website import db
-from website.models import Test, TestCategory, Question, Answer, MedicalWorker, TestResult, TestSubscription
-from website.forms import TestForm
-from datetime import datetime
-
-moderator_bp = Blueprint('moderator', __name__)
-
-
-# ========== ГЛАВНАЯ ПАНЕЛЬ МОДЕРАТОРА ==========
-@moderator_bp.route('/')
-@login_required
-def panel():
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    # Тесты, созданные модератором
-    my_tests = Test.query.filter_by(created_by=current_user.id).all()
-
-    # Все тесты для модерации
-    all_tests = Test.query.all()
-
-    # Активные тесты
-    active_tests = Test.query.filter_by(is_active=True).count()
-
-    return render_template('moderator_panel.html',
-                           my_tests=my_tests,
-                           all_tests=all_tests,
-                           active_tests=active_tests)
-
-
-@moderator_bp.route('/test/<int:test_id>/subscribers')
-@login_required
-def test_subscribers(test_id):
-    """Список подписанных пользователей для теста по подписке."""
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    test = Test.query.get_or_404(test_id)
-
-    if test.access_type != 'subscribed':
-        flash('Этот тест не является тестом по подписке.', 'info')
-        return redirect(url_for('moderator.panel'))
-
-    subscriptions = TestSubscription.query.filter_by(test_id=test_id).all()
-    workers = MedicalWorker.query.order_by(MedicalWorker.last_name, MedicalWorker.first_name).all()
-
-    return render_template('moderator_subscribers.html',
-                           test=test,
-                           subscriptions=subscriptions,
-                           workers=workers)
-
-
-@moderator_bp.route('/test/<int:test_id>/assign', methods=['POST'])
-@login_required
-def assign_subscriber(test_id):
-    """Назначить тест конкретному пользователю (создать подписку)."""
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    test = Test.query.get_or_404(test_id)
-    if test.access_type != 'subscribed':
-        flash('Назначение доступно только для тестов по подписке.', 'info')
-        return redirect(url_for('moderator.panel'))
-
-    worker_id = request.form.get('worker_id')
-    if not worker_id:
-        flash('Выберите пользователя для назначения.', 'warning')
-        return redirect(url_for('moderator.test_subscribers', test_id=test_id))
-
-    worker = MedicalWorker.query.get(worker_id)
-    if not worker:
-        flash('Пользователь не найден.', 'danger')
-        return redirect(url_for('moderator.test_subscribers', test_id=test_id))
-
-    existing = TestSubscription.query.filter_by(worker_id=worker.id, test_id=test_id).first()
-    if existing:
-        flash('Этот тест уже назначен выбранному пользователю.', 'info')
-        return redirect(url_for('moderator.test_subscribers', test_id=test_id))
-
-    sub = TestSubscription(worker_id=worker.id, test_id=test_id)
-    db.session.add(sub)
-    db.session.commit()
-
-    flash(f'Тест "{test.title}" назначен пользователю {worker.get_full_name()}.', 'success')
-    return redirect(url_for('moderator.test_subscribers', test_id=test_id))
-
-
-@moderator_bp.route('/test/<int:test_id>/subscription/<int:sub_id>/delete', methods=['POST'])
-@login_required
-def delete_subscription(test_id, sub_id):
-    """Снять назначение теста с пользователя."""
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    test = Test.query.get_or_404(test_id)
-    subscription = TestSubscription.query.get_or_404(sub_id)
-
-    if subscription.test_id != test.id:
-        flash('Некорректное назначение.', 'danger')
-        return redirect(url_for('moderator.test_subscribers', test_id=test_id))
-
-    db.session.delete(subscription)
-    db.session.commit()
-
-    flash('Назначение теста для пользователя удалено.', 'info')
-    return redirect(url_for('moderator.test_subscribers', test_id=test_id))
-
-
-# ========== СОЗДАНИЕ ТЕСТА ==========
-@moderator_bp.route('/test/create', methods=['GET', 'POST'])
-@login_required
-def create_test():
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    form = TestForm()
-
-    if form.validate_on_submit():
-        test = Test(
-            title=form.title.data,
-            description=form.description.data,
-            difficulty=form.difficulty.data,
-            time_limit=form.time_limit.data * 60,  # конвертируем минуты в секунды
-            passing_score=form.passing_score.data,
-            access_type=form.access_type.data,
-            max_attempts=form.max_attempts.data or 0,
-            created_by=current_user.id
-        )
-
-        db.session.add(test)
-        db.session.commit()
-
-        flash('Тест успешно создан! Теперь добавьте вопросы.', 'success')
-        return redirect(url_for('moderator.add_questions', test_id=test.id))
-
-    return render_template('create_test.html', form=form)
-
-
-# ========== ПРОСМОТР И ДОБАВЛЕНИЕ ВОПРОСОВ ==========
-@moderator_bp.route('/test/<int:test_id>/questions')
-@login_required
-def add_questions(test_id):
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    test = Test.query.get_or_404(test_id)
-
-    # Проверяем, что тест создан текущим модератором
-    if test.created_by != current_user.id:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('moderator.panel'))
-
-    questions = Question.query.filter_by(test_id=test_id).all()
-
-    from website.moderator_forms import AddQuestionForm
-    form = AddQuestionForm()
-
-    return render_template('add_questions.html', test=test, questions=questions, form=form)
-
-
-# ========== ПРОСМОТР РЕЗУЛЬТАТОВ ==========
-@moderator_bp.route('/results')
-@login_required
-def view_results():
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    results = TestResult.query.order_by(TestResult.completed_at.desc()).all()
-
-    return render_template('moderator_results.html', results=results)
-
-
-# ========== ПЕРЕКЛЮЧЕНИЕ АКТИВНОСТИ ТЕСТА ==========
-@moderator_bp.route('/test/<int:test_id>/toggle')
-@login_required
-def toggle_test(test_id):
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    test = Test.query.get_or_404(test_id)
-    test.is_active = not test.is_active
-
-    db.session.commit()
-
-    status = 'активирован' if test.is_active else 'деактивирован'
-    flash(f'Тест "{test.title}" {status}', 'success')
-    return redirect(url_for('moderator.panel'))
-
-
-# В moderator.py добавьте после функции toggle_test:
-
-@moderator_bp.route('/test/<int:test_id>/delete', methods=['POST'])
-@login_required
-def delete_test(test_id):
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    test = Test.query.get_or_404(test_id)
-
-    # Проверяем, что тест создан текущим модератором или пользователь - админ
-    if test.created_by != current_user.id and not current_user.is_admin:
-        flash('Вы не можете удалить этот тест', 'danger')
-        return redirect(url_for('moderator.panel'))
-
-    # Получаем название теста до удаления (для сообщения)
-    test_title = test.title
-
-    try:
-        # Удаляем связанные данные (каскадное удаление)
-        # 1. Удаляем ответы пользователей на вопросы этого теста
-        from website.models import UserAnswer, TestResult
-
-        # Находим все результаты этого теста
-        test_results = TestResult.query.filter_by(test_id=test_id).all()
-        result_ids = [result.id for result in test_results]
-
-        # Удаляем ответы пользователей
-        if result_ids:
-            UserAnswer.query.filter(UserAnswer.result_id.in_(result_ids)).delete(synchronize_session=False)
-
-        # 2. Удаляем результаты теста
-        TestResult.query.filter_by(test_id=test_id).delete(synchronize_session=False)
-
-        # 3. Удаляем ответы на вопросы
-        questions = Question.query.filter_by(test_id=test_id).all()
-        question_ids = [q.id for q in questions]
-
-        if question_ids:
-            Answer.query.filter(Answer.question_id.in_(question_ids)).delete(synchronize_session=False)
-
-        # 4. Удаляем вопросы
-        Question.query.filter_by(test_id=test_id).delete(synchronize_session=False)
-
-        # 5. Удаляем сам тест
-        db.session.delete(test)
-
-        db.session.commit()
-
-        flash(f'Тест "{test_title}" успешно удален', 'success')
-
-    except Exception as e:
-        db.session.rollback()
-        flash(f'Ошибка при удалении теста: {str(e)}', 'danger')
-
-    return redirect(url_for('moderator.panel'))
-
-
-@moderator_bp.route('/tests/delete_multiple', methods=['POST'])
-@login_required
-def delete_multiple_tests():
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    test_ids = request.form.getlist('test_ids')
-
-    if not test_ids:
-        flash('Не выбраны тесты для удаления', 'warning')
-        return redirect(url_for('moderator.panel'))
-
-    deleted_count = 0
-    error_tests = []
-
-    for test_id in test_ids:
-        try:
-            test = Test.query.get(test_id)
-
-            if not test:
-                continue
-
-            # Проверяем права
-            if test.created_by != current_user.id and not current_user.is_admin:
-                error_tests.append(f"{test.title} (нет прав)")
-                continue
-
-            # Удаляем тест
-            db.session.delete(test)
-            deleted_count += 1
-
-        except Exception as e:
-            error_tests.append(f"{test.title if test else test_id} ({str(e)})")
-
-    try:
-        db.session.commit()
-
-        if deleted_count > 0:
-            flash(f'Успешно удалено {deleted_count} тестов', 'success')
-
-        if error_tests:
-            flash(f'Ошибки при удалении: {", ".join(error_tests)}', 'warning')
-
-    except Exception as e:
-        db.session.rollback()
-        flash(f'Ошибка при удалении тестов: {str(e)}', 'danger')
-
-    return redirect(url_for('moderator.panel'))
-
-# ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ДЛЯ ФАЙЛОВ ==========
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
-
-
-def save_uploaded_file(file):
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Добавляем timestamp для уникальности
-        import time
-        timestamp = str(int(time.time()))
-        name, ext = os.path.splitext(filename)
-        filename = f"{name}_{timestamp}{ext}"
-
-        upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(upload_path)
-        return filename
-    return None
-
-
-@moderator_bp.route('/test/<int:test_id>/add_question', methods=['POST'])
-@login_required
-def add_question(test_id):
-    """Добавление вопроса из модального окна (текст, тема, картинка, ответы)."""
-    if not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    test = Test.query.get_or_404(test_id)
-
-    # Проверяем, что тест создан текущим модератором
-    if test.created_by != current_user.id and not current_user.is_admin:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('moderator.panel'))
-
-    question_text = (request.form.get('question_text') or '').strip()
-    question_type = request.form.get('question_type')
-    topic = (request.form.get('topic') or '').strip()
-    question_level = request.form.get('question_level') or 'medium'
-    points_raw = request.form.get('points', '1')
-
-    # Простая серверная валидация
-    if not question_text:
-        flash('Введите текст вопроса.', 'danger')
-        return redirect(url_for('moderator.add_questions', test_id=test_id))
-
-    try:
-        points = int(points_raw)
-        if points < 1:
-            points = 1
-    except ValueError:
-        points = 1
-
-    # Сохраняем изображение, если есть
-    image_file = request.files.get('image')
-    image_filename = save_uploaded_file(image_file) if image_file else None
-
-    # Создаем вопрос
-    question = Question(
-        test_id=test_id,
-        text=question_text,
-        question_type=question_type,
-        points=points,
-        image_filename=image_filename,
-        topic=topic,
-        question_level=question_level,
-        last_modified_by_id=current_user.id
-    )
-
-    db.session.add(question)
-    db.session.commit()
-
-    # Добавляем ответы
-    if question_type in ['single', 'multiple']:
-        i = 0
-        while True:
-            answer_text = request.form.get(f'question-answers-{i}-text')
-            if not answer_text:
-                i += 1
-                if i > 20:
-                    break
-                continue
-
-            if question_type == 'single':
-                correct_answer_index = request.form.get('correct_answer')
-                is_correct = (correct_answer_index == str(i))
-            else:
-                is_correct = request.form.get(f'question-answers-{i}-is_correct') == 'true'
-
-            answer = Answer(
-                question_id=question.id,
-                text=answer_text.strip(),
-                is_correct=is_correct
-            )
-            db.session.add(answer)
-            i += 1
-
-    elif question_type == 'text':
-        correct_text = (request.form.get('text_correct_answer') or '').strip()
-        if correct_text:
-            answer = Answer(
-                question_id=question.id,
-                text=correct_text.lower(),
-                is_correct=True
-            )
-            db.session.add(answer)
-
-    db.session.commit()
-    flash('Вопрос успешно добавлен!', 'success')
-    return redirect(url_for('moderator.add_questions', test_id=test_id))
\ No newline at end of file
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify, Response, \
+    send_file, stream_with_context
+from flask_login import login_required, current_user
+import csv
+import io
+import tempfile
+import zipfile
+from website import db
+from website.models import Test, TestCategory, Question, Answer, MedicalWorker, TestResult, TestSubscription
+from website.forms import TestForm
+from website import cohort_cube, grading, mastery, paper, question_import, test_bank, test_status
+from website import subscriptions as bulk_subscriptions
+from website.item_analysis import stats_for_test
+from website.catalogue import moderator_tests, test_totals
+from website.purge import purger
+from website.images import image_pipeline
+from website import result_browser
+from website.grading_queue import grading_queue
+from website.text_matching import normalize_answer, split_variants, MAX_TOLERANCE
+from sqlalchemy.orm import joinedload
+from datetime import datetime
+
+moderator_bp = Blueprint('moderator', __name__)
+
+
+# ========== ГЛАВНАЯ ПАНЕЛЬ МОДЕРАТОРА ==========
+@moderator_bp.route('/')
+@login_required
+def panel():
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    # Тесты, созданные модератором
+    my_tests, _ = moderator_tests(created_by=current_user.id)
+
+    # Все тесты для модерации — постранично
+    all_tests, next_cursor = moderator_tests(after=request.args.get('after'),
+                                             limit=current_app.config['PANEL_PAGE_SIZE'])
+
+    # Всего и активных тестов
+    total_tests, active_tests = test_totals()
+
+    return render_template('moderator_panel.html',
+                           my_tests=my_tests,
+                           all_tests=all_tests,
+                           next_cursor=next_cursor,
+                           is_first_page=not request.args.get('after'),
+                           total_tests=total_tests,
+                           active_tests=active_tests)
+
+
+@moderator_bp.route('/test/<int:test_id>/subscribers')
+@login_required
+def test_subscribers(test_id):
+    """Список подписанных пользователей для теста по подписке."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test = Test.query.get_or_404(test_id)
+
+    if test.access_type != 'subscribed':
+        flash('Этот тест не является тестом по подписке.', 'info')
+        return redirect(url_for('moderator.panel'))
+
+    subscriptions = TestSubscription.query.options(
+        joinedload(TestSubscription.worker)
+    ).filter_by(test_id=test_id).order_by(TestSubscription.subscribed_at.desc()).all()
+
+    return render_template('moderator_subscribers.html',
+                           test=test,
+                           subscriptions=subscriptions,
+                           filter_values=bulk_subscriptions.filter_values())
+
+
+def _bulk_criteria(test_id):
+    """Тест, условия отбора из формы и ответ-перенаправление, если назначать нельзя."""
+    test = Test.query.get_or_404(test_id)
+    if test.access_type != 'subscribed':
+        flash('Назначение доступно только для тестов по подписке.', 'info')
+        return test, None, redirect(url_for('moderator.panel'))
+
+    criteria = bulk_subscriptions.parse_criteria(request.form, request.files)
+    if not criteria:
+        flash('Укажите специализацию, учреждение, должность или номера лицензий.', 'warning')
+        return test, None, redirect(url_for('moderator.test_subscribers', test_id=test_id))
+    return test, criteria, None
+
+
+def _unknown_licenses_note(summary):
+    if summary['unknown_licenses']:
+        return f' Не найдено лицензий: {summary["unknown_licenses"]}.'
+    return ''
+
+
+@moderator_bp.route('/test/<int:test_id>/assign', methods=['POST'])
+@login_required
+def assign_subscriber(test_id):
+    """Назначить тест всем пользователям, подходящим под условия."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test, criteria, response = _bulk_criteria(test_id)
+    if response:
+        return response
+
+    summary = bulk_subscriptions.assign(test.id, criteria)
+    db.session.commit()
+
+    flash(f'Тест "{test.title}": назначено {summary["assigned"]}, '
+          f'уже было назначено {summary["existing"]} из {summary["matched"]} подходящих.'
+          + _unknown_licenses_note(summary),
+          'success' if summary['assigned'] else 'info')
+    return redirect(url_for('moderator.test_subscribers', test_id=test_id))
+
+
+@moderator_bp.route('/test/<int:test_id>/revoke', methods=['POST'])
+@login_required
+def revoke_subscribers(test_id):
+    """Снять назначение теста со всех пользователей, подходящих под условия."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test, criteria, response = _bulk_criteria(test_id)
+    if response:
+        return response
+
+    summary = bulk_subscriptions.revoke(test.id, criteria)
+    db.session.commit()
+
+    flash(f'Тест "{test.title}": назначение снято у {summary["revoked"]} '
+          f'из {summary["matched"]} подходящих.' + _unknown_licenses_note(summary), 'info')
+    return redirect(url_for('moderator.test_subscribers', test_id=test_id))
+
+
+@moderator_bp.route('/test/<int:test_id>/subscription/<int:sub_id>/delete', methods=['POST'])
+@login_required
+def delete_subscription(test_id, sub_id):
+    """Снять назначение теста с пользователя."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test = Test.query.get_or_404(test_id)
+    subscription = TestSubscription.query.get_or_404(sub_id)
+
+    if subscription.test_id != test.id:
+        flash('Некорректное назначение.', 'danger')
+        return redirect(url_for('moderator.test_subscribers', test_id=test_id))
+
+    db.session.delete(subscription)
+    test_status.set_subscribed(subscription.worker_id, test_id, False)
+    db.session.commit()
+
+    flash('Назначение теста для пользователя удалено.', 'info')
+    return redirect(url_for('moderator.test_subscribers', test_id=test_id))
+
+
+# ========== СОЗДАНИЕ ТЕСТА ==========
+@moderator_bp.route('/test/create', methods=['GET', 'POST'])
+@login_required
+def create_test():
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    form = TestForm()
+
+    if form.validate_on_submit():
+        test = Test(
+            title=form.title.data,
+            description=form.description.data,
+            difficulty=form.difficulty.data,
+            time_limit=form.time_limit.data * 60,  # конвертируем минуты в секунды
+            passing_score=form.passing_score.data,
+            access_type=form.access_type.data,
+            max_attempts=form.max_attempts.data or 0,
+            shuffle_questions=form.shuffle_questions.data,
+            shuffle_answers=form.shuffle_answers.data,
+            page_size=max(form.page_size.data or 0, 0),
+            created_by=current_user.id
+        )
+
+        db.session.add(test)
+        db.session.commit()
+
+        flash('Тест успешно создан! Теперь добавьте вопросы.', 'success')
+        return redirect(url_for('moderator.add_questions', test_id=test.id))
+
+    return render_template('create_test.html', form=form)
+
+
+# ========== ПРОСМОТР И ДОБАВЛЕНИЕ ВОПРОСОВ ==========
+@moderator_bp.route('/test/<int:test_id>/questions')
+@login_required
+def add_questions(test_id):
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test = Test.query.get_or_404(test_id)
+
+    # Проверяем, что тест создан текущим модератором
+    if test.created_by != current_user.id:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('moderator.panel'))
+
+    questions = Question.query.filter_by(test_id=test_id).all()
+    item_stats, answer_selected = stats_for_test(test_id)
+
+    from website.moderator_forms import AddQuestionForm
+    form = AddQuestionForm()
+
+    return render_template('add_questions.html', test=test, questions=questions, form=form,
+                           item_stats=item_stats, answer_selected=answer_selected)
+
+
+# ========== ПРОСМОТР РЕЗУЛЬТАТОВ ==========
+@moderator_bp.route('/results')
+@login_required
+def view_results():
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    filters = result_browser.parse_filters(request.args)
+    results, next_cursor = result_browser.results_page(filters, request.args.get('after'),
+                                                      current_app.config['RESULTS_PAGE_SIZE'])
+
+    return render_template('moderator_results.html',
+                           results=results,
+                           next_cursor=next_cursor,
+                           is_first_page=not request.args.get('after'),
+                           filters=filters,
+                           filter_args={key: value for key, value in request.args.items()
+                                        if key != 'after' and value},
+                           tests=db.session.query(Test.id, Test.title).filter(
+                               Test.deleted_at.is_(None)).order_by(Test.title).all())
+
+
+@moderator_bp.route('/results/export.csv')
+@login_required
+def export_results_csv():
+    """Потоковая выгрузка отфильтрованных результатов в CSV."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    filters = result_browser.parse_filters(request.args)
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=';')
+        # BOM — чтобы Excel открыл файл в UTF-8
+        buffer.write('\ufeff')
+        writer.writerow(result_browser.EXPORT_HEADER)
+        for row in result_browser.iter_results(filters, chunk_size):
+            writer.writerow(result_browser.export_values(row))
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return Response(stream_with_context(generate()), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=results.csv'})
+
+
+@moderator_bp.route('/results/export.xlsx')
+@login_required
+def export_results_xlsx():
+    """
+    Выгрузка в XLSX. Книга в режиме write_only держит строки во временных
+    файлах, а не в памяти; архив собирается во временный файл и отдается целиком.
+    """
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    from openpyxl import Workbook
+
+    filters = result_browser.parse_filters(request.args)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Результаты')
+    sheet.append(result_browser.EXPORT_HEADER)
+    for row in result_browser.iter_results(filters, current_app.config['EXPORT_CHUNK_SIZE']):
+        sheet.append(result_browser.export_values(row))
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return send_file(output, as_attachment=True, download_name='results.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+@moderator_bp.route('/mastery')
+@login_required
+def mastery_report():
+    """Освоение тем по специализациям: доля верных ответов по темам и уровням."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    specialization = request.args.get('specialization') or None
+    return render_template('moderator_mastery.html',
+                           topics=mastery.cohort_breakdown(specialization),
+                           cohorts=mastery.cohorts(),
+                           specialization=specialization)
+
+
+# ========== ОТЧЕТ ПО КОГОРТАМ ==========
+def _cube_request():
+    """Измерения группировки, фильтры и диапазон месяцев из параметров запроса."""
+    group_by = [name for name in request.args.getlist('by') if name in cohort_cube.DIMENSIONS]
+    if not group_by:
+        group_by = ['specialization']
+
+    filters = {}
+    for name in cohort_cube.DIMENSIONS:
+        value = request.args.get(name)
+        if not value:
+            continue
+        if name == 'test':
+            try:
+                value = int(value)
+            except ValueError:
+                continue
+        filters[name] = value
+
+    return group_by, filters, request.args.get('from') or None, request.args.get('to') or None
+
+
+@moderator_bp.route('/cohorts')
+@login_required
+def cohort_report():
+    """Доля сдавших по учреждениям, специализациям, должностям, стажу, тестам и месяцам."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    group_by, filters, month_from, month_to = _cube_request()
+    return render_template('moderator_cohorts.html',
+                           rows=cohort_cube.query_cube(group_by, filters, month_from, month_to),
+                           dimensions=cohort_cube.DIMENSIONS,
+                           values=cohort_cube.dimension_values(),
+                           group_by=group_by,
+                           filters=filters,
+                           month_from=month_from,
+                           month_to=month_to)
+
+
+@moderator_bp.route('/cohorts.json')
+@login_required
+def cohort_report_json():
+    if not current_user.is_moderator:
+        return jsonify(error='forbidden'), 403
+
+    group_by, filters, month_from, month_to = _cube_request()
+    return jsonify(group_by=group_by, filters=filters,
+                   rows=cohort_cube.query_cube(group_by, filters, month_from, month_to))
+
+
+@moderator_bp.route('/cohorts.csv')
+@login_required
+def cohort_report_csv():
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    group_by, filters, month_from, month_to = _cube_request()
+    rows = cohort_cube.query_cube(group_by, filters, month_from, month_to)
+
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=';')
+    header = [cohort_cube.DIMENSIONS[name][1] for name in group_by]
+    if 'test' in group_by:
+        header.insert(group_by.index('test') + 1, 'Название теста')
+    writer.writerow(header + ['Попыток', 'Сдали', 'Доля сдавших, %', 'Средний балл, %'])
+    for row in rows:
+        values = [row[name] for name in group_by]
+        if 'test' in group_by:
+            values.insert(group_by.index('test') + 1, row['test_title'])
+        writer.writerow(values + [row['attempts'], row['passed'], row['pass_rate'], row['avg_score']])
+
+    # BOM — чтобы Excel открыл файл в UTF-8
+    return Response('\ufeff' + output.getvalue(), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=cohorts.csv'})
+
+
+@moderator_bp.route('/grading/stats')
+@login_required
+def grading_stats():
+    """Мониторинг асинхронной проверки: глубина очереди и задержка."""
+    if not current_user.is_moderator:
+        return jsonify(error='forbidden'), 403
+    return jsonify(grading_queue.stats())
+
+
+# ========== ПЕРЕКЛЮЧЕНИЕ АКТИВНОСТИ ТЕСТА ==========
+@moderator_bp.route('/test/<int:test_id>/toggle')
+@login_required
+def toggle_test(test_id):
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    # Тест, ожидающий фоновой очистки, уже удален — вернуть его в каталог нельзя
+    test = Test.query.filter(Test.id == test_id, Test.deleted_at.is_(None)).first_or_404()
+    test.is_active = not test.is_active
+
+    db.session.commit()
+
+    status = 'активирован' if test.is_active else 'деактивирован'
+    flash(f'Тест "{test.title}" {status}', 'success')
+    return redirect(url_for('moderator.panel'))
+
+
+# В moderator.py добавьте после функции toggle_test:
+
+@moderator_bp.route('/test/<int:test_id>/delete', methods=['POST'])
+@login_required
+def delete_test(test_id):
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test = Test.query.get_or_404(test_id)
+
+    # Проверяем, что тест создан текущим модератором или пользователь - админ
+    if test.created_by != current_user.id and not current_user.is_admin:
+        flash('Вы не можете удалить этот тест', 'danger')
+        return redirect(url_for('moderator.panel'))
+
+    # Получаем название теста до удаления (для сообщения)
+    test_title = test.title
+
+    try:
+        # Результаты, вопросы, ответы и сводки удаляются запросами с подзапросами;
+        # тест с большим числом результатов дочищается в фоне
+        immediate = purger.delete_tests([test_id])
+        db.session.commit()
+        grading.invalidate_test(test_id)
+        paper.invalidate_test(test_id)
+
+        if immediate:
+            flash(f'Тест "{test_title}" успешно удален', 'success')
+        else:
+            purger.schedule()
+            flash(f'Тест "{test_title}" скрыт и будет удален в фоне вместе с результатами', 'success')
+
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ошибка при удалении теста: {str(e)}', 'danger')
+
+    return redirect(url_for('moderator.panel'))
+
+
+@moderator_bp.route('/tests/delete_multiple', methods=['POST'])
+@login_required
+def delete_multiple_tests():
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test_ids = request.form.getlist('test_ids')
+
+    if not test_ids:
+        flash('Не выбраны тесты для удаления', 'warning')
+        return redirect(url_for('moderator.panel'))
+
+    deleted_ids = []
+    error_tests = []
+
+    tests = db.session.query(Test.id, Test.title, Test.created_by).filter(
+        Test.id.in_([int(test_id) for test_id in test_ids if test_id.isdigit()]),
+        Test.deleted_at.is_(None)
+    ).all()
+    for test in tests:
+        # Проверяем права
+        if test.created_by != current_user.id and not current_user.is_admin:
+            error_tests.append(f"{test.title} (нет прав)")
+            continue
+        deleted_ids.append(test.id)
+    deleted_count = len(deleted_ids)
+
+    try:
+        immediate = purger.delete_tests(deleted_ids) if deleted_ids else True
+        db.session.commit()
+        for test_id in deleted_ids:
+            grading.invalidate_test(test_id)
+            paper.invalidate_test(test_id)
+        if not immediate:
+            purger.schedule()
+
+        if deleted_count > 0:
+            flash(f'Успешно удалено {deleted_count} тестов', 'success')
+
+        if error_tests:
+            flash(f'Ошибки при удалении: {", ".join(error_tests)}', 'warning')
+
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ошибка при удалении тестов: {str(e)}', 'danger')
+
+    return redirect(url_for('moderator.panel'))
+
+# ========== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ДЛЯ ФАЙЛОВ ==========
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def save_uploaded_file(file):
+    if file and allowed_file(file.filename):
+        # Имя файла — хеш содержимого; варианты для показа строятся в фоне
+        return image_pipeline.save(file.stream, file.filename)
+    return None
+
+
+@moderator_bp.route('/test/<int:test_id>/add_question', methods=['POST'])
+@login_required
+def add_question(test_id):
+    """Добавление вопроса из модального окна (текст, тема, картинка, ответы)."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test = Test.query.get_or_404(test_id)
+
+    # Проверяем, что тест создан текущим модератором
+    if test.created_by != current_user.id and not current_user.is_admin:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('moderator.panel'))
+
+    question_text = (request.form.get('question_text') or '').strip()
+    question_type = request.form.get('question_type')
+    topic = (request.form.get('topic') or '').strip()
+    question_level = request.form.get('question_level') or 'medium'
+    points_raw = request.form.get('points', '1')
+
+    # Простая серверная валидация
+    if not question_text:
+        flash('Введите текст вопроса.', 'danger')
+        return redirect(url_for('moderator.add_questions', test_id=test_id))
+
+    try:
+        points = int(points_raw)
+        if points < 1:
+            points = 1
+    except ValueError:
+        points = 1
+
+    try:
+        text_tolerance = min(max(int(request.form.get('text_tolerance', '1')), 0), MAX_TOLERANCE)
+    except ValueError:
+        text_tolerance = 1
+
+    # Сохраняем изображение, если есть
+    image_file = request.files.get('image')
+    image_filename = save_uploaded_file(image_file) if image_file else None
+
+    # Создаем вопрос
+    question = Question(
+        test_id=test_id,
+        text=question_text,
+        question_type=question_type,
+        points=points,
+        image_filename=image_filename,
+        topic=topic,
+        question_level=question_level,
+        text_tolerance=text_tolerance,
+        last_modified_by_id=current_user.id
+    )
+
+    db.session.add(question)
+    db.session.commit()
+
+    # Добавляем ответы
+    if question_type in ['single', 'multiple']:
+        i = 0
+        while True:
+            answer_text = request.form.get(f'question-answers-{i}-text')
+            if not answer_text:
+                i += 1
+                if i > 20:
+                    break
+                continue
+
+            if question_type == 'single':
+                correct_answer_index = request.form.get('correct_answer')
+                is_correct = (correct_answer_index == str(i))
+            else:
+                is_correct = request.form.get(f'question-answers-{i}-is_correct') == 'true'
+
+            answer = Answer(
+                question_id=question.id,
+                text=answer_text.strip(),
+                is_correct=is_correct
+            )
+            db.session.add(answer)
+            i += 1
+
+    elif question_type == 'text':
+        # Несколько допустимых вариантов; нормализованная форма считается один раз здесь
+        for variant in split_variants(request.form.get('text_correct_answer')):
+            answer = Answer(
+                question_id=question.id,
+                text=variant,
+                normalized_text=normalize_answer(variant),
+                is_correct=True
+            )
+            db.session.add(answer)
+
+    # Новая версия содержимого теста — закешированные ключ ответов и бланк устарели
+    test.content_version = (test.content_version or 0) + 1
+
+    db.session.commit()
+    flash('Вопрос успешно добавлен!', 'success')
+    return redirect(url_for('moderator.add_questions', test_id=test_id))
+
+@moderator_bp.route('/test/<int:test_id>/import_questions', methods=['POST'])
+@login_required
+def import_questions(test_id):
+    """Массовый импорт вопросов из файла CSV, JSON/JSONL или GIFT (изображения — из zip-архива)."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test = Test.query.get_or_404(test_id)
+    if test.created_by != current_user.id and not current_user.is_admin:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('moderator.panel'))
+
+    upload = request.files.get('questions_file')
+    if not upload or not upload.filename:
+        flash('Выберите файл с вопросами.', 'warning')
+        return redirect(url_for('moderator.add_questions', test_id=test_id))
+
+    file_format = request.form.get('file_format') or question_import.detect_format(upload.filename)
+    if file_format not in question_import.FORMATS:
+        flash('Неизвестный формат файла: поддерживаются CSV, JSON/JSONL и GIFT.', 'danger')
+        return redirect(url_for('moderator.add_questions', test_id=test_id))
+
+    images = None
+    archive = request.files.get('images_zip')
+    if archive and archive.filename:
+        try:
+            images = question_import.ImageArchive(archive.stream, current_app.config['ALLOWED_EXTENSIONS'])
+        except zipfile.BadZipFile:
+            flash('Архив изображений поврежден или не является zip-файлом.', 'danger')
+            return redirect(url_for('moderator.add_questions', test_id=test_id))
+
+    try:
+        summary = question_import.import_questions(test, question_import.text_stream(upload.stream),
+                                                   file_format, current_user.id, images)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        flash('Файл должен быть в кодировке UTF-8. Вопросы из уже обработанных пачек сохранены.', 'danger')
+        return redirect(url_for('moderator.add_questions', test_id=test_id))
+    finally:
+        if images:
+            images.close()
+
+    flash(f'Импортировано вопросов: {summary["imported"]}, пропущено с ошибками: {summary["error_count"]}.',
+          'success' if summary['imported'] else 'warning')
+    if summary['errors']:
+        shown = summary['errors'][:10]
+        details = '; '.join(f'строка {line}: {message}' for line, message in shown)
+        if summary['error_count'] > len(shown):
+            details += f'; и еще {summary["error_count"] - len(shown)}'
+        flash(f'Ошибки импорта — {details}', 'warning')
+    return redirect(url_for('moderator.add_questions', test_id=test_id))
+
+
+@moderator_bp.route('/test/<int:test_id>/export.<any(json, jsonl):file_format>')
+@login_required
+def export_test(test_id, file_format):
+    """Потоковая выгрузка вопросов теста в JSON или JSONL (формат импорта)."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test = Test.query.filter(Test.id == test_id, Test.deleted_at.is_(None)).first_or_404()
+    return Response(stream_with_context(test_bank.EXPORTERS[file_format](test.id)),
+                    mimetype='application/json' if file_format == 'json' else 'application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename=test_{test.id}.{file_format}'})
+
+
+@moderator_bp.route('/questions/export.jsonl')
+@login_required
+def export_bank():
+    """Потоковая выгрузка всего банка вопросов в JSONL (с id и названием теста)."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    return Response(stream_with_context(test_bank.iter_jsonl()), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': 'attachment; filename=question_bank.jsonl'})
+
+
+@moderator_bp.route('/test/<int:test_id>/clone', methods=['POST'])
+@login_required
+def clone_test(test_id):
+    """Копия теста с вопросами и ответами — например, для нового учебного года."""
+    if not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    test = Test.query.filter(Test.id == test_id, Test.deleted_at.is_(None)).first_or_404()
+    title = (request.form.get('title') or '').strip() or None
+
+    new_test_id = test_bank.clone_test(test, current_user.id, title)
+    db.session.commit()
+
+    flash(f'Создана копия теста "{test.title}". Копия неактивна — проверьте ее и активируйте.', 'success')
+    return redirect(url_for('moderator.add_questions', test_id=new_test_id))
\ No newline at end of file
@@ -0,0 +1,40 @@
+"""
+Keyset-пагинация по убыванию (момент времени, id).
+
+Следующая страница выбирается условием (moment, id) < позиции курсора,
+а не OFFSET, поэтому при подходящем составном индексе стоимость страницы
+не зависит от ее номера. Курсор — строка "<ISO-время>_<id>" в параметре after.
+"""
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(moment, row_id):
+    return f'{moment.isoformat()}_{row_id}'
+
+
+def decode_cursor(cursor):
+    """Позиция из параметра after; некорректная — None (с начала)."""
+    try:
+        moment, row_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(moment), int(row_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def seek(query, moment_column, id_column, after):
+    """Запрос, продолженный с позиции курсора и упорядоченный по убыванию ключа."""
+    position = decode_cursor(after) if after else None
+    if position:
+        query = query.filter(tuple_(moment_column, id_column) < position)
+    return query.order_by(moment_column.desc(), id_column.desc())
+
+
+def keyset_page(query, moment_column, id_column, after, limit):
+    """Страница строк и курсор следующей страницы (или None)."""
+    rows = seek(query, moment_column, id_column, after).limit(limit + 1).all()
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        return rows[:limit], encode_cursor(last._mapping[moment_column], last._mapping[id_column])
+    return rows, None
@@ -0,0 +1,109 @@
+"""
+Экзаменационный "бланк" теста — заранее отрисованные фрагменты вопросов.
+
+Вопросы с ответами загружаются фиксированным числом запросов (selectinload),
+а HTML каждого вопроса и каждого варианта ответа рендерится один раз на
+версию содержимого теста и кешируется в памяти процесса. На каждый запрос
+остается только сборка страницы: номер вопроса, порядок, id попытки.
+
+Перемешивание вопросов и ответов — детерминированная перестановка от
+TestResult.shuffle_seed поверх общего бланка: хранится только зерно,
+а повторная загрузка страницы дает тот же порядок без запросов к БД.
+"""
+from collections import namedtuple
+import random
+
+from flask import current_app
+from sqlalchemy.orm import selectinload
+
+from website.cache import LRUCache
+from website.models import Question
+from website.text_matching import MAX_TEXT_ANSWER_LENGTH
+
+PaperQuestion = namedtuple('PaperQuestion', 'id points question_type image_filename body options')
+
+
+class ExamPaper:
+    """Отрисованный бланк одного теста для конкретной версии содержимого."""
+
+    def __init__(self, test_id, version, questions):
+        self.test_id = test_id
+        self.version = version
+        self.questions = tuple(questions)
+
+    def __len__(self):
+        return len(self.questions)
+
+
+_papers = LRUCache(maxsize=128)
+
+
+def load_questions(test_id):
+    """Вопросы теста вместе с ответами — два запроса независимо от их числа."""
+    return Question.query.options(
+        selectinload(Question.answers)
+    ).filter_by(test_id=test_id).order_by(Question.id).all()
+
+
+def build_paper(test_id, version):
+    macros = current_app.jinja_env.get_template('exam_paper.html').module
+    questions = []
+    for question in load_questions(test_id):
+        answers = sorted(question.answers, key=lambda a: a.id)
+        if question.question_type == 'text':
+            options = (macros.text_input(question, MAX_TEXT_ANSWER_LENGTH),)
+        else:
+            options = tuple(macros.answer_option(question, answer) for answer in answers)
+        questions.append(PaperQuestion(
+            id=question.id,
+            points=question.points or 0,
+            question_type=question.question_type,
+            image_filename=question.image_filename,
+            body=macros.question_body(question),
+            options=options,
+        ))
+    return ExamPaper(test_id, version, questions)
+
+
+def get_paper(test):
+    """Бланк теста из кеша (или отрисованный заново при смене версии)."""
+    version = test.content_version or 0
+    return _papers.get_or_build(
+        (test.id, version),
+        lambda: build_paper(test.id, version)
+    )
+
+
+def invalidate_test(test_id):
+    _papers.discard_where(lambda key: key[0] == test_id)
+
+
+def questions_per_page(test):
+    """Вопросов на странице; 0 (и некорректное отрицательное значение) — весь бланк на одной странице."""
+    return max(test.page_size or 0, 0)
+
+
+def arrange(paper, test, seed):
+    """
+    Порядок вопросов и вариантов ответа для конкретной попытки.
+    Без зерна (или без включенного перемешивания) — исходный порядок бланка.
+    """
+    if seed is None or not (test.shuffle_questions or test.shuffle_answers):
+        return paper.questions
+
+    questions = list(paper.questions)
+    if test.shuffle_questions:
+        random.Random(seed).shuffle(questions)
+
+    if test.shuffle_answers:
+        arranged = []
+        for question in questions:
+            if len(question.options) > 1:
+                options = list(question.options)
+                # Своя перестановка для каждого вопроса, не зависящая от их порядка
+                random.Random(seed * 1000003 + question.id).shuffle(options)
+                question = question._replace(options=tuple(options))
+            arranged.append(question)
+        questions = arranged
+
+    return questions
@@ -0,0 +1,184 @@
+"""
+Удаление тестов и пользователей.
+
+Все удаления — DELETE с подзапросами, без загрузки строк в Python: сначала
+дочерние строки (ответы пользователей, результаты, ответы и вопросы), затем
+родитель. Внешние ключи объявлены с ON DELETE CASCADE, а SQLite проверяет
+их с PRAGMA foreign_keys=ON, так что забытая дочерняя таблица не оставит
+сирот; явный порядок нужен, чтобы удаление работало и на базах, созданных
+до появления каскадов, и чтобы сводки успели вычесть удаляемые попытки.
+
+Тест, у которого больше PURGE_INLINE_LIMIT результатов, не удаляется в
+запросе: он помечается (deleted_at, is_active = False) и скрывается, а
+фоновая очистка удаляет его результаты пачками по PURGE_CHUNK_SIZE —
+отдельная короткая транзакция на пачку с паузой между ними, чтобы не
+держать блокировку записи SQLite минутами. Оставшуюся очистку можно
+выполнить вручную: `flask purge-deleted`.
+"""
+from datetime import datetime
+import logging
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, select, update
+
+from website import cohort_cube, db, mastery, test_status, worker_stats
+from website.background import PeriodicWorker
+from website.models import (Answer, AnswerStats, CohortCube, ItemStats, MedicalWorker, Question, Test,
+                            TestResult, TestSubscription, TopicAttempt, UserAnswer, UserTestStatus)
+
+logger = logging.getLogger(__name__)
+
+
+def _delete_results(*criteria):
+    """Удаляет попытки, выбранные условиями по TestResult, вместе с ответами, вычитая их из сводок."""
+    worker_stats.discount_results(TestResult.query.filter(*criteria))
+    mastery.discount_results(*criteria)
+    cohort_cube.discount_results(*criteria)
+
+    results = select(TestResult.id).where(*criteria)
+    db.session.execute(delete(UserAnswer).where(UserAnswer.result_id.in_(results)))
+    db.session.execute(delete(TopicAttempt).where(TopicAttempt.result_id.in_(results)))
+    return db.session.execute(delete(TestResult).where(*criteria)).rowcount
+
+
+def _delete_tests(test_ids):
+    """Удаляет тесты без результатов: вопросы, ответы, статистику, назначения и сводки."""
+    questions = select(Question.id).where(Question.test_id.in_(test_ids))
+    db.session.execute(delete(AnswerStats).where(AnswerStats.question_id.in_(questions)))
+    db.session.execute(delete(ItemStats).where(ItemStats.question_id.in_(questions)))
+    db.session.execute(delete(Answer).where(Answer.question_id.in_(questions)))
+    db.session.execute(delete(Question).where(Question.test_id.in_(test_ids)))
+    for model in (TestSubscription, UserTestStatus, CohortCube):
+        db.session.execute(delete(model).where(model.test_id.in_(test_ids)))
+    db.session.execute(delete(Test).where(Test.id.in_(test_ids)))
+
+
+def _claim(test_ids):
+    """
+    Снимает тесты с публикации первым запросом транзакции. Запись сразу берет
+    блокировку SQLite, поэтому следующие чтения видят актуальные данные и
+    параллельная очистка (фоновая и `flask purge-deleted`) не вычтет одни и
+    те же попытки из сводок дважды. Возвращает число найденных тестов.
+    """
+    return db.session.execute(update(Test).where(Test.id.in_(test_ids)).values(is_active=False)).rowcount
+
+
+class TestPurger:
+
+    def __init__(self):
+        self.app = None
+        self.inline_limit = 5000
+        self.chunk_size = 2000
+        self.pause = 0.2
+        self._worker = None
+
+    def init_app(self, app):
+        self.app = app
+        self.inline_limit = app.config.get('PURGE_INLINE_LIMIT', 5000)
+        self.chunk_size = app.config.get('PURGE_CHUNK_SIZE', 2000)
+        self.pause = app.config.get('PURGE_PAUSE', 0.2)
+        self._worker = None
+        if app.config.get('BACKGROUND_WORKERS', True):
+            self._worker = PeriodicWorker('test-purge', self.run, app.config.get('PURGE_INTERVAL', 300))
+            # Поток запускается первым запросом — только в процессе, обслуживающем сайт, а не в
+            # командах flask. Очистка, прерванная перезапуском, продолжится при первом проходе
+            app.before_request(self._worker.ensure_started)
+
+    def delete_tests(self, test_ids):
+        """
+        Удаляет тесты в текущей транзакции (без коммита). Возвращает True,
+        если тесты удалены сразу, и False, если они помечены для фоновой
+        очистки — тогда после коммита нужно вызвать schedule().
+        """
+        _claim(test_ids)
+        results = db.session.scalar(
+            select(func.count(TestResult.id)).where(TestResult.test_id.in_(test_ids)))
+        if results > self.inline_limit:
+            db.session.execute(update(Test).where(Test.id.in_(test_ids)).values(deleted_at=datetime.utcnow()))
+            test_status.forget_tests(test_ids)
+            return False
+
+        _delete_results(TestResult.test_id.in_(test_ids))
+        _delete_tests(test_ids)
+        return True
+
+    def schedule(self):
+        if self._worker is not None:
+            self._worker.wake()
+
+    def purge_chunk(self, test_id):
+        """Удаляет очередную пачку результатов теста; когда их не осталось — сам тест. Без коммита."""
+        if not _claim([test_id]):
+            # Тест уже дочищен другим процессом
+            return 0
+        chunk = select(TestResult.id).where(
+            TestResult.test_id == test_id).order_by(TestResult.id).limit(self.chunk_size).subquery()
+        upper = db.session.scalar(select(func.max(chunk.c.id)))
+        if upper is None:
+            _delete_tests([test_id])
+            return 0
+        return _delete_results(TestResult.test_id == test_id, TestResult.id <= upper)
+
+    def purge(self, test_id):
+        """Полная очистка помеченного теста, транзакция на пачку."""
+        removed = 0
+        while True:
+            count = self.purge_chunk(test_id)
+            db.session.commit()
+            if not count:
+                return removed
+            removed += count
+            # Пауза между пачками — окно для других писателей SQLite
+            time.sleep(self.pause)
+
+    def pending(self):
+        return db.session.scalars(select(Test.id).where(Test.deleted_at.isnot(None)).order_by(Test.id)).all()
+
+    def run(self):
+        """Фоновый проход: дочищает все помеченные тесты."""
+        if self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                for test_id in self.pending():
+                    removed = self.purge(test_id)
+                    logger.info('Тест %s удален, результатов: %s', test_id, removed)
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+
+purger = TestPurger()
+
+
+def delete_worker(worker_id):
+    """
+    Удаляет пользователя с его попытками, ответами, назначениями и сводками
+    (без коммита). Авторство тестов и вопросов обнуляется.
+    """
+    mastery.forget_worker(worker_id)
+    cohort_cube.discount_worker(worker_id)
+    results = select(TestResult.id).where(TestResult.worker_id == worker_id)
+    db.session.execute(delete(UserAnswer).where(UserAnswer.result_id.in_(results)))
+    db.session.execute(delete(TopicAttempt).where(TopicAttempt.result_id.in_(results)))
+    db.session.execute(delete(TestResult).where(TestResult.worker_id == worker_id))
+    db.session.execute(delete(TestSubscription).where(TestSubscription.worker_id == worker_id))
+    test_status.forget_worker(worker_id)
+    worker_stats.forget_worker(worker_id)
+    db.session.execute(update(Test).where(Test.created_by == worker_id).values(created_by=None))
+    db.session.execute(update(Question).where(
+        Question.last_modified_by_id == worker_id).values(last_modified_by_id=None))
+    db.session.execute(delete(MedicalWorker).where(MedicalWorker.id == worker_id))
+
+
+@click.command('purge-deleted')
+@with_appcontext
+def purge_command():
+    """Дочистить тесты, помеченные на удаление."""
+    for test_id in purger.pending():
+        removed = purger.purge(test_id)
+        click.echo(f'Тест {test_id}: удалено результатов {removed}')
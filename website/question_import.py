@@ -0,0 +1,544 @@
+"""
+Массовый импорт вопросов из CSV, JSON/JSONL и Moodle GIFT.
+
+Файл читается потоково: каждый формат разбирается генератором, который
+выдает по одному сырому вопросу с номером строки, поэтому память не зависит
+от размера банка. Каждая запись проверяется; ошибочные пропускаются и
+попадают в отчет с номером строки. Корректные вопросы вставляются пачками:
+вопросы — одним executemany с RETURNING id, затем их ответы — вторым, одна
+транзакция на пачку. Изображения, на которые ссылаются вопросы, берутся из
+zip-архива и распаковываются в папку загрузок один раз на файл; имя, которого
+нет в архиве, но которое уже есть в папке загрузок (выгрузка теста с этого
+же сервера, website.test_bank), используется как есть.
+
+CSV: колонки text, type, points, topic, level, tolerance, image, answers,
+correct (разделитель «;», «,» или табуляция). Варианты в answers — через «|»,
+в correct — номера правильных вариантов с 1 через «|» или «,». Для
+текстовых вопросов answers — допустимые варианты ответа, correct не нужен.
+
+JSON: массив объектов или по объекту на строку (JSONL) с теми же полями;
+answers — список строк или объектов {"text": ..., "correct": true}.
+"""
+import csv
+import io
+import json
+import os
+import re
+import time
+import zipfile
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+
+from website import db
+from website.images import extension_of, image_pipeline
+from website.models import Answer, MedicalWorker, Question, Test
+from website.text_matching import MAX_TOLERANCE, normalize_answer, split_variants
+
+FORMATS = ('csv', 'json', 'gift')
+QUESTION_TYPES = ('single', 'multiple', 'text')
+LEVELS = ('basic', 'medium', 'hard')
+MAX_REPORTED_ERRORS = 200
+
+_EXTENSIONS = {'csv': 'csv', 'tsv': 'csv', 'json': 'json', 'jsonl': 'json', 'gift': 'gift', 'txt': 'gift'}
+_MAX_JSON_OBJECT = 1024 * 1024
+_CSV_COLUMNS = ('text', 'type', 'points', 'topic', 'level', 'tolerance', 'image', 'answers', 'correct')
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return _EXTENSIONS.get(extension)
+
+
+# ---------- Разбор форматов: генераторы (номер строки, сырой вопрос) ----------
+
+def _split_list(value, separators='|'):
+    return [item.strip() for item in re.split(f'[{re.escape(separators)}]', value or '') if item.strip()]
+
+
+class _Semicolon(csv.excel):
+    delimiter = ';'
+
+
+def iter_csv(stream):
+    header_line = stream.readline()
+    try:
+        dialect = csv.Sniffer().sniff(header_line, delimiters=';,\t')
+    except csv.Error:
+        dialect = _Semicolon
+    header = [name.strip().lower() for name in next(csv.reader([header_line], dialect))]
+    unknown = set(header) - set(_CSV_COLUMNS)
+    if 'text' not in header or unknown:
+        yield 1, ValueError(f'Заголовок должен содержать колонки {", ".join(_CSV_COLUMNS)}; '
+                            f'колонка text обязательна')
+        return
+
+    reader = csv.reader(stream, dialect)
+    start = 2
+    for values in reader:
+        # Номер первой физической строки записи (поля в кавычках бывают многострочными)
+        line, start = start, reader.line_num + 2
+        if not any(value.strip() for value in values):
+            continue
+        row = dict(zip(header, values))
+        correct = _split_list(row.get('correct'), '|,')
+        answers = _split_list(row.get('answers'))
+        yield line, {
+            'text': row.get('text'),
+            'type': row.get('type'),
+            'points': row.get('points'),
+            'topic': row.get('topic'),
+            'level': row.get('level'),
+            'tolerance': row.get('tolerance'),
+            'image': row.get('image'),
+            'answers': [{'text': text, 'correct': str(number) in correct}
+                        for number, text in enumerate(answers, 1)],
+        }
+
+
+def _iter_json_array(stream, chunk_size=64 * 1024):
+    """Объекты JSON-массива по одному, без чтения файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer, position, line, eof = '', 0, 1, False
+    started = False
+    while True:
+        # Пропускаем пробелы, скобку массива и запятые между объектами
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            if buffer[position] == '\n':
+                line += 1
+            if buffer[position] == '[':
+                started = True
+            position += 1
+
+        if position >= len(buffer):
+            if eof:
+                return
+            buffer, position = stream.read(chunk_size), 0
+            eof = not buffer
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as exc:
+            # Объект не поместился в буфер — дочитываем, но не больше _MAX_JSON_OBJECT
+            more = '' if eof or len(buffer) - position > _MAX_JSON_OBJECT else stream.read(chunk_size)
+            if not more:
+                yield line, ValueError(f'Некорректный JSON: {exc.msg}')
+                return
+            buffer, position = buffer[position:] + more, 0
+            continue
+
+        if not started:
+            yield line, ValueError('Ожидался массив объектов')
+            return
+        yield line, value
+        line += buffer.count('\n', position, end)
+        position = end
+        # Держим в буфере только необработанную часть
+        if position > chunk_size:
+            buffer, position = buffer[position:], 0
+
+
+def iter_json(stream):
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if not first:
+        return
+
+    if first == '[':
+        records = _iter_json_array(_Prepend(first, stream))
+    else:
+        records = _iter_jsonl(_Prepend(first, stream))
+
+    for line, value in records:
+        if isinstance(value, Exception):
+            yield line, value
+        elif not isinstance(value, dict):
+            yield line, ValueError('Вопрос должен быть объектом')
+        else:
+            yield line, _json_record(value)
+
+
+def _iter_jsonl(stream):
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except json.JSONDecodeError as exc:
+            yield line, ValueError(f'Некорректный JSON: {exc.msg}')
+
+
+class _Prepend:
+    """Поток с возвращенным в начало прочитанным фрагментом."""
+
+    def __init__(self, head, stream):
+        self.head, self.stream = head, stream
+
+    def read(self, size=-1):
+        head, self.head = self.head, ''
+        return head + self.stream.read(size if size < 0 else max(size - len(head), 0))
+
+    def __iter__(self):
+        head, self.head = self.head, ''
+        first = self.stream.readline()
+        yield head + first
+        yield from self.stream
+
+
+def _json_record(value):
+    answers = []
+    for answer in value.get('answers') or []:
+        if isinstance(answer, dict):
+            answers.append({'text': str(answer.get('text') or ''), 'correct': bool(answer.get('correct'))})
+        else:
+            answers.append({'text': str(answer), 'correct': False})
+    return {
+        'text': value.get('text'),
+        'type': value.get('type'),
+        'points': value.get('points'),
+        'topic': value.get('topic'),
+        'level': value.get('level'),
+        'tolerance': value.get('tolerance'),
+        'image': value.get('image'),
+        'answers': answers,
+    }
+
+
+_GIFT_ESCAPES = re.compile(r'\\([~=#{}:\\])')
+_GIFT_TITLE = re.compile(r'^::(.*?)::')
+_GIFT_FORMAT = re.compile(r'^\[(?:html|moodle|plain|markdown)\]', re.IGNORECASE)
+_GIFT_IMAGE = re.compile(r'<img[^>]*\bsrc="([^"]+)"[^>]*>', re.IGNORECASE)
+_GIFT_WEIGHT = re.compile(r'^%(-?\d+(?:\.\d+)?)%')
+_GIFT_TAG = re.compile(r'<[^>]+>')
+
+
+def _gift_unescape(text):
+    return _GIFT_ESCAPES.sub(r'\1', text).strip()
+
+
+def _gift_split(body):
+    """Части блока ответов, начинающиеся с неэкранированных ~ = #."""
+    parts, current, escaped = [], '', False
+    for char in body:
+        if escaped:
+            current += '\\' + char
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in '~=#':
+            parts.append(current)
+            current = char
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+
+def _gift_record(block, topic):
+    """Один вопрос GIFT: текст {ответы}."""
+    open_at = re.search(r'(?<!\\)\{', block)
+    close_at = re.search(r'(?<!\\)\}', block[open_at.end():]) if open_at else None
+    if not open_at or not close_at:
+        raise ValueError('Нет блока ответов {...}')
+
+    text = block[:open_at.start()] + block[open_at.end() + close_at.end():]
+    body = block[open_at.end():open_at.end() + close_at.start()].strip()
+
+    text = _GIFT_FORMAT.sub('', _GIFT_TITLE.sub('', text.strip()).strip())
+    image = None
+    found = _GIFT_IMAGE.search(text)
+    if found:
+        image = found.group(1).rsplit('/', 1)[-1]
+        text = _GIFT_IMAGE.sub('', text)
+    text = _gift_unescape(_GIFT_TAG.sub('', text))
+
+    record = {'text': text, 'topic': topic, 'image': image, 'answers': []}
+
+    if body.upper() in ('T', 'TRUE', 'F', 'FALSE'):
+        truth = body.upper().startswith('T')
+        record['type'] = 'single'
+        record['answers'] = [{'text': 'Верно', 'correct': truth}, {'text': 'Неверно', 'correct': not truth}]
+        return record
+
+    if body.startswith('#'):
+        raise ValueError('Числовые вопросы GIFT не поддерживаются')
+    if '->' in body:
+        raise ValueError('Вопросы GIFT на соответствие не поддерживаются')
+
+    markers, weighted = set(), False
+    for part in _gift_split(body):
+        part = part.strip()
+        if not part or part.startswith('#'):
+            continue  # обратная связь к варианту не импортируется
+        if part[0] not in '~=':
+            raise ValueError('Вариант ответа должен начинаться с = или ~')
+        marker, value = part[0], part[1:].strip()
+        weight = _GIFT_WEIGHT.match(value)
+        if weight:
+            value = value[weight.end():].strip()
+            weighted = weighted or marker == '~'
+        markers.add(marker)
+        correct = marker == '=' or bool(weight and float(weight.group(1)) > 0)
+        record['answers'].append({'text': _gift_unescape(value), 'correct': correct})
+
+    # Только «=» — короткий ответ; «~» с весами — несколько правильных; иначе — один
+    if markers == {'='}:
+        record['type'] = 'text'
+    else:
+        record['type'] = 'multiple' if weighted else 'single'
+    return record
+
+
+def iter_gift(stream):
+    topic = None
+    block, block_line = [], None
+
+    def flush():
+        text = '\n'.join(block).strip()
+        if not text:
+            return None
+        try:
+            return block_line, _gift_record(text, topic)
+        except ValueError as exc:
+            return block_line, exc
+
+    for line, raw in enumerate(stream, 1):
+        stripped = raw.strip()
+        if stripped.startswith('//'):
+            continue
+        if stripped.startswith('$CATEGORY:'):
+            topic = stripped[len('$CATEGORY:'):].strip().rsplit('/', 1)[-1] or None
+            continue
+        if not stripped:
+            item = flush()
+            if item:
+                yield item
+            block, block_line = [], None
+            continue
+        if block_line is None:
+            block_line = line
+        block.append(raw.rstrip('\r\n'))
+
+    item = flush()
+    if item:
+        yield item
+
+
+_READERS = {'csv': iter_csv, 'json': iter_json, 'gift': iter_gift}
+
+
+# ---------- Проверка ----------
+
+def _int(value, default, name):
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name}: ожидается целое число')
+
+
+def validate(raw, images):
+    """Проверенный вопрос (словарь для вставки) из сырой записи; ValueError — с описанием ошибки."""
+    text = (raw.get('text') or '').strip()
+    if not text:
+        raise ValueError('Пустой текст вопроса')
+
+    question_type = (raw.get('type') or '').strip().lower() or 'single'
+    if question_type not in QUESTION_TYPES:
+        raise ValueError(f'Неизвестный тип вопроса "{question_type}"')
+
+    points = _int(raw.get('points'), 1, 'Баллы')
+    if points < 1:
+        raise ValueError('Баллы: должно быть не меньше 1')
+
+    level = (raw.get('level') or '').strip().lower() or 'medium'
+    if level not in LEVELS:
+        raise ValueError(f'Неизвестный уровень "{level}"')
+
+    tolerance = _int(raw.get('tolerance'), 1, 'Допуск опечаток')
+    if not 0 <= tolerance <= MAX_TOLERANCE:
+        raise ValueError(f'Допуск опечаток: от 0 до {MAX_TOLERANCE}')
+
+    answers = [answer for answer in raw.get('answers') or [] if answer['text'].strip()]
+    if question_type == 'text':
+        variants = [variant for answer in answers for variant in split_variants(answer['text'])]
+        if not variants:
+            raise ValueError('Нет допустимых вариантов ответа')
+        answers = [{'text': variant, 'correct': True} for variant in variants]
+    else:
+        correct = sum(1 for answer in answers if answer['correct'])
+        if len(answers) < 2:
+            raise ValueError('Нужно не меньше двух вариантов ответа')
+        if question_type == 'single' and correct != 1:
+            raise ValueError('Для вопроса с одним ответом нужен ровно один правильный вариант')
+        if question_type == 'multiple' and not correct:
+            raise ValueError('Не отмечен ни один правильный вариант')
+
+    image = (raw.get('image') or '').strip() or None
+    in_archive = bool(image and images is not None and images.has(image))
+    if image and not in_archive and not is_uploaded(image):
+        if images is None:
+            raise ValueError(f'Изображение "{image}" не загружено на сервер, а архив изображений не приложен')
+        raise ValueError(f'Изображение "{image}" не найдено ни в архиве, ни среди загруженных')
+
+    return {
+        'text': text,
+        'question_type': question_type,
+        'points': points,
+        'topic': (raw.get('topic') or '').strip() or None,
+        'question_level': level,
+        'text_tolerance': tolerance,
+        'image': image,
+        'image_in_archive': in_archive,
+        'answers': [(answer['text'].strip(), bool(answer['correct'])) for answer in answers],
+    }
+
+
+# ---------- Изображения ----------
+
+def is_uploaded(name):
+    """Есть ли в папке загрузок изображение с таким именем (имя без каталогов)."""
+    if name != os.path.basename(name) or name.startswith('.') \
+            or extension_of(name) not in current_app.config['ALLOWED_EXTENSIONS']:
+        return False
+    return os.path.isfile(os.path.join(image_pipeline.upload_folder, name))
+
+
+class ImageArchive:
+    """Изображения из zip-архива; каждый файл распаковывается в папку загрузок один раз."""
+
+    def __init__(self, file, allowed_extensions):
+        self.zip = zipfile.ZipFile(file)
+        self.allowed = allowed_extensions
+        self.members = {}
+        for info in self.zip.infolist():
+            name = info.filename.rsplit('/', 1)[-1]
+            if not info.is_dir() and name:
+                self.members.setdefault(name.lower(), info)
+        self.saved = {}
+
+    def has(self, name):
+        name = name.rsplit('/', 1)[-1].lower()
+        return name in self.members and name.rsplit('.', 1)[-1] in self.allowed
+
+    def save(self, name):
+        key = name.rsplit('/', 1)[-1].lower()
+        if key not in self.saved:
+            with self.zip.open(self.members[key]) as source:
+                self.saved[key] = image_pipeline.save(source, key)
+        return self.saved[key]
+
+    def close(self):
+        self.zip.close()
+
+
+# ---------- Вставка ----------
+
+def _insert_batch(test, batch, author_id, images):
+    questions = db.session.execute(
+        insert(Question).returning(Question.id, sort_by_parameter_order=True),
+        [{
+            'test_id': test.id,
+            'text': item['text'],
+            'question_type': item['question_type'],
+            'points': item['points'],
+            'topic': item['topic'],
+            'question_level': item['question_level'],
+            'text_tolerance': item['text_tolerance'],
+            'image_filename': images.save(item['image']) if item['image_in_archive'] else item['image'],
+            'last_modified_by_id': author_id,
+        } for item in batch]
+    ).scalars().all()
+
+    answers = [{
+        'question_id': question_id,
+        'text': text,
+        'is_correct': correct,
+        'normalized_text': normalize_answer(text) if item['question_type'] == 'text' else None,
+    } for question_id, item in zip(questions, batch) for text, correct in item['answers']]
+    db.session.execute(insert(Answer), answers)
+
+    # Новая версия содержимого теста — закешированные ключ ответов и бланк устарели
+    test.content_version = (test.content_version or 0) + 1
+    db.session.commit()
+
+
+def import_questions(test, stream, file_format, author_id=None, images=None, batch_size=None):
+    """
+    Импортирует вопросы из текстового потока в тест.
+    Возвращает сводку: imported — число добавленных вопросов, errors — список
+    (номер строки, сообщение) для пропущенных записей (не больше
+    MAX_REPORTED_ERRORS), error_count — общее число ошибок.
+    """
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    summary = {'imported': 0, 'errors': [], 'error_count': 0}
+    batch = []
+
+    for line, raw in _READERS[file_format](stream):
+        try:
+            if isinstance(raw, Exception):
+                raise raw
+            batch.append(validate(raw, images))
+        except ValueError as exc:
+            summary['error_count'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append((line, str(exc)))
+            continue
+
+        if len(batch) >= batch_size:
+            _insert_batch(test, batch, author_id, images)
+            summary['imported'] += len(batch)
+            batch = []
+
+    if batch:
+        _insert_batch(test, batch, author_id, images)
+        summary['imported'] += len(batch)
+    return summary
+
+
+def text_stream(binary):
+    """Текстовый поток UTF-8 (с BOM или без) поверх двоичного."""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+
+
+@click.command('import-questions')
+@click.argument('test_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--images', type=click.Path(exists=True, dir_okay=False), help='zip-архив с изображениями')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS), help='формат файла (по умолчанию — по расширению)')
+@click.option('--author', help='логин автора изменений')
+@with_appcontext
+def import_command(test_id, path, images, file_format, author):
+    """Импортировать вопросы в тест из CSV, JSON/JSONL или GIFT."""
+    test = db.session.get(Test, test_id)
+    if test is None:
+        raise click.ClickException(f'Тест {test_id} не найден')
+    file_format = file_format or detect_format(path)
+    if file_format is None:
+        raise click.ClickException('Не удалось определить формат файла, укажите --format')
+
+    author_id = None
+    if author:
+        author_id = db.session.query(MedicalWorker.id).filter_by(username=author).scalar()
+        if author_id is None:
+            raise click.ClickException(f'Пользователь {author} не найден')
+
+    archive = ImageArchive(images, current_app.config['ALLOWED_EXTENSIONS']) if images else None
+    started = time.perf_counter()
+    try:
+        with open(path, 'rb') as binary:
+            summary = import_questions(test, text_stream(binary), file_format, author_id, archive)
+    finally:
+        if archive:
+            archive.close()
+    elapsed = time.perf_counter() - started
+
+    for line, message in summary['errors']:
+        click.echo(f'строка {line}: {message}', err=True)
+    click.echo(f'Импортировано вопросов: {summary["imported"]}, ошибок: {summary["error_count"]} '
+               f'({elapsed:.1f} с)')
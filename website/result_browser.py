@@ -0,0 +1,110 @@
+"""
+Просмотр и выгрузка результатов для модераторов.
+
+Результаты выбираются проекцией нужных колонок (без ORM-объектов), с
+фильтрами по тесту, пользователю, датам и исходу, по убыванию
+(completed_at, id) — под это есть составные индексы на test_results.
+Выгрузка идет пачками по тому же ключу (keyset), поэтому память не зависит
+от числа строк, а SQLite не держит чтение открытым на всю выгрузку.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select
+
+from website import db
+from website.models import MedicalWorker, Test, TestResult
+from website.pagination import keyset_page
+
+OUTCOMES = {
+    'passed': TestResult.passed.is_(True),
+    'failed': TestResult.passed.is_(False),
+    'pending': TestResult.passed.is_(None),
+}
+
+EXPORT_HEADER = ('ID', 'Тест', 'Пользователь', 'Логин', 'Специализация', 'Учреждение',
+                 'Начат', 'Завершен', 'Время, сек', 'Баллы', 'Процент', 'Результат')
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_filters(args):
+    """Фильтры из параметров запроса; пустые и некорректные значения отбрасываются."""
+    return {
+        'test_id': args.get('test_id', type=int),
+        'worker': (args.get('worker') or '').strip() or None,
+        'date_from': _parse_date(args.get('date_from')),
+        'date_to': _parse_date(args.get('date_to')),
+        'outcome': args.get('outcome') if args.get('outcome') in OUTCOMES else None,
+    }
+
+
+def filtered_query(filters):
+    query = db.session.query(
+        TestResult.id, TestResult.test_id, TestResult.worker_id,
+        TestResult.started_at, TestResult.completed_at, TestResult.time_taken,
+        TestResult.score, TestResult.percentage, TestResult.passed,
+        Test.title.label('test_title'),
+        MedicalWorker.first_name, MedicalWorker.last_name, MedicalWorker.username,
+        MedicalWorker.specialization, MedicalWorker.institution
+    ).select_from(TestResult).outerjoin(
+        Test, Test.id == TestResult.test_id
+    ).outerjoin(
+        MedicalWorker, MedicalWorker.id == TestResult.worker_id
+    ).filter(TestResult.completed_at.isnot(None))
+
+    if filters.get('test_id'):
+        query = query.filter(TestResult.test_id == filters['test_id'])
+    if filters.get('worker'):
+        worker = filters['worker']
+        query = query.filter(TestResult.worker_id.in_(select(MedicalWorker.id).where(or_(
+            MedicalWorker.username == worker,
+            MedicalWorker.email == worker,
+            MedicalWorker.last_name.startswith(worker, autoescape=True)
+        ))))
+    if filters.get('date_from'):
+        query = query.filter(TestResult.completed_at >= filters['date_from'])
+    if filters.get('date_to'):
+        query = query.filter(TestResult.completed_at < filters['date_to'] + timedelta(days=1))
+    if filters.get('outcome'):
+        query = query.filter(OUTCOMES[filters['outcome']])
+    return query
+
+
+def results_page(filters, after=None, limit=50):
+    return keyset_page(filtered_query(filters), TestResult.completed_at, TestResult.id, after, limit)
+
+
+def iter_results(filters, chunk_size=2000):
+    """Все отфильтрованные результаты, пачками по chunk_size."""
+    after = None
+    while True:
+        rows, after = results_page(filters, after, chunk_size)
+        yield from rows
+        if after is None:
+            return
+
+
+def export_values(row):
+    if row.passed is None:
+        outcome = 'Проверяется'
+    else:
+        outcome = 'Пройден' if row.passed else 'Не пройден'
+    return (
+        row.id,
+        row.test_title or 'Тест удален',
+        f'{row.last_name} {row.first_name}' if row.username else 'Пользователь удален',
+        row.username or '',
+        row.specialization or '',
+        row.institution or '',
+        row.started_at.strftime('%d.%m.%Y %H:%M') if row.started_at else '',
+        row.completed_at.strftime('%d.%m.%Y %H:%M'),
+        row.time_taken if row.time_taken is not None else '',
+        row.score if row.score is not None else '',
+        round(row.percentage, 1) if row.percentage is not None else '',
+        outcome,
+    )
@@ -0,0 +1,21 @@
+"""Общие операции для сводных (rollup) таблиц, обновляемых инкрементально."""
+from sqlalchemy import and_, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from website import db
+
+
+def upsert(table, key, changes, initial):
+    """
+    UPDATE строки с ключом key (словарь колонка -> значение) выражениями changes,
+    а если строки нет — INSERT с начальными значениями initial. Без коммита.
+    """
+    where = and_(*(table.c[column] == value for column, value in key.items()))
+    if db.session.execute(update(table).where(where).values(**changes)).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(table).values(**key, **initial))
+    except IntegrityError:
+        # Строку успел вставить параллельный запрос
+        db.session.execute(update(table).where(where).values(**changes))
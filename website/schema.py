@@ -0,0 +1,198 @@
+"""
+Обновление схемы существующей базы до текущих моделей: `flask upgrade-schema`.
+
+db.create_all() только создает недостающие таблицы и не меняет существующие,
+поэтому база, созданная до появления новых колонок, индексов и каскадных
+внешних ключей, падает на первом же запросе ("no such column"). Команда
+приводит базу к моделям и безопасна при повторном запуске:
+
+- создает недостающие таблицы; новые сводные таблицы заполняет из результатов,
+  а попыткам без ключа когорты (website/cohort_cube.py) записывает его;
+- добавляет недостающие колонки (ALTER TABLE ADD COLUMN со значением по умолчанию);
+- пересобирает таблицы, внешние ключи которых отличаются от моделей (например,
+  без ON DELETE CASCADE): SQLite не меняет ограничения существующей таблицы,
+  поэтому строки копируются в новую таблицу, которая затем занимает место старой;
+- удаляет повторные назначения и создает недостающие индексы;
+- пересоздает полнотекстовые индексы с триггерами и нормализует текстовые ответы.
+
+Структурные изменения выполняются в одной транзакции с отключенной проверкой
+внешних ключей; перед коммитом целостность проверяется PRAGMA foreign_key_check.
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, inspect, update
+from sqlalchemy.schema import CreateTable
+
+from website import cohort_cube, db, mastery, search, test_status, worker_stats
+from website.models import Answer, Question
+from website.text_matching import normalize_answer
+
+# Сводные таблицы, которые заполняются из результатов, если их только что создали
+_ROLLUPS = {
+    'user_test_status': test_status.rebuild,
+    'worker_stats': worker_stats.rebuild,
+    'worker_monthly_stats': worker_stats.rebuild,
+    'topic_mastery': mastery.rebuild,
+    'topic_attempts': mastery.rebuild,
+    'cohort_topic_mastery': mastery.rebuild,
+    'cohort_cube': cohort_cube.rebuild,
+}
+
+
+def _default_sql(column):
+    """Значение по умолчанию колонки в виде литерала SQL или None."""
+    default = column.default
+    if default is None or not default.is_scalar or default.arg is None:
+        return None
+    value = default.arg
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _add_column(connection, table, column):
+    definition = f'{column.name} {column.type.compile(dialect=connection.dialect)}'
+    default = _default_sql(column)
+    if default is not None:
+        # NOT NULL без значения по умолчанию SQLite добавить не позволяет
+        definition += f'{"" if column.nullable else " NOT NULL"} DEFAULT {default}'
+    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {definition}')
+
+
+def _foreign_keys(table):
+    return {
+        (tuple(constraint.column_keys), constraint.referred_table.name, (constraint.ondelete or '').upper())
+        for constraint in table.foreign_key_constraints
+    }
+
+
+def _existing_foreign_keys(inspector, table):
+    return {
+        (tuple(fk['constrained_columns']), fk['referred_table'], (fk['options'].get('ondelete') or '').upper())
+        for fk in inspector.get_foreign_keys(table.name)
+    }
+
+
+def _rebuild_table(connection, table, columns):
+    """Пересоздает таблицу по модели, сохраняя строки (колонки columns есть в обеих версиях)."""
+    temporary = f'{table.name}__upgrade'
+    ddl = str(CreateTable(table).compile(dialect=connection.dialect)).strip()
+    connection.exec_driver_sql(ddl.replace(f'CREATE TABLE {table.name} (', f'CREATE TABLE {temporary} (', 1))
+    names = ', '.join(columns)
+    connection.exec_driver_sql(f'INSERT INTO {temporary} ({names}) SELECT {names} FROM {table.name}')
+    connection.exec_driver_sql(f'DROP TABLE {table.name}')
+    connection.exec_driver_sql(f'ALTER TABLE {temporary} RENAME TO {table.name}')
+
+
+def _upgrade_tables(connection):
+    """Структурные изменения; возвращает список выполненных шагов и имена созданных таблиц."""
+    steps, created = [], []
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+
+    missing = [table for table in db.metadata.sorted_tables if table.name not in existing]
+    if missing:
+        db.metadata.create_all(connection, tables=missing)
+        created = [table.name for table in missing]
+        steps.append(f'созданы таблицы: {", ".join(created)}')
+
+    for table in db.metadata.sorted_tables:
+        if table.name in created:
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                _add_column(connection, table, column)
+                steps.append(f'{table.name}: добавлена колонка {column.name}')
+
+    inspector = inspect(connection)
+    for table in db.metadata.sorted_tables:
+        if table.name in created or _foreign_keys(table) == _existing_foreign_keys(inspector, table):
+            continue
+        _rebuild_table(connection, table, [column.name for column in table.columns])
+        steps.append(f'{table.name}: пересоздана с внешними ключами модели')
+
+    inspector = inspect(connection)
+    indexes = {index['name'] for table in db.metadata.sorted_tables
+               for index in inspector.get_indexes(table.name)}
+    if 'uq_test_subscriptions_worker_test' not in indexes:
+        # Уникальный индекс не создать, пока есть повторные назначения
+        duplicates = connection.exec_driver_sql(
+            'DELETE FROM test_subscriptions WHERE id NOT IN '
+            '(SELECT MIN(id) FROM test_subscriptions GROUP BY worker_id, test_id)').rowcount
+        if duplicates:
+            steps.append(f'test_subscriptions: удалено повторных назначений {duplicates}')
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in indexes:
+                index.create(connection)
+                steps.append(f'{table.name}: создан индекс {index.name}')
+    return steps, created
+
+
+def _normalize_text_answers():
+    """Заполняет Answer.normalized_text у вариантов текстовых вопросов, созданных до его появления."""
+    rows = [{'answer_id': answer_id, 'normalized': normalize_answer(text)}
+            for answer_id, text in db.session.query(Answer.id, Answer.text).join(Question).filter(
+                Question.question_type == 'text', Answer.normalized_text.is_(None))]
+    if rows:
+        db.session.connection().execute(
+            update(Answer.__table__).where(Answer.__table__.c.id == bindparam('answer_id'))
+            .values(normalized_text=bindparam('normalized')), rows)
+    return len(rows)
+
+
+def upgrade():
+    """Приводит базу к моделям. Возвращает список выполненных шагов (пустой — база уже актуальна)."""
+    db.session.remove()
+    with db.engine.connect() as connection:
+        # Вне транзакции: внутри нее PRAGMA foreign_keys не действует
+        connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+        try:
+            connection.exec_driver_sql('BEGIN')
+            steps, created = _upgrade_tables(connection)
+            violations = connection.exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+            if violations:
+                tables = sorted({row[0] for row in violations})
+                raise click.ClickException(f'Нарушены внешние ключи в таблицах {", ".join(tables)}; '
+                                           f'схема не изменена')
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+
+    # Ключ когорты попыток, проверенных до его появления (по нынешним профилям — других пока нет)
+    frozen = cohort_cube.freeze_missing()
+    if frozen:
+        steps.append(f'test_results: зафиксирован ключ когорты у {frozen} попыток')
+
+    rollups = {_ROLLUPS[name] for name in created if name in _ROLLUPS}
+    for rebuild in rollups:
+        rebuild()
+    if rollups:
+        steps.append('сводные таблицы заполнены из результатов')
+
+    normalized = _normalize_text_answers()
+    if normalized:
+        steps.append(f'нормализовано текстовых ответов: {normalized}')
+
+    if steps:
+        # Таблицы tests и questions могли быть пересозданы вместе с их триггерами
+        search.rebuild_index()
+        steps.append('поисковые индексы перестроены')
+    db.session.commit()
+    return steps
+
+
+@click.command('upgrade-schema')
+@with_appcontext
+def upgrade_schema_command():
+    """Обновить схему существующей базы: колонки, внешние ключи, индексы, поиск."""
+    steps = upgrade()
+    for step in steps:
+        click.echo(step)
+    click.echo('Схема обновлена' if steps else 'Схема уже актуальна')
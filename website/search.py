@@ -0,0 +1,196 @@
+"""
+Полнотекстовый поиск по тестам и банку вопросов (SQLite FTS5).
+
+Индексы tests_fts (название, описание) и questions_fts (текст, тема) —
+external content таблицы поверх tests и questions: текст не дублируется,
+а синхронизацию выполняют триггеры, поэтому индекс остается верным и при
+массовых INSERT/DELETE в обход ORM. Таблицы и триггеры создаются вместе с
+исходными таблицами (db.create_all); для существующей БД — командой
+`flask search-index`.
+
+unicode61 не считает ё вариантом е, поэтому триггеры индексируют текст с
+заменой ё на е, а запрос нормализуется так же: "объём" и "объем" находят
+одно и то же. Подсветка берет исходный текст, в нем ё остается.
+
+Русского стеммера в FTS5 нет, поэтому слова запроса усекаются до основы
+по списку типичных окончаний и ищутся как префиксы ("инфарктом" -> инфаркт*).
+Ранжирование — bm25 с большим весом названия теста и текста вопроса.
+"""
+import re
+
+import click
+from flask.cli import with_appcontext
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, event, text
+
+from website import db
+from website.models import Test, Question
+
+_TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+_INDEXES = {
+    # индекс: (исходная таблица, индексируемые колонки)
+    'tests_fts': ('tests', ('title', 'description')),
+    'questions_fts': ('questions', ('text', 'topic')),
+}
+
+
+def _fold(column):
+    """Выражение SQL: значение колонки с ё, замененной на е (см. fold в запросе)."""
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _ddl(index):
+    table, columns = _INDEXES[index]
+    cols = ', '.join(columns)
+    new = ', '.join(_fold(f'new.{c}') for c in columns)
+    old = ', '.join(_fold(f'old.{c}') for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({cols}, "
+        f"content = '{table}', content_rowid = 'id', {_TOKENIZE})",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {index}(rowid, {cols}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+        f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {index}(rowid, {cols}) VALUES (new.id, {new}); END",
+    ]
+
+
+for _model, _index in ((Test, 'tests_fts'), (Question, 'questions_fts')):
+    for _statement in _ddl(_index):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+    event.listen(_model.__table__, 'before_drop',
+                 DDL(f'DROP TABLE IF EXISTS {_index}').execute_if(dialect='sqlite'))
+
+
+def rebuild_index():
+    """
+    Пересоздает триггеры (в том числе созданные прежней версией) и заполняет
+    индексы заново из исходных таблиц. Встроенный 'rebuild' не подходит: он
+    индексирует текст как есть, без замены ё.
+    """
+    for index, (table, columns) in _INDEXES.items():
+        for suffix in ('ai', 'ad', 'au'):
+            db.session.execute(text(f'DROP TRIGGER IF EXISTS {index}_{suffix}'))
+        for statement in _ddl(index):
+            db.session.execute(text(statement))
+        cols = ', '.join(columns)
+        db.session.execute(text(f"INSERT INTO {index}({index}) VALUES ('delete-all')"))
+        db.session.execute(text(f"INSERT INTO {index}(rowid, {cols}) "
+                                f"SELECT id, {', '.join(_fold(c) for c in columns)} FROM {table}"))
+
+
+@click.command('search-index')
+@with_appcontext
+def search_index_command():
+    """Создать и перестроить полнотекстовые индексы."""
+    rebuild_index()
+    db.session.commit()
+    click.echo('Поисковые индексы перестроены')
+
+
+# ========== ЗАПРОС ==========
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# Окончания русских слов, от длинных к коротким
+_ENDINGS = sorted('''
+    ами ями ого его ому ему ыми ими ых их ой ей ый ий ая яя ое ее ую юю
+    ов ев ах ях ом ем ам ям ия ие ию ии ья ье ью ьи
+    а я о е ы и у ю ь й
+'''.split(), key=len, reverse=True)
+
+_MIN_STEM = 4
+
+
+def fold(word):
+    """ё -> е, как в индексе."""
+    return word.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def stem(word):
+    """Грубая основа русского слова: отбрасывает окончание, если основа остается не короче 4 букв."""
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def build_match(query):
+    """
+    Строка MATCH для FTS5: каждое слово — префиксный запрос по его основе,
+    слова объединяются через AND. Спецсимволы синтаксиса FTS5 не пропускаются.
+    """
+    terms = [stem(fold(word.lower())) for word in _WORD.findall(query or '')]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+# Маркеры подсветки — управляющие символы, которых нет в тексте:
+# фрагмент сначала экранируется, затем маркеры заменяются на <mark>
+_OPEN, _CLOSE = '\x02', '\x03'
+
+
+def _highlighted(fragment):
+    if not fragment:
+        return fragment
+    return Markup(str(escape(fragment)).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>'))
+
+
+def search_tests(query, worker_id=None, include_inactive=False, limit=20):
+    """
+    Тесты по запросу, лучшие первыми. worker_id ограничивает выдачу тестами,
+    доступными пользователю (обычные и назначенные ему).
+    """
+    match = build_match(query)
+    if not match:
+        return []
+
+    visibility = ''
+    params = {'match': match, 'limit': limit}
+    if not include_inactive:
+        visibility += ' AND t.is_active = 1'
+    else:
+        visibility += ' AND t.deleted_at IS NULL'
+    if worker_id is not None:
+        visibility += (" AND (t.access_type = 'simple' OR EXISTS ("
+                       "SELECT 1 FROM user_test_status s WHERE s.worker_id = :worker_id "
+                       "AND s.test_id = t.id AND s.subscribed = 1))")
+        params['worker_id'] = worker_id
+
+    rows = db.session.execute(text(f"""
+        SELECT t.id, t.is_active,
+               highlight(tests_fts, 0, '{_OPEN}', '{_CLOSE}') AS title,
+               snippet(tests_fts, 1, '{_OPEN}', '{_CLOSE}', '…', 24) AS description
+        FROM tests_fts JOIN tests t ON t.id = tests_fts.rowid
+        WHERE tests_fts MATCH :match{visibility}
+        ORDER BY bm25(tests_fts, 10.0, 1.0)
+        LIMIT :limit
+    """), params)
+    return [{'id': row.id, 'is_active': row.is_active,
+             'title': _highlighted(row.title), 'description': _highlighted(row.description)}
+            for row in rows]
+
+
+def search_questions(query, limit=30):
+    """Вопросы банка по тексту и теме (для модераторов)."""
+    match = build_match(query)
+    if not match:
+        return []
+
+    rows = db.session.execute(text(f"""
+        SELECT q.id, q.test_id, t.title AS test_title,
+               snippet(questions_fts, 0, '{_OPEN}', '{_CLOSE}', '…', 32) AS text,
+               highlight(questions_fts, 1, '{_OPEN}', '{_CLOSE}') AS topic
+        FROM questions_fts
+        JOIN questions q ON q.id = questions_fts.rowid
+        LEFT JOIN tests t ON t.id = q.test_id
+        WHERE questions_fts MATCH :match
+          AND (t.id IS NULL OR t.deleted_at IS NULL)
+        ORDER BY bm25(questions_fts, 5.0, 2.0)
+        LIMIT :limit
+    """), {'match': match, 'limit': limit})
+    return [{'id': row.id, 'test_id': row.test_id, 'test_title': row.test_title,
+             'text': _highlighted(row.text), 'topic': _highlighted(row.topic)}
+            for row in rows]
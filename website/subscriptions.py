@@ -0,0 +1,126 @@
+"""
+Массовое назначение тестов по подписке.
+
+Пользователи выбираются условием по специализации, учреждению, должности
+или списку номеров лицензий, и назначение (или его снятие) выполняется одним
+INSERT ... SELECT или DELETE, а не построчно. Повторное назначение не
+создает дублей: уже назначенные пропускаются, а уникальный индекс
+(worker_id, test_id) гарантирует это на уровне базы. Сводная таблица
+user_test_status обновляется тем же набором пользователей.
+Функции модуля не коммитят — это делает вызывающий код.
+"""
+import io
+import re
+from datetime import datetime
+
+from sqlalchemy import and_, exists, func, literal, select
+
+from website import db, test_status
+from website.models import MedicalWorker, TestSubscription
+
+FILTER_FIELDS = ('specialization', 'institution', 'position')
+
+_subscriptions = TestSubscription.__table__
+_LICENSE_SEPARATORS = re.compile(r'[\s,;]+')
+
+
+def parse_licenses(text='', upload=None):
+    """Номера лицензий из текстового поля и загруженного файла (по строкам, через запятую, пробел или ;)."""
+    licenses = set()
+    sources = [io.StringIO(text or '')]
+    if upload and upload.filename:
+        sources.append(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace'))
+    for source in sources:
+        for line in source:
+            licenses.update(value for value in _LICENSE_SEPARATORS.split(line) if value)
+    return licenses
+
+
+def parse_criteria(form, files):
+    """Условия отбора из формы; пустые поля не участвуют."""
+    criteria = {field: (form.get(field) or '').strip() for field in FILTER_FIELDS}
+    criteria = {field: value for field, value in criteria.items() if value}
+    licenses = parse_licenses(form.get('licenses'), files.get('licenses_file'))
+    if licenses:
+        criteria['licenses'] = licenses
+    return criteria
+
+
+def _conditions(criteria):
+    conditions = [getattr(MedicalWorker, field) == criteria[field]
+                  for field in FILTER_FIELDS if criteria.get(field)]
+    if criteria.get('licenses'):
+        conditions.append(MedicalWorker.license_number.in_(criteria['licenses']))
+    return and_(*conditions)
+
+
+def matching_workers(criteria):
+    """SELECT id пользователей, подходящих под условия."""
+    return select(MedicalWorker.id).where(_conditions(criteria))
+
+
+def _unknown_licenses(criteria):
+    licenses = criteria.get('licenses')
+    if not licenses:
+        return 0
+    found = db.session.scalar(select(func.count()).select_from(MedicalWorker).where(
+        MedicalWorker.license_number.in_(licenses)))
+    return len(licenses) - found
+
+
+def assign(test_id, criteria):
+    """
+    Назначает тест всем подходящим пользователям.
+    Возвращает сводку: подходящих, назначено, уже было назначено, не найдено лицензий.
+    """
+    workers = matching_workers(criteria)
+    matched = db.session.scalar(select(func.count()).select_from(workers.subquery()))
+
+    new_workers = workers.where(~exists().where(
+        _subscriptions.c.worker_id == MedicalWorker.id,
+        _subscriptions.c.test_id == test_id
+    ))
+    assigned = db.session.execute(
+        _subscriptions.insert().from_select(
+            ['worker_id', 'test_id', 'subscribed_at'],
+            new_workers.add_columns(literal(test_id), literal(datetime.utcnow()))
+        )
+    ).rowcount
+
+    test_status.set_subscribed_many(workers, test_id, True)
+    return {
+        'matched': matched,
+        'assigned': assigned,
+        'existing': matched - assigned,
+        'unknown_licenses': _unknown_licenses(criteria),
+    }
+
+
+def revoke(test_id, criteria):
+    """Снимает назначение теста с подходящих пользователей. Возвращает сводку, как assign."""
+    workers = matching_workers(criteria)
+    matched = db.session.scalar(select(func.count()).select_from(workers.subquery()))
+
+    revoked = db.session.execute(
+        _subscriptions.delete().where(
+            _subscriptions.c.test_id == test_id,
+            _subscriptions.c.worker_id.in_(workers)
+        )
+    ).rowcount
+
+    test_status.set_subscribed_many(workers, test_id, False)
+    return {
+        'matched': matched,
+        'revoked': revoked,
+        'unknown_licenses': _unknown_licenses(criteria),
+    }
+
+
+def filter_values():
+    """Значения специализаций, учреждений и должностей — для фильтров формы."""
+    values = {}
+    for field in FILTER_FIELDS:
+        column = getattr(MedicalWorker, field)
+        values[field] = [row[0] for row in db.session.query(column).filter(
+            column.isnot(None), column != '').distinct().order_by(column)]
+    return values
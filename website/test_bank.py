@@ -0,0 +1,170 @@
+"""
+Выгрузка банка вопросов и копирование тестов.
+
+Выгрузка идет потоково: вопросы выбираются пачками по id (keyset), ответы —
+одним запросом на пачку, и каждая запись сразу сериализуется, поэтому
+память не зависит от размера банка. Формат записей совпадает с форматом
+импорта (website.question_import): выгрузку одного теста можно загрузить
+обратно в любой тест. Изображения выгружаются именами файлов в папке
+загрузок; импорт на том же сервере находит их там, а на другой сервер
+файлы переносятся zip-архивом. Тесты, ожидающие удаления (deleted_at),
+не выгружаются и не копируются.
+
+Копия теста создается тремя INSERT ... SELECT (тест, вопросы, ответы) в одной
+транзакции, без загрузки строк в ORM. Новые вопросы сопоставляются со
+старыми по порядковому номеру (row_number по id): вопросы копируются одним
+запросом в порядке id, поэтому их новые id возрастают в том же порядке.
+"""
+import json
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, literal, or_, select
+
+from website import db
+from website.models import Answer, Question, Test
+
+# Колонки, которые при копировании задаются заново, а не переносятся
+_TEST_OVERRIDES = ('id', 'title', 'is_active', 'created_by', 'created_at', 'content_version', 'deleted_at')
+_QUESTION_OVERRIDES = ('id', 'test_id', 'created_at', 'updated_at', 'last_modified_by_id')
+_ANSWER_OVERRIDES = ('id', 'question_id')
+
+
+def _record(question, answers):
+    return {
+        'text': question.text,
+        'type': question.question_type,
+        'points': question.points,
+        'topic': question.topic,
+        'level': question.question_level,
+        'tolerance': question.text_tolerance,
+        'image': question.image_filename,
+        'answers': [{'text': text, 'correct': bool(correct)} for text, correct in answers],
+    }
+
+
+def iter_questions(test_id=None, chunk_size=None):
+    """
+    Вопросы теста (или всего банка) в формате импорта, пачками по chunk_size.
+    В выгрузке всего банка у каждой записи есть test_id и test_title.
+    """
+    chunk_size = chunk_size or current_app.config['EXPORT_CHUNK_SIZE']
+    query = db.session.query(
+        Question.id, Question.test_id, Question.text, Question.question_type, Question.points,
+        Question.topic, Question.question_level, Question.text_tolerance, Question.image_filename,
+        Test.title.label('test_title')
+    ).outerjoin(Test, Test.id == Question.test_id)
+    if test_id is not None:
+        query = query.filter(Question.test_id == test_id)
+    else:
+        query = query.filter(or_(Test.id.is_(None), Test.deleted_at.is_(None)))
+
+    after = 0
+    while True:
+        questions = query.filter(Question.id > after).order_by(Question.id).limit(chunk_size).all()
+        if not questions:
+            return
+
+        answers = {}
+        for question_id, text, correct in db.session.query(
+                Answer.question_id, Answer.text, Answer.is_correct
+        ).filter(Answer.question_id.in_([q.id for q in questions])).order_by(Answer.id):
+            answers.setdefault(question_id, []).append((text, correct))
+
+        for question in questions:
+            record = _record(question, answers.get(question.id, ()))
+            if test_id is None:
+                record.update(test_id=question.test_id, test_title=question.test_title)
+            yield record
+        after = questions[-1].id
+
+
+def iter_jsonl(test_id=None):
+    for record in iter_questions(test_id):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def iter_json(test_id=None):
+    """JSON-массив по частям: открывающая скобка, записи через запятую, закрывающая."""
+    separator = '[\n'
+    for record in iter_questions(test_id):
+        yield separator + json.dumps(record, ensure_ascii=False)
+        separator = ',\n'
+    yield '[]\n' if separator == '[\n' else '\n]\n'
+
+
+EXPORTERS = {'json': iter_json, 'jsonl': iter_jsonl}
+
+
+def _copy_columns(table, overrides):
+    return [column.name for column in table.columns if column.name not in overrides]
+
+
+def clone_test(test, author_id, title=None):
+    """
+    Копия теста с вопросами и ответами (без результатов и назначений).
+    Копия создается неактивной, чтобы ее можно было проверить до публикации.
+    Возвращает id нового теста; коммит — за вызывающим кодом.
+    """
+    if test.deleted_at is not None:
+        raise ValueError('Тест удален')
+    now = datetime.utcnow()
+    tests, questions, answers = Test.__table__, Question.__table__, Answer.__table__
+
+    columns = _copy_columns(tests, _TEST_OVERRIDES)
+    new_test_id = db.session.execute(
+        tests.insert().from_select(
+            columns + ['title', 'is_active', 'created_by', 'created_at', 'content_version', 'deleted_at'],
+            select(
+                *(tests.c[name] for name in columns),
+                literal(title or f'{test.title} (копия)'), literal(False),
+                literal(author_id), literal(now), literal(1), literal(None)
+            ).where(tests.c.id == test.id)
+        ).returning(tests.c.id)
+    ).scalar_one()
+
+    columns = _copy_columns(questions, _QUESTION_OVERRIDES)
+    db.session.execute(
+        questions.insert().from_select(
+            columns + ['test_id', 'created_at', 'updated_at', 'last_modified_by_id'],
+            select(
+                *(questions.c[name] for name in columns),
+                literal(new_test_id), literal(now), literal(now), literal(author_id)
+            ).where(questions.c.test_id == test.id).order_by(questions.c.id)
+        )
+    )
+
+    def numbered(test_id):
+        return select(
+            questions.c.id, func.row_number().over(order_by=questions.c.id).label('number')
+        ).where(questions.c.test_id == test_id).subquery()
+
+    old, new = numbered(test.id), numbered(new_test_id)
+    columns = _copy_columns(answers, _ANSWER_OVERRIDES)
+    db.session.execute(
+        answers.insert().from_select(
+            columns + ['question_id'],
+            select(*(answers.c[name] for name in columns), new.c.id)
+            .join(old, old.c.id == answers.c.question_id)
+            .join(new, new.c.number == old.c.number)
+            .order_by(answers.c.id)
+        )
+    )
+    return new_test_id
+
+
+@click.command('export-questions')
+@click.option('--test', 'test_id', type=int, help='id теста (по умолчанию — весь банк)')
+@click.option('--format', 'file_format', type=click.Choice(sorted(EXPORTERS)), default='jsonl', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='файл (по умолчанию — stdout)')
+@with_appcontext
+def export_command(test_id, file_format, output):
+    """Выгрузить вопросы теста или всего банка в JSON/JSONL."""
+    if test_id is not None:
+        test = db.session.get(Test, test_id)
+        if test is None or test.deleted_at is not None:
+            raise click.ClickException(f'Тест {test_id} не найден')
+    for chunk in EXPORTERS[file_format](test_id):
+        output.write(chunk)
@@ -0,0 +1,128 @@
+"""
+Сводная таблица user_test_status: состояние теста для пользователя.
+
+Строка (пользователь, тест) хранит число попыток, лучший результат, признак
+сдачи, последнюю попытку и назначение. Она обновляется точечно в тех же
+транзакциях, что и исходные данные, поэтому каталог тестов и проверка лимита
+попыток читают ее по первичному ключу вместо выборок из test_results.
+Функции модуля не коммитят — это делает вызывающий код.
+"""
+from collections import defaultdict
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import case, exists, func, insert, literal, or_
+
+from website import db
+from website.models import UserTestStatus, TestResult, TestSubscription
+from website.rollup import upsert
+
+_table = UserTestStatus.__table__
+
+
+def get_status(worker_id, test_id):
+    return db.session.get(UserTestStatus, (worker_id, test_id))
+
+
+def _upsert(worker_id, test_id, changes, initial):
+    upsert(_table, {'worker_id': worker_id, 'test_id': test_id}, changes, initial)
+
+
+def record_start(result):
+    """Новая попытка (result уже должен иметь id)."""
+    _upsert(result.worker_id, result.test_id, {
+        'attempts': _table.c.attempts + 1,
+        'last_result_id': result.id,
+        'last_attempt_at': result.started_at,
+    }, {
+        'attempts': 1,
+        'last_result_id': result.id,
+        'last_attempt_at': result.started_at,
+    })
+
+
+def record_completion(result):
+    """Проверенная попытка: лучший результат и признак сдачи."""
+    percentage = result.percentage
+    changes = {
+        'best_percentage': case(
+            (or_(_table.c.best_percentage.is_(None), _table.c.best_percentage < percentage), percentage),
+            else_=_table.c.best_percentage
+        ),
+    }
+    if result.passed:
+        changes['passed'] = True
+    _upsert(result.worker_id, result.test_id, changes, {
+        'attempts': 1,
+        'best_percentage': percentage,
+        'passed': bool(result.passed),
+        'last_result_id': result.id,
+        'last_attempt_at': result.started_at,
+    })
+
+
+def set_subscribed(worker_id, test_id, subscribed):
+    _upsert(worker_id, test_id, {'subscribed': subscribed}, {'subscribed': subscribed})
+
+
+def set_subscribed_many(worker_ids, test_id, subscribed):
+    """Назначение для набора пользователей; worker_ids — SELECT id пользователей."""
+    db.session.execute(_table.update().where(
+        _table.c.test_id == test_id, _table.c.worker_id.in_(worker_ids)
+    ).values(subscribed=subscribed))
+    if subscribed:
+        missing = worker_ids.where(~exists().where(
+            _table.c.worker_id == worker_ids.selected_columns[0], _table.c.test_id == test_id))
+        db.session.execute(_table.insert().from_select(
+            ['worker_id', 'test_id', 'subscribed'],
+            missing.add_columns(literal(test_id), literal(True))
+        ))
+
+
+def forget_tests(test_ids):
+    UserTestStatus.query.filter(UserTestStatus.test_id.in_(test_ids)).delete(synchronize_session=False)
+
+
+def forget_worker(worker_id):
+    UserTestStatus.query.filter_by(worker_id=worker_id).delete(synchronize_session=False)
+
+
+def rebuild():
+    """Полный пересчет таблицы из test_results и test_subscriptions."""
+    rows = defaultdict(lambda: {'attempts': 0, 'best_percentage': None, 'passed': False,
+                                'last_result_id': None, 'last_attempt_at': None, 'subscribed': False})
+
+    aggregates = db.session.query(
+        TestResult.worker_id, TestResult.test_id,
+        func.count(TestResult.id),
+        func.max(TestResult.percentage),
+        func.max(case((TestResult.passed.is_(True), 1), else_=0)),
+        func.max(TestResult.id),
+        func.max(TestResult.started_at)
+    ).filter(
+        TestResult.worker_id.isnot(None), TestResult.test_id.isnot(None)
+    ).group_by(TestResult.worker_id, TestResult.test_id)
+
+    for worker_id, test_id, attempts, best, passed, last_id, last_at in aggregates:
+        rows[worker_id, test_id].update(attempts=attempts, best_percentage=best, passed=bool(passed),
+                                        last_result_id=last_id, last_attempt_at=last_at)
+
+    for worker_id, test_id in db.session.query(TestSubscription.worker_id, TestSubscription.test_id).distinct():
+        rows[worker_id, test_id]['subscribed'] = True
+
+    db.session.execute(_table.delete())
+    if rows:
+        db.session.execute(insert(_table), [
+            dict(values, worker_id=worker_id, test_id=test_id)
+            for (worker_id, test_id), values in rows.items()
+        ])
+    return len(rows)
+
+
+@click.command('rebuild-test-status')
+@with_appcontext
+def rebuild_command():
+    """Пересчитать user_test_status из результатов и назначений."""
+    count = rebuild()
+    db.session.commit()
+    click.echo(f'user_test_status: {count} строк')
@@ -0,0 +1,143 @@
+"""
+Проверка текстовых ответов с допуском опечаток.
+
+Варианты правильного ответа нормализуются один раз при сохранении вопроса
+(Answer.normalized_text). Для проверки по каждому вопросу строится индекс
+удалений (схема SymSpell): все строки, получаемые из варианта удалением до k
+символов. Кандидаты находятся поиском удалений ответа пользователя в этом
+индексе, поэтому стоимость проверки не зависит от числа вариантов;
+кандидаты подтверждаются ограниченным расстоянием Дамерау-Левенштейна
+с ранним выходом. Число удалений ответа растет как C(n, k), поэтому ответы,
+длина которых не укладывается в допуск ни одного варианта, отбрасываются
+сразу, а длинные ответы сравниваются с вариантами подходящей длины напрямую.
+Ответ не обрезается: точное совпадение проверяется по всему тексту, а с
+допуском опечаток сравниваются только ответы не длиннее MAX_TEXT_ANSWER_LENGTH.
+"""
+from itertools import combinations
+import re
+
+MAX_TOLERANCE = 2
+
+# Ответы длиннее проверяются только на точное совпадение (в форме — maxlength)
+MAX_TEXT_ANSWER_LENGTH = 500
+
+# Ответы длиннее ищутся прямым сравнением, а не перебором удалений
+_INDEX_MAX_LENGTH = 64
+
+_NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_answer(text):
+    """Регистр, ё/е, пунктуация и лишние пробелы не влияют на сравнение."""
+    text = (text or '').lower().replace('ё', 'е')
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def split_variants(raw):
+    """Варианты ответа из поля формы: по одному на строку или через ';'."""
+    return [v.strip() for v in re.split(r'[\n;]', raw or '') if v.strip()]
+
+
+def effective_tolerance(variant, tolerance):
+    """
+    Допуск для конкретного варианта: числа сравниваются точно,
+    короткие слова — с меньшим числом опечаток (1 на каждые 4 символа).
+    """
+    if not variant or variant.replace(' ', '').isdigit():
+        return 0
+    return max(0, min(tolerance, MAX_TOLERANCE, len(variant) // 4))
+
+
+def _deletions(word, depth):
+    """Все строки, получаемые из word удалением ровно depth символов."""
+    for positions in combinations(range(len(word)), depth):
+        skip = set(positions)
+        yield ''.join(ch for i, ch in enumerate(word) if i not in skip)
+
+
+def bounded_distance(a, b, limit):
+    """
+    Расстояние Дамерау-Левенштейна (перестановка соседних букв — одна правка),
+    если оно не больше limit, иначе limit + 1.
+    Считается только полоса шириной 2*limit+1 вокруг диагонали.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    big = limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [big] * (len(b) + 1)
+        current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return big
+        before, previous = previous, current
+    return min(previous[len(b)], big)
+
+
+class TextMatcher:
+    """Набор допустимых ответов одного вопроса."""
+
+    def __init__(self, variants, tolerance=1):
+        self.exact = set()
+        self.index = {}  # удаление -> [(вариант, допуск)]
+        self.by_length = {}  # длина -> [(вариант, допуск)], только варианты с допуском
+        self.max_tolerance = 0
+
+        for variant in variants:
+            if not variant:
+                continue
+            self.exact.add(variant)
+            k = effective_tolerance(variant, tolerance)
+            self.max_tolerance = max(self.max_tolerance, k)
+            if k:
+                self.by_length.setdefault(len(variant), []).append((variant, k))
+            for depth in range(k + 1):
+                for deleted in _deletions(variant, depth):
+                    self.index.setdefault(deleted, []).append((variant, k))
+
+    def __bool__(self):
+        return bool(self.exact)
+
+    def matches(self, answer):
+        answer = normalize_answer(answer)
+        if not answer:
+            return False
+        if answer in self.exact:
+            return True
+        if not self.max_tolerance or len(answer) > MAX_TEXT_ANSWER_LENGTH:
+            return False
+
+        # Варианты, длина которых отличается от ответа не больше их допуска
+        candidates = [
+            (variant, k)
+            for length in range(len(answer) - self.max_tolerance, len(answer) + self.max_tolerance + 1)
+            for variant, k in self.by_length.get(length, ())
+            if abs(len(variant) - len(answer)) <= k
+        ]
+        if not candidates:
+            return False
+        if len(answer) > _INDEX_MAX_LENGTH:
+            return any(bounded_distance(answer, variant, k) <= k for variant, k in candidates)
+
+        checked = set()
+        for depth in range(self.max_tolerance + 1):
+            for deleted in _deletions(answer, depth):
+                for variant, k in self.index.get(deleted, ()):
+                    if variant in checked:
+                        continue
+                    checked.add(variant)
+                    if bounded_distance(answer, variant, k) <= k:
+                        return True
+        return False
@@ -1,439 +1,534 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
-from flask_login import login_required, current_user
-from website import db
-from website.models import Test, TestCategory, TestResult, Question, Answer, UserAnswer, MedicalWorker, TestSubscription
-from website.forms import TestForm
-from datetime import datetime
-import json
-
-main_bp = Blueprint('main', __name__)
-
-
-@main_bp.route('/')
-def index():
-    if current_user.is_authenticated:
-        # Последние тесты пользователя
-        recent_results = TestResult.query.filter_by(
-            worker_id=current_user.id
-        ).order_by(TestResult.completed_at.desc()).limit(5).all()
-
-        # Доступные тесты
-        available_tests = Test.query.filter_by(is_active=True).all()
-
-        return render_template('index.html',
-                               recent_results=recent_results,
-                               available_tests=available_tests)
-    return render_template('index.html')
-
-
-@main_bp.route('/profile')
-@login_required
-def profile():
-    # Статистика пользователя
-    results = TestResult.query.filter_by(worker_id=current_user.id).all()
-
-    # Фильтруем только завершенные тесты для статистики
-    completed_results = [r for r in results if r.completed_at]
-    total_tests = len(completed_results)
-    passed_tests = len([r for r in completed_results if r.passed])
-
-    # Средний балл только по завершенным тестам
-    if total_tests > 0:
-        avg_score = sum([r.percentage for r in completed_results]) / total_tests
-    else:
-        avg_score = 0
-
-    # Последние 10 результатов
-    recent_results = TestResult.query.filter_by(
-        worker_id=current_user.id
-    ).order_by(TestResult.started_at.desc()).limit(10).all()
-
-    return render_template('profile.html',
-                           user=current_user,
-                           total_tests=total_tests,
-                           passed_tests=passed_tests,
-                           avg_score=round(avg_score, 1),
-                           recent_results=recent_results)
-
-
-@main_bp.route('/tests')
-@login_required
-def tests():
-    categories = TestCategory.query.all()
-    all_tests = Test.query.filter_by(is_active=True).all()
-
-    # Фильтруем: обычные тесты видны всем, тесты по подписке — только назначенным пользователям
-    tests_list = []
-    for test in all_tests:
-        if test.access_type == 'simple':
-            tests_list.append(test)
-        else:
-            subscription = TestSubscription.query.filter_by(
-                worker_id=current_user.id,
-                test_id=test.id
-            ).first()
-            if subscription:
-                tests_list.append(test)
-
-    # Определяем статус теста для пользователя
-    tests_with_status = []
-    for test in tests_list:
-        result = TestResult.query.filter_by(
-            worker_id=current_user.id,
-            test_id=test.id
-        ).first()
-
-        # есть ли подписка
-        subscription = None
-        if test.access_type == 'subscribed':
-            subscription = TestSubscription.query.filter_by(
-                worker_id=current_user.id,
-                test_id=test.id
-            ).first()
-
-        status = 'not_started'
-        if result:
-            status = 'passed' if result.passed else 'failed'
-
-        tests_with_status.append({
-            'test': test,
-            'status': status,
-            'result': result,
-            'subscription': subscription
-        })
-
-    return render_template('tests.html',
-                           tests=tests_with_status,
-                           categories=categories)
-
-
-@main_bp.route('/test/<int:test_id>')
-@login_required
-def test_detail(test_id):
-    test = Test.query.get_or_404(test_id)
-
-    # Проверяем, не проходил ли пользователь уже этот тест
-    existing_result = TestResult.query.filter_by(
-        worker_id=current_user.id,
-        test_id=test_id
-    ).first()
-
-    # Для обычных тестов сохраняем текущее поведение (1 попытка по умолчанию)
-    if test.access_type == 'simple' and existing_result:
-        return redirect(url_for('main.test_result', result_id=existing_result.id))
-
-    # Для теста по подписке проверяем, есть ли назначение (подписка)
-    if test.access_type == 'subscribed':
-        subscription = TestSubscription.query.filter_by(
-            worker_id=current_user.id,
-            test_id=test.id
-        ).first()
-        if not subscription:
-            flash('Этот тест недоступен для вашего аккаунта.', 'warning')
-            return redirect(url_for('main.tests'))
-
-    return render_template('test_detail.html', test=test)
-
-
-@main_bp.route('/test/<int:test_id>/start', methods=['POST'])
-@login_required
-def start_test(test_id):
-    test = Test.query.get_or_404(test_id)
-
-    # Если тест по подписке — проверяем наличие подписки (назначения)
-    if test.access_type == 'subscribed':
-        subscription = TestSubscription.query.filter_by(
-            worker_id=current_user.id,
-            test_id=test.id
-        ).first()
-        if not subscription:
-            flash('Этот тест недоступен для вашего аккаунта.', 'warning')
-            return redirect(url_for('main.test_detail', test_id=test_id))
-
-    # Проверяем лимит попыток (если задан)
-    if test.max_attempts and test.max_attempts > 0:
-        attempts_count = TestResult.query.filter_by(
-            worker_id=current_user.id,
-            test_id=test_id
-        ).count()
-        if attempts_count >= test.max_attempts:
-            flash('Достигнут лимит попыток для этого теста.', 'warning')
-            return redirect(url_for('main.test_result',
-                                    result_id=TestResult.query.filter_by(
-                                        worker_id=current_user.id,
-                                        test_id=test_id
-                                    ).order_by(TestResult.completed_at.desc()).first().id))
-
-    # Создаем запись о начале теста
-    result = TestResult(
-        worker_id=current_user.id,
-        test_id=test_id,
-        started_at=datetime.utcnow()
-    )
-
-    db.session.add(result)
-    db.session.commit()
-
-    return redirect(url_for('main.take_test', result_id=result.id))
-
-
-@main_bp.route('/test/take/<int:result_id>', methods=['GET', 'POST'])
-@login_required
-def take_test(result_id):
-    result = TestResult.query.get_or_404(result_id)
-
-    # Проверяем, что тест принадлежит пользователю
-    if result.worker_id != current_user.id:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.tests'))
-
-    # Проверяем, не завершен ли уже тест
-    if result.completed_at:
-        return redirect(url_for('main.test_result', result_id=result.id))
-
-    test = result.test
-    questions = Question.query.filter_by(test_id=test.id).all()
-
-    if request.method == 'POST':
-        # Обработка ответов
-        score = 0
-        total_points = 0
-
-        for question in questions:
-            total_points += question.points
-
-            if question.question_type == 'single':
-                answer_id = request.form.get(f'question_{question.id}')
-                if answer_id:
-                    answer = Answer.query.get(int(answer_id))
-                    is_correct = answer.is_correct if answer else False
-
-                    user_answer = UserAnswer(
-                        result_id=result.id,
-                        question_id=question.id,
-                        answer_ids=json.dumps([int(answer_id)]),
-                        is_correct=is_correct
-                    )
-
-                    if is_correct:
-                        score += question.points
-
-                    db.session.add(user_answer)
-
-            elif question.question_type == 'multiple':
-                answer_ids = request.form.getlist(f'question_{question.id}')
-                if answer_ids:
-                    answer_ids = [int(id) for id in answer_ids]
-                    correct_answers = Answer.query.filter_by(
-                        question_id=question.id,
-                        is_correct=True
-                    ).all()
-
-                    correct_ids = [a.id for a in correct_answers]
-
-                    # Проверяем, все ли правильные ответы выбраны и нет ли неправильных
-                    is_correct = (set(answer_ids) == set(correct_ids))
-
-                    user_answer = UserAnswer(
-                        result_id=result.id,
-                        question_id=question.id,
-                        answer_ids=json.dumps(answer_ids),
-                        is_correct=is_correct
-                    )
-
-                    if is_correct:
-                        score += question.points
-
-                    db.session.add(user_answer)
-
-            elif question.question_type == 'text':
-                text_answer = request.form.get(f'question_text_{question.id}', '').strip()
-                if text_answer:
-                    # Ищем правильный ответ (должен быть только один для текстовых вопросов)
-                    correct_answer = Answer.query.filter_by(
-                        question_id=question.id,
-                        is_correct=True
-                    ).first()
-
-                    # Простая проверка (можно сделать более сложную, например, с допуском опечаток)
-                    is_correct = False
-                    if correct_answer:
-                        # Сравниваем в нижнем регистре для нечувствительности к регистру
-                        is_correct = (text_answer.lower() == correct_answer.text.lower())
-
-                    user_answer = UserAnswer(
-                        result_id=result.id,
-                        question_id=question.id,
-                        text_answer=text_answer,
-                        is_correct=is_correct
-                    )
-
-                    if is_correct:
-                        score += question.points
-
-                    db.session.add(user_answer)
-
-        # Завершаем тест
-        percentage = (score / total_points * 100) if total_points > 0 else 0
-        passed = percentage >= test.passing_score
-
-        result.score = score
-        result.percentage = percentage
-        result.passed = passed
-        result.completed_at = datetime.utcnow()
-        result.time_taken = (result.completed_at - result.started_at).seconds
-
-        db.session.commit()
-
-        return redirect(url_for('main.test_result', result_id=result.id))
-
-    return render_template('test_detail.html',
-                           test=test,
-                           questions=questions,
-                           result_id=result.id)
-
-
-@main_bp.route('/test/result/<int:result_id>')
-@login_required
-def test_result(result_id):
-    result = TestResult.query.get_or_404(result_id)
-
-    # Проверяем, что результат принадлежит пользователю
-    if result.worker_id != current_user.id and not current_user.is_moderator:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.tests'))
-
-    # Получаем ответы пользователя
-    user_answers = UserAnswer.query.filter_by(result_id=result_id).all()
-
-    # Для каждого ответа получаем информацию о вопросе и выбранных ответах
-    detailed_answers = []
-    for ua in user_answers:
-        question = Question.query.get(ua.question_id)
-        answer_ids = json.loads(ua.answer_ids) if ua.answer_ids else []
-        answers = Answer.query.filter(Answer.id.in_(answer_ids)).all() if answer_ids else []
-
-        # Получаем все правильные ответы для этого вопроса
-        correct_answers = Answer.query.filter_by(
-            question_id=ua.question_id,
-            is_correct=True
-        ).all()
-
-        detailed_answers.append({
-            'question': question,
-            'user_answers': answers,
-            'correct_answers': correct_answers,
-            'is_correct': ua.is_correct
-        })
-
-    return render_template('test_result.html',
-                           result=result,
-                           detailed_answers=detailed_answers)
-
-
-@main_bp.route('/admin')
-@login_required
-def admin_panel():
-    if not current_user.is_admin:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    # Статистика для админ-панели
-    total_users = MedicalWorker.query.count()
-    total_tests = Test.query.count()
-    total_results = TestResult.query.count()
-    active_tests = Test.query.filter_by(is_active=True).count()
-
-    recent_results = TestResult.query.filter(
-        TestResult.completed_at.isnot(None)
-    ).order_by(
-        TestResult.completed_at.desc()
-    ).limit(10).all()
-
-    return render_template('admin_panel.html',
-                           total_users=total_users,
-                           total_tests=total_tests,
-                           total_results=total_results,
-                           active_tests=active_tests,
-                           recent_results=recent_results)
-
-
-# Админские функции управления пользователями
-@main_bp.route('/admin/users')
-@login_required
-def admin_users():
-    if not current_user.is_admin:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    users = MedicalWorker.query.order_by(MedicalWorker.created_at.desc()).all()
-    return render_template('admin_users.html', users=users)
-
-
-@main_bp.route('/admin/user/<int:user_id>/toggle_admin')
-@login_required
-def toggle_admin(user_id):
-    if not current_user.is_admin:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    user = MedicalWorker.query.get_or_404(user_id)
-
-    # Нельзя снять права администратора с самого себя
-    if user.id == current_user.id:
-        flash('Нельзя изменить свои собственные права администратора', 'warning')
-        return redirect(url_for('main.admin_users'))
-
-    user.is_admin = not user.is_admin
-    db.session.commit()
-
-    status = 'назначен' if user.is_admin else 'снят'
-    flash(f'Пользователь {user.get_full_name()} {status} администратором', 'success')
-    return redirect(url_for('main.admin_users'))
-
-
-@main_bp.route('/admin/user/<int:user_id>/toggle_moderator')
-@login_required
-def toggle_moderator(user_id):
-    if not current_user.is_admin:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    user = MedicalWorker.query.get_or_404(user_id)
-
-    # Нельзя снять права модератора с самого себя, если это единственный админ
-    if user.id == current_user.id and user.is_admin:
-        flash('Нельзя изменить свои собственные права модератора', 'warning')
-        return redirect(url_for('main.admin_users'))
-
-    user.is_moderator = not user.is_moderator
-    db.session.commit()
-
-    status = 'назначен' if user.is_moderator else 'снят'
-    flash(f'Пользователь {user.get_full_name()} {status} модератором', 'success')
-    return redirect(url_for('main.admin_users'))
-
-
-@main_bp.route('/admin/user/<int:user_id>/delete', methods=['POST'])
-@login_required
-def delete_user(user_id):
-    if not current_user.is_admin:
-        flash('Доступ запрещен', 'danger')
-        return redirect(url_for('main.index'))
-
-    user = MedicalWorker.query.get_or_404(user_id)
-
-    # Нельзя удалить самого себя
-    if user.id == current_user.id:
-        flash('Нельзя удалить свой собственный аккаунт', 'danger')
-        return redirect(url_for('main.admin_users'))
-
-    # Удаляем связанные данные пользователя
-    TestResult.query.filter_by(worker_id=user_id).delete()
-
-    # Удаляем пользователя
-    db.session.delete(user)
-    db.session.commit()
-
-    flash(f'Пользователь {user.get_full_name()} удален', 'success')
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, make_response, \
+    current_app, abort, send_from_directory
+from flask_login import login_required, current_user
+from website import db
+from website.models import Test, TestCategory, TestResult, Question, Answer, UserAnswer, MedicalWorker, TestSubscription
+from website.forms import TestForm
+from website.grading import get_answer_key, collect_answers, complete_attempt, record_attempt, load_saved_answers, \
+    store_answers
+from website.grading_queue import grading_queue
+from website.paper import get_paper, arrange, questions_per_page
+from website.drafts import drafts
+from website.catalogue import list_tests
+from website.search import search_tests, search_questions
+from website.test_status import get_status, record_start
+from website.purge import delete_worker
+from website import mastery, worker_stats
+from website.admission import admission, is_lock_timeout
+from website.images import image_pipeline, is_processed
+from website.assets import immutable
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+from datetime import datetime
+import json
+import math
+import secrets
+
+main_bp = Blueprint('main', __name__)
+
+
+@main_bp.route('/')
+def index():
+    if current_user.is_authenticated:
+        # Последние тесты пользователя
+        recent_results = TestResult.query.filter_by(
+            worker_id=current_user.id
+        ).order_by(TestResult.completed_at.desc()).limit(5).all()
+
+        # Доступные тесты
+        available_tests = Test.query.filter_by(is_active=True).all()
+
+        return render_template('index.html',
+                               recent_results=recent_results,
+                               available_tests=available_tests)
+    return render_template('index.html')
+
+
+@main_bp.route('/profile')
+@login_required
+def profile():
+    # Статистика пользователя — из сводных таблиц (только завершенные и проверенные тесты)
+    stats = worker_stats.get_stats(current_user.id)
+    trend = worker_stats.get_trend(current_user.id)
+    topics = mastery.worker_breakdown(current_user.id)
+
+    # Последние 10 результатов
+    recent_results = TestResult.query.options(
+        joinedload(TestResult.test)
+    ).filter_by(
+        worker_id=current_user.id
+    ).order_by(TestResult.started_at.desc()).limit(10).all()
+
+    return render_template('profile.html',
+                           user=current_user,
+                           total_tests=stats.completed,
+                           passed_tests=stats.passed,
+                           avg_score=stats.avg_score,
+                           trend=trend,
+                           topics=topics,
+                           recent_results=recent_results)
+
+
+@main_bp.route('/tests')
+@login_required
+def tests():
+    categories = TestCategory.query.all()
+
+    filters = {
+        'category_id': request.args.get('category', type=int),
+        'difficulty': request.args.get('difficulty') or None,
+        'access_type': request.args.get('access') or None,
+    }
+
+    # Обычные тесты видны всем, тесты по подписке — только назначенным пользователям;
+    # статус берется из сводной таблицы user_test_status
+    tests_list, next_cursor = list_tests(current_user.id, after=request.args.get('after'),
+                                         limit=current_app.config['CATALOGUE_PAGE_SIZE'], **filters)
+
+    return render_template('tests.html',
+                           tests=tests_list,
+                           categories=categories,
+                           filters=filters,
+                           next_cursor=next_cursor,
+                           is_first_page=not request.args.get('after'))
+
+
+@main_bp.route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    tests_found, questions_found = [], []
+    if query:
+        # Модераторы ищут по всем тестам и по банку вопросов,
+        # остальные — только по доступным им активным тестам
+        if current_user.is_moderator:
+            tests_found = search_tests(query, include_inactive=True)
+            questions_found = search_questions(query)
+        else:
+            tests_found = search_tests(query, worker_id=current_user.id)
+
+    return render_template('search.html',
+                           query=query,
+                           tests=tests_found,
+                           questions=questions_found)
+
+
+@main_bp.route('/test/<int:test_id>')
+@login_required
+def test_detail(test_id):
+    test = Test.query.get_or_404(test_id)
+
+    # Проверяем, не проходил ли пользователь уже этот тест
+    status = get_status(current_user.id, test_id)
+
+    # Для обычных тестов сохраняем текущее поведение (1 попытка по умолчанию)
+    if test.access_type == 'simple' and status and status.last_result_id:
+        return redirect(url_for('main.test_result', result_id=status.last_result_id))
+
+    # Для теста по подписке проверяем, есть ли назначение (подписка)
+    if test.access_type == 'subscribed':
+        if not (status and status.subscribed):
+            flash('Этот тест недоступен для вашего аккаунта.', 'warning')
+            return redirect(url_for('main.tests'))
+
+    return render_template('test_detail.html', test=test)
+
+
+@main_bp.route('/test/<int:test_id>/start', methods=['POST'])
+@login_required
+def start_test(test_id):
+    # При массовом старте попытки создаются ограниченным числом запросов,
+    # остальные получают страницу ожидания и повторяют запрос сами
+    if not admission.try_acquire(test_id):
+        return _waiting_room(test_id)
+    try:
+        return _start_attempt(test_id)
+    except OperationalError as e:
+        if not is_lock_timeout(e):
+            raise
+        db.session.rollback()
+        return _waiting_room(test_id)
+    finally:
+        admission.release(test_id)
+
+
+def _waiting_room(test_id):
+    retry_after = admission.retry_delay()
+    response = make_response(render_template('waiting_room.html',
+                                             test=Test.query.get_or_404(test_id),
+                                             retry_after=retry_after), 503)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def _start_attempt(test_id):
+    test = Test.query.get_or_404(test_id)
+    status = get_status(current_user.id, test_id)
+
+    # Если тест по подписке — проверяем наличие подписки (назначения)
+    if test.access_type == 'subscribed':
+        if not (status and status.subscribed):
+            flash('Этот тест недоступен для вашего аккаунта.', 'warning')
+            return redirect(url_for('main.test_detail', test_id=test_id))
+
+    # Проверяем лимит попыток (если задан)
+    if test.max_attempts and test.max_attempts > 0:
+        if status and status.attempts >= test.max_attempts:
+            flash('Достигнут лимит попыток для этого теста.', 'warning')
+            return redirect(url_for('main.test_result', result_id=status.last_result_id))
+
+    # Создаем запись о начале теста
+    result = TestResult(
+        worker_id=current_user.id,
+        test_id=test_id,
+        started_at=datetime.utcnow()
+    )
+
+    # Для перемешивания сохраняем только зерно перестановки
+    if test.shuffle_questions or test.shuffle_answers:
+        result.shuffle_seed = secrets.randbits(31)
+
+    db.session.add(result)
+    db.session.flush()
+    record_start(result)
+    db.session.commit()
+
+    return redirect(url_for('main.take_test', result_id=result.id))
+
+
+@main_bp.route('/test/take/<int:result_id>', methods=['GET', 'POST'])
+@login_required
+def take_test(result_id):
+    result = TestResult.query.get_or_404(result_id)
+
+    # Проверяем, что тест принадлежит пользователю
+    if result.worker_id != current_user.id:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.tests'))
+
+    # Проверяем, не завершен ли уже тест
+    if result.completed_at:
+        return redirect(url_for('main.test_result', result_id=result.id))
+
+    test = result.test
+
+    if request.method == 'POST':
+        # Ответы берем из отправленной формы. Черновики (буфер этого процесса
+        # сбрасывается в БД) дополняют ее только в постраничном режиме, где в
+        # форме одна страница; форма всего бланка полная, и снятый в ней ответ
+        # не должен вернуться из не успевшего сохраниться черновика
+        drafts.flush_result(result.id)
+        saved = load_saved_answers(result.id)
+        answers = collect_answers(get_answer_key(test), request.form)
+        page_size = questions_per_page(test)
+        if page_size and len(get_paper(test)) > page_size:
+            answers = {**saved, **answers}
+        replace = bool(saved)
+
+        _finish_attempt(result, test, answers, replace)
+
+        return redirect(url_for('main.test_result', result_id=result.id))
+
+    # Бланк теста отрисован заранее и общий для всех попыток,
+    # порядок вопросов для попытки вычисляется из зерна
+    paper = get_paper(test)
+    questions = arrange(paper, test, result.shuffle_seed)
+
+    # Постраничный режим: на страницу попадает срез того же бланка
+    page, pages, next_images = 1, 1, []
+    page_size = questions_per_page(test)
+    if page_size:
+        pages = max(1, math.ceil(len(questions) / page_size))
+        page = min(max(request.args.get('page', 1, type=int), 1), pages)
+        next_questions = questions[page * page_size:(page + 1) * page_size]
+        questions = questions[(page - 1) * page_size:page * page_size]
+        next_images = [q.image_filename for q in next_questions if q.image_filename]
+
+    # Сохраненные ответы (после сбоя браузера или возврата на страницу) восстанавливаются в форме
+    drafts.flush_result(result.id)
+    saved_answers = load_saved_answers(result.id, [q.id for q in questions])
+
+    elapsed = int((datetime.utcnow() - result.started_at).total_seconds())
+
+    return render_template('test_detail.html',
+                           test=test,
+                           paper=paper,
+                           questions=questions,
+                           result_id=result.id,
+                           page=page,
+                           pages=pages,
+                           next_images=next_images,
+                           saved_answers=saved_answers,
+                           time_left=max(test.time_limit - elapsed, 0))
+
+
+def _finish_attempt(result, test, answers, replace):
+    """Завершает попытку: проверка сразу или постановка в очередь (ASYNC_GRADING)."""
+    if grading_queue.enabled:
+        record_attempt(result, answers, replace=replace)
+        db.session.commit()
+        grading_queue.enqueue(result.id)
+    else:
+        # Проверка целиком в памяти по закешированному ключу ответов
+        complete_attempt(result, test, answers, replace=replace)
+        db.session.commit()
+
+
+@main_bp.route('/test/take/<int:result_id>/page/<int:page>', methods=['POST'])
+@login_required
+def save_page(result_id, page):
+    """Сохранение ответов одной страницы в постраничном режиме."""
+    result = TestResult.query.get_or_404(result_id)
+    wants_json = request.accept_mimetypes.best == 'application/json'
+
+    if result.worker_id != current_user.id:
+        if wants_json:
+            return jsonify(error='forbidden'), 403
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.tests'))
+
+    if result.completed_at:
+        if wants_json:
+            return jsonify(error='completed'), 409
+        return redirect(url_for('main.test_result', result_id=result.id))
+
+    test = result.test
+    page_size = questions_per_page(test) or len(get_paper(test))
+    page = max(page, 1)
+    questions = arrange(get_paper(test), test, result.shuffle_seed)
+    question_ids = {q.id for q in questions[(page - 1) * page_size:page * page_size]}
+
+    answers = collect_answers(get_answer_key(test), request.form, question_ids)
+    drafts.flush_result(result.id)
+    store_answers(result.id, answers, question_ids)
+
+    # Без явной кнопки форма отправлена таймером или строгим режимом — завершаем
+    go = request.form.get('go', 'finish')
+    if go == 'finish':
+        # Итоговая проверка только агрегирует уже сохраненные ответы
+        _finish_attempt(result, test, load_saved_answers(result.id), replace=True)
+        if wants_json:
+            return jsonify(saved=len(answers),
+                           redirect=url_for('main.test_result', result_id=result.id))
+        return redirect(url_for('main.test_result', result_id=result.id))
+
+    db.session.commit()
+
+    next_page = page - 1 if go == 'prev' else page + 1
+    if wants_json:
+        return jsonify(saved=len(answers))
+    return redirect(url_for('main.take_test', result_id=result.id, page=max(next_page, 1)))
+
+
+@main_bp.route('/test/take/<int:result_id>/autosave', methods=['POST'])
+@login_required
+def autosave(result_id):
+    """
+    Автосохранение черновиков: принимает JSON {"answers": {question_id: ответ}}.
+    Ответ — список id вариантов или текст; пустое значение очищает ответ.
+    """
+    result = TestResult.query.get_or_404(result_id)
+    if result.worker_id != current_user.id:
+        return jsonify(error='forbidden'), 403
+    if result.completed_at:
+        return jsonify(error='completed'), 409
+
+    payload = request.get_json(silent=True) or {}
+    answer_key = get_answer_key(result.test)
+
+    changes = {}
+    for raw_id, value in (payload.get('answers') or {}).items():
+        try:
+            question = answer_key.by_id.get(int(raw_id))
+        except (TypeError, ValueError):
+            continue
+        if question is None:
+            continue
+
+        if question.question_type == 'text':
+            value = str(value or '').strip()
+        else:
+            try:
+                value = [int(v) for v in (value or [])]
+            except (TypeError, ValueError):
+                continue
+            if question.question_type == 'single':
+                value = value[:1]
+        changes[question.id] = value or None
+
+    # Запись в БД — отложенная и пакетная, см. website/drafts.py
+    drafts.put(result.id, changes)
+    return jsonify(buffered=len(changes)), 202
+
+
+@main_bp.route('/test/result/<int:result_id>')
+@login_required
+def test_result(result_id):
+    result = TestResult.query.get_or_404(result_id)
+
+    # Проверяем, что результат принадлежит пользователю
+    if result.worker_id != current_user.id and not current_user.is_moderator:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.tests'))
+
+    # Попытка завершена, но еще проверяется в фоне
+    if result.completed_at and result.passed is None:
+        # После перезапуска процесса очередь пуста — ставим попытку заново
+        if not grading_queue.is_queued(result.id):
+            grading_queue.enqueue(result.id)
+        return render_template('test_result.html',
+                               result=result,
+                               grading=True,
+                               detailed_answers=[])
+
+    # Получаем ответы пользователя
+    user_answers = UserAnswer.query.filter_by(result_id=result_id).all()
+
+    # Для каждого ответа получаем информацию о вопросе и выбранных ответах
+    detailed_answers = []
+    for ua in user_answers:
+        question = Question.query.get(ua.question_id)
+        answer_ids = json.loads(ua.answer_ids) if ua.answer_ids else []
+        answers = Answer.query.filter(Answer.id.in_(answer_ids)).all() if answer_ids else []
+
+        # Получаем все правильные ответы для этого вопроса
+        correct_answers = Answer.query.filter_by(
+            question_id=ua.question_id,
+            is_correct=True
+        ).all()
+
+        detailed_answers.append({
+            'question': question,
+            'user_answers': answers,
+            'correct_answers': correct_answers,
+            'text_answer': ua.text_answer,
+            'is_correct': ua.is_correct
+        })
+
+    return render_template('test_result.html',
+                           result=result,
+                           detailed_answers=detailed_answers)
+
+
+@main_bp.route('/images/<filename>/<int:width>.<any(jpg, webp):extension>')
+def question_image(filename, width, extension):
+    """Вариант изображения вопроса; пока он не построен — оригинал."""
+    if width not in image_pipeline.widths or not is_processed(filename):
+        abort(404)
+
+    variant = image_pipeline.variant(filename, width, extension)
+    if variant:
+        # Имя файла — хеш содержимого, вариант по этому адресу не меняется
+        return immutable(send_from_directory(image_pipeline.variants_folder, variant,
+                                             max_age=current_app.config['IMAGE_MAX_AGE']))
+
+    # Вариант еще строится или файл загружен до появления вариантов
+    image_pipeline.submit(filename)
+    return send_from_directory(image_pipeline.upload_folder, filename, max_age=0)
+
+
+@main_bp.route('/admin')
+@login_required
+def admin_panel():
+    if not current_user.is_admin:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    # Статистика для админ-панели
+    total_users = MedicalWorker.query.count()
+    total_tests = Test.query.filter(Test.deleted_at.is_(None)).count()
+    total_results = TestResult.query.count()
+    active_tests = Test.query.filter(Test.is_active.is_(True), Test.deleted_at.is_(None)).count()
+
+    recent_results = TestResult.query.filter(
+        TestResult.completed_at.isnot(None)
+    ).order_by(
+        TestResult.completed_at.desc()
+    ).limit(10).all()
+
+    return render_template('admin_panel.html',
+                           total_users=total_users,
+                           total_tests=total_tests,
+                           total_results=total_results,
+                           active_tests=active_tests,
+                           recent_results=recent_results)
+
+
+# Админские функции управления пользователями
+@main_bp.route('/admin/users')
+@login_required
+def admin_users():
+    if not current_user.is_admin:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    users = MedicalWorker.query.order_by(MedicalWorker.created_at.desc()).all()
+    return render_template('admin_users.html', users=users)
+
+
+@main_bp.route('/admin/user/<int:user_id>/toggle_admin')
+@login_required
+def toggle_admin(user_id):
+    if not current_user.is_admin:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    user = MedicalWorker.query.get_or_404(user_id)
+
+    # Нельзя снять права администратора с самого себя
+    if user.id == current_user.id:
+        flash('Нельзя изменить свои собственные права администратора', 'warning')
+        return redirect(url_for('main.admin_users'))
+
+    user.is_admin = not user.is_admin
+    db.session.commit()
+
+    status = 'назначен' if user.is_admin else 'снят'
+    flash(f'Пользователь {user.get_full_name()} {status} администратором', 'success')
+    return redirect(url_for('main.admin_users'))
+
+
+@main_bp.route('/admin/user/<int:user_id>/toggle_moderator')
+@login_required
+def toggle_moderator(user_id):
+    if not current_user.is_admin:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    user = MedicalWorker.query.get_or_404(user_id)
+
+    # Нельзя снять права модератора с самого себя, если это единственный админ
+    if user.id == current_user.id and user.is_admin:
+        flash('Нельзя изменить свои собственные права модератора', 'warning')
+        return redirect(url_for('main.admin_users'))
+
+    user.is_moderator = not user.is_moderator
+    db.session.commit()
+
+    status = 'назначен' if user.is_moderator else 'снят'
+    flash(f'Пользователь {user.get_full_name()} {status} модератором', 'success')
+    return redirect(url_for('main.admin_users'))
+
+
+@main_bp.route('/admin/user/<int:user_id>/delete', methods=['POST'])
+@login_required
+def delete_user(user_id):
+    if not current_user.is_admin:
+        flash('Доступ запрещен', 'danger')
+        return redirect(url_for('main.index'))
+
+    user = MedicalWorker.query.get_or_404(user_id)
+
+    # Нельзя удалить самого себя
+    if user.id == current_user.id:
+        flash('Нельзя удалить свой собственный аккаунт', 'danger')
+        return redirect(url_for('main.admin_users'))
+
+    full_name = user.get_full_name()
+
+    # Попытки с ответами, назначения и сводки удаляются запросами, без загрузки строк
+    delete_worker(user_id)
+    db.session.commit()
+
+    flash(f'Пользователь {full_name} удален', 'success')
     return redirect(url_for('main.admin_users'))
\ No newline at end of file
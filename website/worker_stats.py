@@ -0,0 +1,130 @@
+"""
+Сводная статистика пользователя для профиля.
+
+worker_stats (одна строка на пользователя) и worker_monthly_stats (строка на
+пользователя и месяц) обновляются при проверке каждой попытки, поэтому
+профиль читает итоги и динамику по первичному ключу, независимо от того,
+сколько попыток у пользователя в истории. Учитываются только завершенные
+и проверенные попытки. Функции модуля не коммитят.
+"""
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import case, func, insert, or_
+
+from website import db
+from website.models import TestResult, WorkerStats, WorkerMonthlyStats
+from website.rollup import upsert
+
+_totals = WorkerStats.__table__
+_monthly = WorkerMonthlyStats.__table__
+
+
+def month_of(moment):
+    return moment.strftime('%Y-%m')
+
+
+def _add(table, key, completed, passed, score_sum, changes=None, initial=None):
+    upsert(table, key, dict({
+        'completed': table.c.completed + completed,
+        'passed': table.c.passed + passed,
+        'score_sum': table.c.score_sum + score_sum,
+    }, **(changes or {})), dict({
+        'completed': completed,
+        'passed': passed,
+        'score_sum': score_sum,
+    }, **(initial or {})))
+
+
+def record_completion(result):
+    """Проверенная попытка: добавляет ее к итогам и к итогам месяца завершения."""
+    if result.worker_id is None or result.completed_at is None or result.percentage is None:
+        return
+    passed = 1 if result.passed else 0
+    last = _totals.c.last_completed_at
+    _add(_totals, {'worker_id': result.worker_id}, 1, passed, result.percentage,
+         changes={'last_completed_at': case(
+             (or_(last.is_(None), last < result.completed_at), result.completed_at), else_=last)},
+         initial={'last_completed_at': result.completed_at})
+    _add(_monthly, {'worker_id': result.worker_id, 'month': month_of(result.completed_at)},
+         1, passed, result.percentage)
+
+
+_month_expr = func.strftime('%Y-%m', TestResult.completed_at)
+
+
+def _aggregates(query, group_by, extra=()):
+    """Число, число сданных и сумма процентов проверенных попыток по группам."""
+    return query.with_entities(
+        *group_by, *extra,
+        func.count(TestResult.id),
+        func.sum(case((TestResult.passed.is_(True), 1), else_=0)),
+        func.sum(TestResult.percentage)
+    ).filter(
+        TestResult.worker_id.isnot(None),
+        TestResult.completed_at.isnot(None),
+        TestResult.percentage.isnot(None)
+    ).group_by(*group_by)
+
+
+def discount_results(query):
+    """
+    Вычитает из итогов попытки, выбранные запросом query по TestResult,
+    перед их удалением (например, вместе с тестом).
+    """
+    for worker_id, completed, passed, score_sum in _aggregates(query, [TestResult.worker_id]):
+        _add(_totals, {'worker_id': worker_id}, -completed, -passed, -score_sum)
+    for worker_id, month, completed, passed, score_sum in _aggregates(query, [TestResult.worker_id, _month_expr]):
+        _add(_monthly, {'worker_id': worker_id, 'month': month}, -completed, -passed, -score_sum)
+
+
+def forget_worker(worker_id):
+    WorkerStats.query.filter_by(worker_id=worker_id).delete(synchronize_session=False)
+    WorkerMonthlyStats.query.filter_by(worker_id=worker_id).delete(synchronize_session=False)
+
+
+def get_stats(worker_id):
+    """Итоги пользователя (пустые, если он еще ничего не завершил)."""
+    return db.session.get(WorkerStats, worker_id) or WorkerStats(
+        worker_id=worker_id, completed=0, passed=0, score_sum=0)
+
+
+def get_trend(worker_id, months=12):
+    """Итоги по месяцам за последние months месяцев с результатами, по возрастанию."""
+    rows = WorkerMonthlyStats.query.filter(
+        WorkerMonthlyStats.worker_id == worker_id,
+        WorkerMonthlyStats.completed > 0
+    ).order_by(WorkerMonthlyStats.month.desc()).limit(months).all()
+    return rows[::-1]
+
+
+def rebuild():
+    """Полный пересчет обеих таблиц из test_results."""
+    db.session.execute(_totals.delete())
+    db.session.execute(_monthly.delete())
+
+    totals = [
+        {'worker_id': worker_id, 'last_completed_at': last, 'completed': completed,
+         'passed': passed, 'score_sum': score_sum}
+        for worker_id, last, completed, passed, score_sum in _aggregates(
+            TestResult.query, [TestResult.worker_id], extra=[func.max(TestResult.completed_at)])
+    ]
+    monthly = [
+        {'worker_id': worker_id, 'month': month, 'completed': completed,
+         'passed': passed, 'score_sum': score_sum}
+        for worker_id, month, completed, passed, score_sum in _aggregates(
+            TestResult.query, [TestResult.worker_id, _month_expr])
+    ]
+    if totals:
+        db.session.execute(insert(_totals), totals)
+    if monthly:
+        db.session.execute(insert(_monthly), monthly)
+    return len(totals)
+
+
+@click.command('rebuild-worker-stats')
+@with_appcontext
+def rebuild_command():
+    """Пересчитать статистику пользователей из результатов."""
+    count = rebuild()
+    db.session.commit()
+    click.echo(f'worker_stats: {count} пользователей')